@@ -0,0 +1,340 @@
+import os
+import sys
+
+# Add analytics/benchmarks (for synthetic_data) to the module search path
+benchmarks_dir = os.path.abspath(os.path.dirname(__file__))
+analytics_dir = os.path.abspath(os.path.join(benchmarks_dir, '..'))
+root_dir = os.path.abspath(os.path.join(analytics_dir, '..'))
+
+if benchmarks_dir not in sys.path:
+    sys.path.insert(0, benchmarks_dir)
+
+
+import argparse
+import gc
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+
+"""
+Benchmark suite for both analytics parts
+
+Times the main entry points of both parts on synthetic data (see synthetic_data.py), pytest-benchmark style:
+- Every case runs one warmup round, then --rounds timed rounds: min / median / mean / stddev seconds and throughput
+  (items per second at the median, e.g. history rows or members)
+- One more round runs under tracemalloc for the peak memory allocated during the call (Python objects and
+  NumPy/pandas arrays), it is not timed
+- --save writes the results as JSON, --compare checks them against saved results and exits with status 1 when a
+  case is slower (median) or needs more peak memory than the tolerances allow
+
+Cases:
+- part1: load_levels_full_inputs (Parquet cache), build_levels_full
+- part2: load_data (CSV and Parquet cache), MemberProductsIndex, get_member_products_by_category (index and DataFrame
+  scan), every eligibility rule (per member and as a vectorized mask), score_batch and score_member for both models
+
+Both parts have a models package (the root dataclasses for part 1, the propensity models for part 2), so each part
+runs in its own process, with its directory on the module search path.
+
+Usage (the data is generated into a temporary directory, or read from --data-dir):
+    cd analytics/benchmarks
+    python benchmark_suite.py --members 100000 --save baseline.json
+    python benchmark_suite.py --members 100000 --compare baseline.json
+"""
+
+PARTS = ['part1', 'part2']
+
+# Bump when the cases or their items change, results of another version are not compared
+RESULTS_VERSION = 1
+
+@dataclass
+class Case:
+    """
+    One benchmark: run() is timed, setup() (untimed) runs before every round, e.g. to clear a cache
+    items: number of items (of unit) processed by one run, for the throughput
+    """
+    name: str
+    run: object
+    items: int
+    unit: str
+    setup: object = None
+
+@dataclass
+class Result:
+    name: str
+    part: str
+    items: int
+    unit: str
+    rounds: int
+    min: float
+    median: float
+    mean: float
+    stddev: float
+    throughput: float
+    peak_bytes: int
+
+def traced(run, *args) -> tuple:
+    """
+    Runs run(*args) once under tracemalloc (allocations of Python objects and NumPy/pandas arrays), also used by the
+    standalone benchmarks of part 1
+    Returns (result, bytes still allocated after the call, e.g. by the result, peak bytes during the call, seconds)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = run(*args)
+    elapsed = time.perf_counter() - start
+    held_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held_bytes, peak_bytes, elapsed
+
+def measure(case: Case, part: str, rounds: int) -> Result:
+    """
+    Times case.run over rounds (after one warmup round), then measures its peak memory in one more round
+    """
+    def run_round():
+        if case.setup is not None:
+            case.setup()
+        gc.collect()
+        start = time.perf_counter()
+        case.run()
+        return time.perf_counter() - start
+
+    run_round()     # Warmup: imports, caches and lazily built models
+    times = [run_round() for _ in range(rounds)]
+
+    # Peak memory: tracemalloc slows allocations down, so this round is not timed
+    if case.setup is not None:
+        case.setup()
+    _, _, peak_bytes, _ = traced(case.run)
+
+    median = statistics.median(times)
+    return Result(
+        name=case.name, part=part, items=case.items, unit=case.unit, rounds=rounds,
+        min=min(times), median=median, mean=statistics.mean(times), stddev=statistics.stdev(times) if rounds > 1 else 0.0,
+        throughput=case.items / median if median > 0 else float('inf'), peak_bytes=peak_bytes,
+    )
+
+def part1_cases(data_dir: str) -> list:
+    # Imported here: only the part1 process has analytics/part1 and the repository root on its module search path
+    from levels_full_io import load_levels_full_inputs
+    from levels_full import build_levels_full
+
+    inputs = load_levels_full_inputs(data_dir)   # Also writes the Parquet cache
+    history_rows = len(inputs[2])
+    return [
+        Case('load_levels_full_inputs[parquet cache]', lambda: load_levels_full_inputs(data_dir), history_rows, 'history rows'),
+        Case('build_levels_full', lambda: build_levels_full(*inputs), history_rows, 'history rows'),
+    ]
+
+def part2_cases(data_dir: str, sample: int) -> list:
+    # Imported here: only the part2 process has analytics/part2 on its module search path
+    from components.data_ingestion import load_data, get_member_products_by_category, MemberProductsIndex
+    from components.eligibility import eligibility_rules, eligibility_mask
+    from components.eligibility_engine import RuleEvaluationCache
+    from components.product_status_logic import data_reference_date
+    from globals import PRODUCT_CATEGORIES_LIST
+    from models.rules_based_model import RulesBasedPropensityModel
+    from models.ml_model import MLPropensityModel
+    from models.system import PropensityScoringSystem
+    from table_io import cache_file, MEMBERS_SCHEMA, MEMBER_PRODUCT_ACCOUNTS_SCHEMA
+
+    members_file = os.path.join(data_dir, 'members.csv')
+    products_file = os.path.join(data_dir, 'member_product_accounts.csv')
+    cache_files = [cache_file(members_file, MEMBERS_SCHEMA), cache_file(products_file, MEMBER_PRODUCT_ACCOUNTS_SCHEMA)]
+    def remove_cache():
+        for parquet_file in cache_files:
+            if os.path.exists(parquet_file):
+                os.remove(parquet_file)
+
+    remove_cache()
+    members_df, member_products_df = load_data(members_file, products_file)
+    members_df['member_id'] = members_df['member_id'].astype(str)
+    member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+    loaded_rows = len(members_df) + len(member_products_df)
+
+    member_products_index = MemberProductsIndex(member_products_df)
+    sample_members = members_df.head(sample)
+    sample_records = sample_members.to_dict('records')
+    sample_products = [get_member_products_by_category(member['member_id'], member_products_index) for member in sample_records]
+    scan_members = sample_members['member_id'].head(20).tolist()
+    categories, propensity_types = sorted(PRODUCT_CATEGORIES_LIST), ['growth', 'churn']
+
+    # Every case scores at the data load timestamp, fixed once
+    as_of = data_reference_date(member_products_df)
+    system = PropensityScoringSystem(as_of=as_of)
+    system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+    system.add_model('ml', MLPropensityModel(None, eligibility_rules))
+
+    cases = [
+        Case('load_data[csv]', lambda: load_data(members_file, products_file), loaded_rows, 'rows', setup=remove_cache),
+        Case('load_data[parquet cache]', lambda: load_data(members_file, products_file), loaded_rows, 'rows'),
+        Case('MemberProductsIndex', lambda: MemberProductsIndex(member_products_df), len(member_products_df), 'accounts'),
+        Case('get_member_products_by_category[index]', lambda: [get_member_products_by_category(member_id, member_products_index) for member_id in sample_members['member_id']], len(sample_members), 'members'),
+        Case('get_member_products_by_category[scan]', lambda: [get_member_products_by_category(member_id, member_products_df) for member_id in scan_members], len(scan_members), 'members'),
+    ]
+
+    for category, rule in sorted(eligibility_rules.items()):
+        # The rule of one category for every member, growth and churn: called per member, and as a vectorized mask
+        def per_member(rule=rule, category=category):
+            for member, products in zip(sample_records, sample_products):
+                for propensity_type in propensity_types:
+                    rule(member, products[category], propensity_type, as_of)
+        def mask(rule=rule, category=category):
+            cache = RuleEvaluationCache(members_df, as_of=as_of)
+            category_products = cache.category_products(category, member_products_df)
+            for propensity_type in propensity_types:
+                eligibility_mask(rule, members_df, category_products, propensity_type, cache)
+        cases.append(Case(f"eligibility[{category}]", per_member, len(sample_records) * len(propensity_types), 'checks'))
+        cases.append(Case(f"eligibility_mask[{category}]", mask, len(members_df) * len(propensity_types), 'checks'))
+
+    for model_name in system.models:
+        def score_batch(model_name=model_name):
+            system.score_batch(members_df, member_products_df, categories, propensity_types, model_name)
+        def score_member(model_name=model_name):
+            for member, products in zip(sample_records, sample_products):
+                for category in categories:
+                    for propensity_type in propensity_types:
+                        system.score_member(member, products[category], category, propensity_type, model_name)
+        # Cached eligibility is dropped before every round, so every round scores from scratch
+        cases.append(Case(f"score_batch[{model_name}]", score_batch, len(members_df), 'members', setup=system.invalidate_eligibility))
+        cases.append(Case(f"score_member[{model_name}]", score_member, len(sample_records), 'members', setup=system.invalidate_eligibility))
+
+    return cases
+
+def run_part(part: str, data_dir: str, rounds: int, sample: int, only: str = None) -> list:
+    """
+    Runs the cases of one part in this process (see the module docstring), only: substring of the case names to run
+    """
+    part_dir = os.path.join(analytics_dir, part)
+    for path in [part_dir, root_dir] if part == 'part1' else [part_dir]:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    # Relative paths used by the parts (e.g. the feature store directory) stay inside the part
+    os.chdir(part_dir)
+
+    cases = part1_cases(data_dir) if part == 'part1' else part2_cases(data_dir, sample)
+    results = []
+    for case in cases:
+        if only is None or only in case.name:
+            results.append(measure(case, part, rounds))
+            print(f"  {part}: {case.name} done", file=sys.stderr, flush=True)
+    return results
+
+def run_suite(data_dir: str, rounds: int, sample: int, parts: list = PARTS, only: str = None) -> list:
+    """
+    Runs every part in its own process, returns the results of all of them as dicts
+    """
+    results = []
+    for part in parts:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            output_file = f.name
+        try:
+            command = [sys.executable, os.path.abspath(__file__), '--run-part', part, '--data-dir', data_dir,
+                       '--rounds', str(rounds), '--sample', str(sample), '--output', output_file]
+            if only is not None:
+                command += ['--only', only]
+            subprocess.run(command, check=True)
+            with open(output_file) as f:
+                results.extend(json.load(f))
+        finally:
+            os.remove(output_file)
+    return results
+
+def compare(results: list, baseline: list, time_tolerance: float, memory_tolerance: float) -> list:
+    """
+    Regressions of results against baseline (cases matched by part and name): a median time above the baseline median
+    by more than time_tolerance (a fraction, 0.25 = 25%), or a peak memory above the baseline by more than memory_tolerance
+    """
+    baseline = {(result['part'], result['name']): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['part'], result['name']))
+        if previous is None:
+            continue
+        if result['median'] > previous['median'] * (1 + time_tolerance):
+            regressions.append(f"{result['part']}: {result['name']}: median {result['median'] * 1000:.1f}ms, was {previous['median'] * 1000:.1f}ms")
+        if result['peak_bytes'] > previous['peak_bytes'] * (1 + memory_tolerance):
+            regressions.append(f"{result['part']}: {result['name']}: peak memory {result['peak_bytes'] / 2**20:.1f}MB, was {previous['peak_bytes'] / 2**20:.1f}MB")
+    return regressions
+
+def print_results(results: list):
+    print(f"{'Name':48} {'Min (ms)':>10} {'Median (ms)':>12} {'Mean (ms)':>10} {'StdDev':>8} {'Rounds':>6} {'Throughput':>24} {'Peak (MB)':>10}")
+    for result in results:
+        name = f"{result['part']}: {result['name']}"
+        throughput = f"{result['throughput']:,.0f} {result['unit']}/s"
+        print(f"{name:48} {result['min'] * 1000:10.2f} {result['median'] * 1000:12.2f} {result['mean'] * 1000:10.2f} "
+              f"{result['stddev'] * 1000:8.2f} {result['rounds']:6d} {throughput:>24} {result['peak_bytes'] / 2**20:10.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', type=int, default=100000, help="members of the generated data")
+    parser.add_argument('--data-dir', default=None, help="use the data in this directory (e.g. written by synthetic_data.py) instead of generating it")
+    parser.add_argument('--rounds', type=int, default=5, help="timed rounds per case")
+    parser.add_argument('--sample', type=int, default=10000, help="members looked up and scored one at a time by the per-member cases")
+    parser.add_argument('--parts', default=','.join(PARTS), help="comma-separated parts to run")
+    parser.add_argument('--only', default=None, help="only run the cases whose name contains this string")
+    parser.add_argument('--save', default=None, help="write the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="results JSON file to compare against, exits with status 1 on a regression")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="allowed increase of the median time, as a fraction")
+    parser.add_argument('--memory-tolerance', type=float, default=0.1, help="allowed increase of the peak memory, as a fraction")
+    parser.add_argument('--run-part', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--output', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_part is not None:
+        # Child process of run_suite
+        results = run_part(args.run_part, args.data_dir, args.rounds, args.sample, args.only)
+        with open(args.output, 'w') as f:
+            json.dump([asdict(result) for result in results], f)
+        sys.exit(0)
+
+    from synthetic_data import write_dataset
+
+    data_dir = args.data_dir
+    generated_dir = None
+    if data_dir is None:
+        generated_dir = data_dir = tempfile.mkdtemp(prefix='benchmark_data_')
+        start = time.perf_counter()
+        rows = write_dataset(data_dir, args.members)
+        print(f"Generated {args.members} members ({', '.join(f'{name}: {n_rows}' for name, n_rows in rows.items())}) in {time.perf_counter() - start:.1f}s")
+    data_dir = os.path.abspath(data_dir)
+
+    try:
+        results = run_suite(data_dir, args.rounds, args.sample, args.parts.split(','), args.only)
+    finally:
+        if generated_dir is not None:
+            shutil.rmtree(generated_dir)
+
+    print_results(results)
+    run = {
+        'version': RESULTS_VERSION,
+        'members': args.members if args.data_dir is None else None,
+        'data_dir': args.data_dir,
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'benchmarks': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Results written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline.get('version'), baseline.get('members'), baseline.get('data_dir')) != (run['version'], run['members'], run['data_dir']):
+            print(f"{args.compare} was run on other data, not compared")
+        else:
+            regressions = compare(results, baseline['benchmarks'], args.time_tolerance, args.memory_tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                sys.exit(1)
+            print(f"No regressions against {args.compare}")
@@ -0,0 +1,236 @@
+import os
+import sys
+
+# Add the repository root (for models) to the module search path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+
+import argparse
+import dataclasses
+import numpy as np
+import pandas as pd
+from models.Level import Level
+from models.MemberLevelScore import MemberLevelScore
+from models.MemberProductAccount import MemberProductAccount
+
+"""
+Synthetic data generator for both analytics parts
+
+Generates the five input files of the data/ directory for one client, at any number of members:
+- levels.csv, member_level_scores.csv, member_level_scores_history.csv and member_product_accounts.csv have exactly
+  the fields of the models/ dataclasses (Level, MemberLevelScore, MemberProductAccount), in field order
+- members.csv has the member fields read by the part 2 eligibility rules and features (there is no model for it)
+- Values are written as in the sample data: '%Y-%m-%d' dates, '%Y-%m-%d %H:%M:%S.000' load timestamps, integer
+  member ids, product_category_id names mapped by PRODUCT_CATEGORIES (analytics/part2/globals.py), and a few
+  percent of missing values in the optional fields
+- The same arguments always generate the same data (seeded), every row is dated relative to the load timestamp
+
+Usage (number of members, then the output directory):
+    cd analytics/benchmarks
+    python synthetic_data.py 1000000 ../../data_1m
+"""
+
+CLIENT_ACCOUNT_ID = 'federal-cu'
+LOAD_TIMESTAMP = pd.Timestamp('2024-11-09')
+
+# (level_name, level_score_start, level_score_end), lowest level first
+LEVELS = [('F', 0, 18), ('E', 18, 35), ('D', 35, 52), ('C', 52, 69), ('B', 69, 86), ('A', 86, 101)]
+
+# Columns of members.csv
+MEMBER_COLUMNS = [
+    'client_account_id',
+    'member_id',
+    'member_in_good_standing',
+    'member_total_relationship_balance',
+    'member_estimated_income',
+    'member_current_type',
+    'member_tenure',
+]
+
+# product_category_id: share of the product accounts
+PRODUCT_SHARES = {
+    'Basic Checking': 0.20,
+    'Premium Checking': 0.08,
+    'Business Checking': 0.04,
+    'Regular Savings': 0.20,
+    'Money Market Savings': 0.05,
+    'Personal Loan': 0.10,
+    'Business Loan': 0.05,
+    'Basic CD': 0.06,
+    '12 Month Certificate': 0.05,
+    'Credit Card': 0.12,
+    'Auto Loan': 0.05,
+}
+
+# Share of missing values in the optional fields
+MISSING_SHARE = 0.03
+
+# Certificate terms in days
+CERTIFICATE_TERMS = [90, 180, 365, 730, 1825]
+
+def _date_strings(dates: pd.DatetimeIndex, date_format: str) -> np.ndarray:
+    # Formats every distinct date once (dates repeat a lot), NaT becomes a missing value
+    codes, uniques = pd.factorize(dates)
+    formatted = np.append(uniques.strftime(date_format).to_numpy(dtype=object), np.nan)
+    return formatted[codes]
+
+def _with_missing(values: np.ndarray, rng: np.random.Generator, share: float = MISSING_SHARE) -> np.ndarray:
+    values = values.astype(float) if values.dtype.kind in 'iub' else values.copy()
+    values[rng.random(len(values)) < share] = np.nan
+    return values
+
+def _model_frame(model, columns: dict) -> pd.DataFrame:
+    """
+    DataFrame with the fields of a models/ dataclass as columns, in field order
+    Raises if a field has no generated values, or if a generated column is not a field of the model
+    """
+    fields = [field.name for field in dataclasses.fields(model)]
+    missing, unknown = set(fields) - set(columns), set(columns) - set(fields)
+    if missing or unknown:
+        raise ValueError(f"Generated columns do not match {model.__name__}: missing {sorted(missing)}, unknown {sorted(unknown)}")
+    return pd.DataFrame({field: columns[field] for field in fields})
+
+def generate_levels() -> pd.DataFrame:
+    return _model_frame(Level, {
+        'client_account_id': CLIENT_ACCOUNT_ID,
+        'level_id': [str(len(LEVELS) - i) for i in range(len(LEVELS))],
+        'level_name': [name for name, _, _ in LEVELS],
+        'level_score_start': [start for _, start, _ in LEVELS],
+        'level_score_end': [end for _, _, end in LEVELS],
+    })
+
+def generate_members(member_ids: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    n_members = len(member_ids)
+    return pd.DataFrame({
+        'client_account_id': CLIENT_ACCOUNT_ID,
+        'member_id': member_ids,
+        'member_in_good_standing': _with_missing((rng.random(n_members) < 0.9).astype(float), rng),
+        'member_total_relationship_balance': _with_missing(rng.exponential(30000, n_members).round(2), rng),
+        'member_estimated_income': _with_missing(np.maximum(rng.normal(55000, 25000, n_members), 0).round(0), rng),
+        'member_current_type': rng.choice(['personal', 'business', 'Business'], n_members, p=[0.75, 0.2, 0.05]),
+        'member_tenure': _with_missing(rng.integers(0, 25, n_members), rng),
+    }, columns=MEMBER_COLUMNS)
+
+def generate_member_level_scores(member_ids: np.ndarray, rng: np.random.Generator, load_timestamp: pd.Timestamp) -> pd.DataFrame:
+    """
+    One current score per member, scored the day before the load
+    """
+    n_members = len(member_ids)
+    return _model_frame(MemberLevelScore, {
+        'client_account_id': CLIENT_ACCOUNT_ID,
+        'member_id': member_ids,
+        'level_score_type': 'default',
+        'level_score': rng.uniform(0, 100, n_members).round(1),
+        'active_member': True,
+        'score_date': (load_timestamp - pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
+        'timestamp': load_timestamp.strftime('%Y-%m-%d %H:%M:%S.000'),
+    })
+
+def generate_member_level_scores_history(member_ids: np.ndarray, history_per_member: int, rng: np.random.Generator, load_timestamp: pd.Timestamp) -> pd.DataFrame:
+    """
+    About history_per_member scores per member over the 18 months before the load (each one loaded the day after it was
+    scored), 5% of them without a score, and 1% of the rows of members that are no longer current
+    """
+    n_rows = len(member_ids) * history_per_member
+    former_members = member_ids.max() + 1 + np.arange(max(len(member_ids) // 100, 1))
+    score_dates = load_timestamp.normalize() - pd.to_timedelta(rng.integers(1, 540, n_rows), unit='D')
+    return _model_frame(MemberLevelScore, {
+        'client_account_id': CLIENT_ACCOUNT_ID,
+        'member_id': np.where(rng.random(n_rows) < 0.01, rng.choice(former_members, n_rows), rng.choice(member_ids, n_rows)),
+        'level_score_type': 'default',
+        'level_score': _with_missing(rng.uniform(0, 100, n_rows).round(1), rng, 0.05),
+        'active_member': True,
+        'score_date': _date_strings(score_dates, '%Y-%m-%d'),
+        'timestamp': _date_strings(score_dates + pd.Timedelta(days=1), '%Y-%m-%d %H:%M:%S.000'),
+    })
+
+def generate_member_product_accounts(member_ids: np.ndarray, products_per_member: float, rng: np.random.Generator, load_timestamp: pd.Timestamp) -> pd.DataFrame:
+    """
+    A Poisson number of accounts per member (products_per_member on average) in random row order, opened up to 10 years
+    before the load, a quarter of them closed since. Terms are only set for certificates, monthly payments for loans
+    and credit limits for credit cards
+    """
+    member_account_ids = np.repeat(member_ids, rng.poisson(products_per_member, len(member_ids)))
+    n_accounts = len(member_account_ids)
+    products = list(PRODUCT_SHARES)
+    product_codes = rng.choice(len(products), n_accounts, p=list(PRODUCT_SHARES.values()))
+    product_names = np.array(products, dtype=object)[product_codes]
+    is_certificate = np.isin(product_names, ['Basic CD', '12 Month Certificate'])
+    is_loan = np.char.endswith(product_names.astype(str), 'Loan')
+
+    days_open = rng.integers(0, 3650, n_accounts)
+    open_dates = load_timestamp.normalize() - pd.to_timedelta(days_open, unit='D')
+    closed = rng.random(n_accounts) < 0.25
+    close_dates = (open_dates + pd.to_timedelta((rng.random(n_accounts) * days_open).astype(np.int64), unit='D')).where(closed)
+    original_balance = rng.exponential(8000, n_accounts).round(2)
+
+    return _model_frame(MemberProductAccount, {
+        'client_account_id': CLIENT_ACCOUNT_ID,
+        'account_id': np.arange(n_accounts),
+        'member_product_account_id': 1000000 + np.arange(n_accounts),
+        'member_id': rng.permutation(member_account_ids),
+        'product_id': product_codes + 1,
+        'product_category_id': product_names,
+        'account_open_date': _date_strings(open_dates.where(rng.random(n_accounts) >= MISSING_SHARE / 3), '%Y-%m-%d'),
+        'account_balance': _with_missing((original_balance * rng.uniform(0, 1.2, n_accounts)).round(2), rng),
+        'account_transaction_count': _with_missing(rng.poisson(6, n_accounts), rng),
+        'account_original_balance': _with_missing(original_balance, rng),
+        'account_close_date': _date_strings(close_dates, '%Y-%m-%d'),
+        'timestamp': load_timestamp.strftime('%Y-%m-%d %H:%M:%S.000'),
+        'product_rate': rng.uniform(0, 0.1, n_accounts).round(4),
+        'product_term': np.where(is_certificate, rng.choice(CERTIFICATE_TERMS, n_accounts), np.nan),
+        'monthly_payment': np.where(is_loan & (rng.random(n_accounts) < 0.8), rng.uniform(50, 900, n_accounts).round(2), np.nan),
+        'credit_limit': np.where(product_names == 'Credit Card', rng.choice([1000.0, 2500.0, 5000.0, 10000.0], n_accounts), np.nan),
+        'collateral_description': None,
+        'collateral_attrib_1': None,
+        'collateral_attrib_2': None,
+        'collateral_attrib_3': None,
+        'collateral_attrib_4': None,
+        'count': None,
+    })
+
+def generate_dataset(n_members: int, products_per_member: float = 3, history_per_member: int = 20, seed: int = 0, load_timestamp=LOAD_TIMESTAMP) -> dict:
+    """
+    Generates every input file as a DataFrame (values as they are written to the CSV files), keyed by file name
+    (without extension): levels, members, member_level_scores, member_level_scores_history, member_product_accounts
+    """
+    if n_members < 1:
+        raise ValueError(f"n_members must be at least 1, got {n_members}")
+    rng = np.random.default_rng(seed)
+    load_timestamp = pd.Timestamp(load_timestamp)
+    member_ids = rng.permutation(n_members) + 1000
+    return {
+        'levels': generate_levels(),
+        'members': generate_members(member_ids, rng),
+        'member_level_scores': generate_member_level_scores(member_ids, rng, load_timestamp),
+        'member_level_scores_history': generate_member_level_scores_history(member_ids, history_per_member, rng, load_timestamp),
+        'member_product_accounts': generate_member_product_accounts(member_ids, products_per_member, rng, load_timestamp),
+    }
+
+def write_dataset(data_dir: str, n_members: int, **options) -> dict:
+    """
+    Generates the dataset (see generate_dataset for the options) and writes one CSV file per input to data_dir
+    Returns the number of rows of every file
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    rows = {}
+    for name, df in generate_dataset(n_members, **options).items():
+        df.to_csv(os.path.join(data_dir, f"{name}.csv"), index=False)
+        rows[name] = len(df)
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('members', type=int, help="number of members")
+    parser.add_argument('data_dir', help="directory the CSV files are written to")
+    parser.add_argument('--products-per-member', type=float, default=3, help="average number of product accounts per member")
+    parser.add_argument('--history-per-member', type=int, default=20, help="score history records per member")
+    parser.add_argument('--seed', type=int, default=0, help="random seed, the same seed always generates the same data")
+    args = parser.parse_args()
+
+    rows = write_dataset(args.data_dir, args.members, products_per_member=args.products_per_member, history_per_member=args.history_per_member, seed=args.seed)
+    for name, n_rows in rows.items():
+        print(f"{name}.csv: {n_rows} rows")
@@ -0,0 +1,68 @@
+import os
+import sys
+
+# Add analytics/part1 (for levels_full) and the repository root (for models) to the module search path
+part1_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+root_dir = os.path.abspath(os.path.join(part1_dir, '../..'))
+
+for path in [part1_dir, root_dir]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+import time
+import numpy as np
+import pandas as pd
+from levels_full import assign_levels, level_boundaries
+
+"""
+Benchmark: level assignment
+
+Compares pd.cut over an IntervalIndex of the level score ranges (mapped back to level indices) with assign_levels
+(one searchsorted over the sorted level starts, int8 indices). Both must agree on every score, including missing scores,
+scores out of range and scores in a gap between two levels
+
+Usage (number of scores, default 1M 10M):
+    cd analytics/part1/benchmarks
+    python benchmark_level_assignment.py 1000000 10000000 50000000
+"""
+
+# Sample levels with a gap between D and C (50-54) and nothing from 101
+LEVELS = pd.DataFrame({
+    'level_name': ['F', 'E', 'D', 'C', 'B', 'A'],
+    'level_score_start': [0, 18, 36, 54, 72, 90],
+    'level_score_end': [18, 36, 50, 72, 90, 101],
+})
+
+def interval_level_indices(level_scores: pd.Series, levels: pd.DataFrame) -> np.ndarray:
+    """
+    Level indices with pd.cut and an IntervalIndex, mapped through the level names (-1 outside every level)
+    """
+    levels_intervals = pd.IntervalIndex.from_arrays(levels['level_score_start'], levels['level_score_end'], closed='left')
+    level_labels = levels['level_name'].astype(str).tolist()
+    level_order = {level: id for id, level in enumerate(level_labels)}
+    assigned_levels = pd.cut(level_scores, bins=levels_intervals, labels=level_labels, include_lowest=True, right=False)
+    assigned_levels = assigned_levels.cat.rename_categories(level_labels)
+    return assigned_levels.map(level_order).astype(float).fillna(-1).to_numpy(dtype=int)
+
+if __name__ == '__main__':
+    score_counts = [int(arg) for arg in sys.argv[1:]] or [1000000, 10000000]
+    level_bins = level_boundaries(LEVELS)
+
+    for n_scores in score_counts:
+        rng = np.random.default_rng(0)
+        # Scores from -5 to 110 (out of range on both sides), 5% missing
+        level_scores = pd.Series(np.where(rng.random(n_scores) < 0.05, np.nan, rng.uniform(-5, 110, n_scores).round(1)))
+
+        start = time.perf_counter()
+        expected = interval_level_indices(level_scores, LEVELS)
+        interval_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = assign_levels(level_scores, level_bins)
+        searchsorted_seconds = time.perf_counter() - start
+
+        assert actual.dtype == np.int8
+        np.testing.assert_array_equal(actual, expected)
+        print(f"{n_scores} scores: pd.cut + IntervalIndex {interval_seconds:.2f}s, searchsorted {searchsorted_seconds:.2f}s "
+              f"({expected.nbytes // actual.nbytes}x smaller indices)")
@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Add analytics/part1 (for levels_full), analytics (for table_io), analytics/benchmarks (for synthetic_data and
+# benchmark_suite) and the repository root (for models) to the module search path
+part1_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+analytics_dir = os.path.abspath(os.path.join(part1_dir, '..'))
+shared_benchmarks_dir = os.path.join(analytics_dir, 'benchmarks')
+root_dir = os.path.abspath(os.path.join(analytics_dir, '..'))
+
+for path in [part1_dir, analytics_dir, shared_benchmarks_dir, root_dir]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+import pandas as pd
+from levels_full import build_levels_full
+import levels_full_previous
+from synthetic_data import generate_dataset
+from benchmark_suite import traced
+from table_io import apply_schema, LEVELS_SCHEMA, MEMBER_LEVEL_SCORES_SCHEMA, MEMBER_PRODUCT_ACCOUNTS_SCHEMA
+
+"""
+Benchmark: peak memory of build_levels_full
+
+Compares build_levels_full (inputs left untouched, integer member codes, one pass over the history for all timelines)
+with the previous build_levels_full, unchanged in levels_full_previous.py (member_id cast to str in all four frames in
+place, dates parsed in place, a copy of the current scores, and a filtered, sorted and merged copy of the history per
+timeline). Both build the whole LevelsFull from the same inputs, generated by synthetic_data.py (~20 history records
+and ~3 accounts per member) and typed as load_levels_full_inputs reads them, and their results are checked to be equal
+
+Usage (row counts of the synthetic history, default 1M 5M 10M):
+    cd analytics/part1/benchmarks
+    python benchmark_levels_full_memory.py 1000000 10000000
+
+Peak memory is measured with tracemalloc (allocations made by NumPy/pandas during the call)
+"""
+
+HISTORY_PER_MEMBER = 20
+
+def synthetic_inputs(n_rows: int, seed: int = 0) -> tuple:
+    """
+    (levels, member_level_scores, member_level_scores_history, member_product_accounts) generated by synthetic_data.py
+    for about n_rows history records, typed as load_levels_full_inputs reads them
+    """
+    data = generate_dataset(max(n_rows // HISTORY_PER_MEMBER, 1), history_per_member=HISTORY_PER_MEMBER, seed=seed)
+    return (
+        apply_schema(data['levels'], LEVELS_SCHEMA),
+        apply_schema(data['member_level_scores'], MEMBER_LEVEL_SCORES_SCHEMA),
+        apply_schema(data['member_level_scores_history'], MEMBER_LEVEL_SCORES_SCHEMA),
+        apply_schema(data['member_product_accounts'], MEMBER_PRODUCT_ACCOUNTS_SCHEMA),
+    )
+
+if __name__ == '__main__':
+    row_counts = [int(arg) for arg in sys.argv[1:]] or [1000000, 5000000, 10000000]
+
+    for n_rows in row_counts:
+        levels, member_level_scores, member_level_scores_history, member_product_accounts = synthetic_inputs(n_rows)
+        # One history record per member and day: the previous build picks among same-day records with an unstable sort,
+        # so its results only match on histories without such ties
+        member_level_scores_history = member_level_scores_history.drop_duplicates(['member_id', 'score_date'], ignore_index=True)
+        inputs = (levels, member_level_scores, member_level_scores_history, member_product_accounts)
+        originals = [df.copy() for df in inputs]
+
+        levels_full, _, peak, elapsed = traced(build_levels_full, *inputs)
+        for df, original in zip(inputs, originals):
+            pd.testing.assert_frame_equal(df, original)     # build_levels_full leaves its inputs untouched
+
+        previous_levels_full, _, previous_peak, previous_elapsed = traced(levels_full_previous.build_levels_full, *originals)   # Modifies the copies
+        assert levels_full == previous_levels_full
+
+        print(f"{len(member_level_scores_history)} history rows, {len(member_level_scores)} members")
+        print(f"  previous build_levels_full: peak {previous_peak / 2**20:.0f}MB, {previous_elapsed:.2f}s")
+        print(f"  build_levels_full:          peak {peak / 2**20:.0f}MB, {elapsed:.2f}s")
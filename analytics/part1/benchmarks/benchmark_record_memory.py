@@ -0,0 +1,82 @@
+import os
+import sys
+
+# Add analytics (for table_io), analytics/benchmarks (for synthetic_data and benchmark_suite) and the repository root
+# (for models) to the module search path
+analytics_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+shared_benchmarks_dir = os.path.join(analytics_dir, 'benchmarks')
+root_dir = os.path.abspath(os.path.join(analytics_dir, '..'))
+
+for path in [analytics_dir, shared_benchmarks_dir, root_dir]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+import numpy as np
+import pandas as pd
+from models.MemberProductAccount import MemberProductAccount, FrozenMemberProductAccount
+from models.RecordArrays import MemberProductAccounts
+from synthetic_data import generate_member_product_accounts, LOAD_TIMESTAMP
+from benchmark_suite import traced
+from table_io import apply_schema, MEMBER_PRODUCT_ACCOUNTS_SCHEMA
+
+"""
+Benchmark: memory per MemberProductAccount record
+
+Builds the product accounts generated by synthetic_data.py (typed as load_data reads them) as:
+- dict rows (df.to_dict('records'), how part 2 passes product records around)
+- MemberProductAccount (dict-backed dataclass)
+- FrozenMemberProductAccount (slotted, frozen dataclass)
+- MemberProductAccounts (struct-of-arrays container)
+and reports the memory held per record and the build time.
+
+Usage (number of accounts, default 1M):
+    cd analytics/part1/benchmarks
+    python benchmark_record_memory.py 1000000
+
+Memory is measured with tracemalloc (Python objects and NumPy/pandas arrays allocated while building)
+"""
+
+PRODUCTS_PER_MEMBER = 3
+
+def synthetic_accounts(n_accounts: int, seed: int = 0) -> pd.DataFrame:
+    """
+    About n_accounts member_product_accounts generated by synthetic_data.py (~3 accounts per member, a quarter of them
+    closed, optional fields mostly empty as in the sample data)
+    """
+    rng = np.random.default_rng(seed)
+    member_ids = np.arange(max(n_accounts // PRODUCTS_PER_MEMBER, 1)) + 1000
+    accounts = generate_member_product_accounts(member_ids, PRODUCTS_PER_MEMBER, rng, LOAD_TIMESTAMP)
+    return apply_schema(accounts, MEMBER_PRODUCT_ACCOUNTS_SCHEMA)
+
+def dict_rows(df: pd.DataFrame) -> list:
+    return df.to_dict('records')
+
+def dataclass_records(df: pd.DataFrame) -> list:
+    return [MemberProductAccount(**row) for row in df.to_dict('records')]
+
+def frozen_records(df: pd.DataFrame) -> list:
+    return [FrozenMemberProductAccount(**row) for row in df.to_dict('records')]
+
+def record_array(df: pd.DataFrame) -> MemberProductAccounts:
+    return MemberProductAccounts.from_dataframe(df)
+
+if __name__ == '__main__':
+    accounts_df = synthetic_accounts(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
+    n_accounts = len(accounts_df)
+
+    # The container holds the same records as the dataclass list
+    sample = accounts_df.head(1000)
+    assert list(record_array(sample)) == list(MemberProductAccounts.from_records(dataclass_records(sample)))
+    pd.testing.assert_frame_equal(record_array(sample).to_dataframe(), MemberProductAccounts.from_records(list(record_array(sample))).to_dataframe())
+
+    print(f"{n_accounts} accounts (DataFrame: {accounts_df.memory_usage(deep=True).sum() / n_accounts:.0f} bytes/record)")
+    for name, build in [
+        ('dict rows', dict_rows),
+        ('MemberProductAccount', dataclass_records),
+        ('FrozenMemberProductAccount', frozen_records),
+        ('MemberProductAccounts', record_array),
+    ]:
+        collection, held, peak, elapsed = traced(build, accounts_df)
+        del collection
+        print(f"{name}: {held / n_accounts:.0f} bytes/record ({held / 2**20:.0f}MB), peak {peak / 2**20:.0f}MB, {elapsed:.2f}s")
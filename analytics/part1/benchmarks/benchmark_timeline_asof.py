@@ -0,0 +1,63 @@
+import os
+import sys
+
+# Add analytics/part1 (for levels_full), analytics (for table_io), analytics/benchmarks (for synthetic_data and
+# benchmark_suite) and the repository root (for models) to the module search path
+part1_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+analytics_dir = os.path.abspath(os.path.join(part1_dir, '..'))
+shared_benchmarks_dir = os.path.join(analytics_dir, 'benchmarks')
+root_dir = os.path.abspath(os.path.join(analytics_dir, '..'))
+
+for path in [part1_dir, analytics_dir, shared_benchmarks_dir, root_dir]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+import numpy as np
+import pandas as pd
+from levels_full import latest_scores_as_of, latest_scores_by_timeline, timeline_cutoffs
+from synthetic_data import generate_member_level_scores_history, LOAD_TIMESTAMP
+from benchmark_suite import traced
+from table_io import apply_schema, MEMBER_LEVEL_SCORES_SCHEMA
+
+"""
+Benchmark: latest historical score per member for every Timeline cutoff
+
+Compares the per-timeline loop (filter + sort + groupby.last once per timeline) with the single-pass
+as-of lookup used by build_levels_full (one sort + one searchsorted over all cutoffs), on the member_level_scores_history
+of synthetic_data.py (~20 records per member), with the column types load_levels_full_inputs reads it with
+
+Usage (row counts of the synthetic history, default 1M 5M 10M):
+    cd analytics/part1/benchmarks
+    python benchmark_timeline_asof.py 1000000 10000000 50000000
+
+Peak memory is measured with tracemalloc (allocations made by NumPy/pandas during the call)
+"""
+
+HISTORY_PER_MEMBER = 20
+
+def synthetic_history(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    About n_rows history records generated by synthetic_data.py, typed as load_levels_full_inputs reads them
+    """
+    rng = np.random.default_rng(seed)
+    member_ids = np.arange(max(n_rows // HISTORY_PER_MEMBER, 1)) + 1000
+    history = generate_member_level_scores_history(member_ids, HISTORY_PER_MEMBER, rng, LOAD_TIMESTAMP)
+    return apply_schema(history[['member_id', 'level_score', 'score_date']], MEMBER_LEVEL_SCORES_SCHEMA)
+
+def per_timeline_loop(history: pd.DataFrame, cutoffs: dict) -> dict:
+    return {timeline_val: latest_scores_as_of(history, cutoff_date) for timeline_val, cutoff_date in cutoffs.items()}
+
+if __name__ == '__main__':
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 5_000_000, 10_000_000]
+    cutoffs = timeline_cutoffs(LOAD_TIMESTAMP)
+
+    print(f"{'rows':>12} | {'method':<18} | {'seconds':>8} | {'peak MB':>8}")
+    print("-" * 56)
+    for n_rows in sizes:
+        history = synthetic_history(n_rows)
+        for name, fn in [('per-timeline loop', per_timeline_loop), ('single pass', latest_scores_by_timeline)]:
+            _, _, peak, elapsed = traced(fn, history, cutoffs)
+            print(f"{n_rows:>12,} | {name:<18} | {elapsed:>8.2f} | {peak / 2**20:>8.0f}")
+        del history
@@ -8,8 +8,8 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 
+import numpy as np
 import pandas as pd
-import pprint
 import json
 from datetime import datetime, timedelta
 from models.Level import Level
@@ -18,58 +18,14 @@ from models.MemberProductAccount import MemberProductAccount
 from models.LevelsFull import LevelsFull, LevelData, Movement
 from models.StandardChartData import StandardChartData, StandardDataPoint
 from models.Timeline import Timeline
+from levels_full_io import load_levels_full_inputs
+from levels_full_serialization import write_levels_full
 
-def build_levels_full(levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame) -> LevelsFull:
+def timeline_cutoffs(current_date: pd.Timestamp) -> dict:
+    """
+    Returns the cutoff date of every Timeline checkpoint, relative to the reference current date
+    """
 
-    # Convert member_id to string for consistency across DataFrames.
-    for df in [levels, member_level_scores, member_level_scores_history, member_product_accounts]:
-        if 'member_id' in df.columns:
-            df['member_id'] = df['member_id'].astype(str)
-    
-    # Ensure date fields are treated as "datetime" objects for future datetime operations
-    if 'score_date' in member_level_scores.columns:
-        member_level_scores['score_date'] = pd.to_datetime(member_level_scores['score_date'], errors='coerce')
-    if 'timestamp' in member_level_scores.columns:
-        member_level_scores['timestamp'] = pd.to_datetime(member_level_scores['timestamp'], errors='coerce')
-    member_level_scores_history['score_date'] = pd.to_datetime(member_level_scores_history['score_date'], errors='coerce')
-    
-    # Creating copy of member_level_scores dataframe as the dataframe will be manipulated later
-    current_scores = member_level_scores.copy()
-    
-    # Sort levels by score (lowest threshold to highest threshold)
-    levels = levels.sort_values('level_score_start').reset_index(drop=True)
-    level_order = {level: id for id, level in enumerate(levels['level_name'])}
-    
-    # Create an IntervalIndex for level boundaries (using left-closed/left-inclusive intervals)
-    levels_intervals = pd.IntervalIndex.from_arrays(
-        levels['level_score_start'],
-        levels['level_score_end'],
-        closed='left'
-    )
-    level_labels = levels['level_name'].astype(str).tolist()
-    
-    # Use pd.cut to assign levels to current_scores
-    current_scores['current_level'] = pd.cut(
-        current_scores['level_score'],
-        bins=levels_intervals,
-        labels=level_labels,
-        include_lowest=True,
-        right=False
-    )
-    # Applying level_names as labels for each interval
-    current_scores['current_level'] = current_scores['current_level'].cat.rename_categories(level_labels)
-    
-    # Map the current_level to a numeric index
-    # Indices are used to track member movement from one level to the next
-    current_scores['current_level_index'] = current_scores['current_level'].map(level_order)
-    
-    # Retrieving the reference current date to base the level timelines and movement off of
-    # Using the timestamp listed in the member_level_scores data (2024-11-09 00:00:00.000)
-    if 'timestamp' in current_scores.columns and current_scores['timestamp'].notnull().any():
-        current_date = current_scores['timestamp'].max()
-    else:
-        current_date = pd.Timestamp(datetime.now())
-    
     # Mapping Timeline attributes to numerical (day) values for datetime operations
     timeline_offsets = {
         Timeline.OneMonth.value: 30,
@@ -78,101 +34,309 @@ def build_levels_full(levels: pd.DataFrame, member_level_scores: pd.DataFrame, m
         Timeline.TwelveMonths.value: 365,
         Timeline.YearToDate.value: (current_date - pd.Timestamp(current_date.year, 1, 1)).days
     }
-    
-    # Dictionaries to store historical member counts and movement
-    history_counts = {level: {} for level in levels['level_name']}
-    movement_counts = {level: {} for level in levels['level_name']}
-    
-    # Iterate thru each timeline checkpoint
+
+    cutoffs = {}
     for timeline_val, offset in timeline_offsets.items():
         if timeline_val == Timeline.YearToDate.value:
-            cutoff_date = pd.Timestamp(current_date.year, 1, 1)
+            cutoffs[timeline_val] = pd.Timestamp(current_date.year, 1, 1)
         else:
-            cutoff_date = current_date - pd.Timedelta(days=offset)
-        
-        # Get historical records up to the cutoff date
-        hist_before_cutoff = member_level_scores_history[member_level_scores_history['score_date'] <= cutoff_date]
-        if hist_before_cutoff.empty:
-            for level in levels['level_name']:
-                history_counts[level][timeline_val] = 0
-                movement_counts[level][timeline_val] = {'growth': 0, 'churn': 0}
+            cutoffs[timeline_val] = current_date - pd.Timedelta(days=offset)
+    return cutoffs
+
+def latest_scores_as_of(member_level_scores_history: pd.DataFrame, cutoff_date: pd.Timestamp) -> pd.DataFrame:
+    """
+    For each member, get latest record at or before the cutoff
+    (groupby.last keeps the latest non-null value of each column)
+    Reference implementation for one cutoff, build_levels_full uses latest_scores_by_timeline for all cutoffs at once
+    """
+
+    # Get historical records up to the cutoff date
+    hist_before_cutoff = member_level_scores_history[member_level_scores_history['score_date'] <= cutoff_date]
+    # Stable sort, so for records with the same score_date the one loaded last wins
+    return hist_before_cutoff.sort_values('score_date', kind='stable').groupby('member_id', as_index=False).last()
+
+def parsed_dates(dates: pd.Series) -> pd.Series:
+    """
+    Dates as datetime64: the column itself when it is already parsed (e.g. by levels_full_io), else a parsed copy
+    Unparseable dates become NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates, errors='coerce')
+
+def encode_member_ids(member_ids: pd.Series, categories: pd.Index = None) -> pd.Categorical:
+    """
+    Member ids as a categorical of their str values, so ids read as int, str or categorical match across inputs
+    - categories: the member ids to encode against (ids not in them get code -1), None uses the distinct ids
+    Only the distinct ids are converted to str, every row keeps an integer code
+    """
+    codes, uniques = pd.factorize(member_ids, use_na_sentinel=False)
+    uniques = pd.Index(uniques).astype(str)
+    if categories is None:
+        categories = uniques.unique()
+    positions = categories.get_indexer(uniques)
+    return pd.Categorical.from_codes(positions[codes], categories=categories)
+
+def latest_scores_by_timeline(member_level_scores_history: pd.DataFrame, cutoffs: dict) -> dict:
+    """
+    Single-pass version of latest_scores_as_of for every timeline cutoff at once
+    - The history is sorted once by (member_id, score_date)
+    - Each member's latest record at every cutoff is found with one vectorized searchsorted over all cutoffs
+    Only the member_id, level_score and score_date columns are read (score_date does not need to be parsed)
+
+    Returns a dictionary with
+    - Key: timeline value
+    - Value: DataFrame of member_id, level_score (latest non-null score at or before the cutoff) and score_date (date of that score)
+    Members whose records before the cutoff all have a null score are included with a missing level_score, like groupby.last()
+    """
+
+    score_dates = parsed_dates(member_level_scores_history['score_date']).to_numpy(dtype='datetime64[ns]')
+    level_scores = member_level_scores_history['level_score'].to_numpy(dtype=float)
+    history_member_ids = member_level_scores_history['member_id']
+    dated = ~np.isnat(score_dates)
+    if not dated.all():     # Records without a score_date are never part of a timeline
+        score_dates, level_scores, history_member_ids = score_dates[dated], level_scores[dated], history_member_ids[dated]
+    member_codes, member_ids = pd.factorize(history_member_ids, use_na_sentinel=False)
+    date_ranks, unique_dates = pd.factorize(score_dates, sort=True)
+    n_dates = max(len(unique_dates), 1)
+    members = np.arange(len(member_ids))
+    member_keys = members.astype(np.int64) * n_dates
+
+    # Records keyed by (member, score_date rank) and sorted once, stable so records with the same score_date keep their load order
+    # Temporaries are released as soon as possible, the peak memory is a few integer arrays of the history length
+    keys = member_codes.astype(np.int64, copy=False) * n_dates + date_ranks
+    del member_codes, date_ranks
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    del keys
+
+    # Earliest record of each member, a member is part of a timeline once it has any record at or before the cutoff
+    first_rank = sorted_keys[np.searchsorted(sorted_keys, member_keys, side='left')] - member_keys
+
+    # Records with a score, a single sorted array of keys covers every member
+    scored = ~np.isnan(level_scores)[order]
+    scored_keys = sorted_keys[scored]
+    scored_rows = order[scored]
+    del order, sorted_keys, scored
+    scored_levels = level_scores[scored_rows]
+    scored_dates = score_dates[scored_rows]
+    del scored_rows
+
+    # Number of distinct score dates at or before each cutoff, for all cutoffs at once
+    cutoff_values = np.array([np.datetime64(cutoff, 'ns') for cutoff in cutoffs.values()], dtype='datetime64[ns]')
+    cutoff_ranks = np.searchsorted(unique_dates, cutoff_values, side='right')
+
+    # Position of every member's latest scored record at every cutoff (members x cutoffs)
+    latest_positions = np.searchsorted(scored_keys, member_keys[:, None] + cutoff_ranks[None, :], side='left') - 1
+    has_score = latest_positions >= np.searchsorted(scored_keys, member_keys, side='left')[:, None]
+    in_timeline = first_rank[:, None] < cutoff_ranks[None, :]
+
+    latest_by_timeline = {}
+    for i, timeline_val in enumerate(cutoffs):
+        rows = in_timeline[:, i]
+        positions = latest_positions[rows, i]
+        found = has_score[rows, i]
+        latest_by_timeline[timeline_val] = pd.DataFrame({
+            'member_id': member_ids[rows],
+            'level_score': np.where(found, scored_levels[positions], np.nan),
+            'score_date': np.where(found, scored_dates[positions], np.datetime64('NaT', 'ns')),
+        })
+    return latest_by_timeline
+
+def prepare_levels_full_inputs(levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame, current_date: pd.Timestamp = None):
+    """
+    Returns the level definitions, the current scores with their level assignments and the reference current date
+    (current_date if given, else the data load timestamp of member_level_scores, else now)
+    The inputs are not modified: current_scores is a new frame with the member ids encoded once (see encode_member_ids)
+    and the level index of every current score (-1 outside of every level)
+    """
+    
+    # Sort levels by score (lowest threshold to highest threshold)
+    levels = levels.sort_values('level_score_start').reset_index(drop=True)
+    
+    # Level boundaries (left-closed/left-inclusive score ranges), the level index of a score is its position in the sorted levels
+    level_bins = level_boundaries(levels)
+    
+    # Assign levels to the current scores
+    current_scores = pd.DataFrame({
+        'member_id': encode_member_ids(member_level_scores['member_id']),
+        'current_level_index': assign_levels(member_level_scores['level_score'], level_bins),
+    })
+    
+    # Retrieving the reference current date to base the level timelines and movement off of
+    # Using the timestamp listed in the member_level_scores data (2024-11-09 00:00:00.000)
+    if current_date is None:
+        current_date = reference_current_date(member_level_scores)
+    if current_date is None:
+        current_date = datetime.now()
+    current_date = pd.Timestamp(current_date)
+
+    return levels, level_bins, current_scores, current_date
+
+def reference_current_date(member_level_scores: pd.DataFrame):
+    """
+    Data load timestamp of the current scores (latest 'timestamp'), None if the data has none
+    """
+    if 'timestamp' in member_level_scores.columns:
+        timestamps = pd.to_datetime(member_level_scores['timestamp'], errors='coerce')
+        if timestamps.notnull().any():
+            return timestamps.max()
+    return None
+
+def level_boundaries(levels: pd.DataFrame) -> tuple:
+    """
+    (starts, ends) of the score range of every level, each level covering the scores start <= score < end
+    levels must be sorted by level_score_start, gaps between levels are allowed but overlapping levels raise a ValueError
+    """
+    starts = levels['level_score_start'].to_numpy(dtype=float)
+    ends = levels['level_score_end'].to_numpy(dtype=float)
+    if np.any(np.diff(starts) < 0):
+        raise ValueError("Levels must be sorted by level_score_start")
+    overlaps = np.flatnonzero(starts[1:] < ends[:-1])
+    if len(overlaps) > 0:
+        first = overlaps[0]
+        raise ValueError(f"Overlapping levels: {levels['level_name'].iloc[first]} and {levels['level_name'].iloc[first + 1]}")
+    return starts, ends
+
+def level_index_dtype(n_levels: int):
+    """
+    Smallest signed integer type holding every level index and -1 (int8 up to 127 levels)
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_levels <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def assign_levels(level_scores: pd.Series, level_bins: tuple) -> np.ndarray:
+    """
+    Assigns levels to scores using the level boundaries (see level_boundaries), with one searchsorted over the level starts
+    Returns the level index of every score (position in the sorted levels) as int8
+    Missing scores, scores below the first level, from the end of the last level and in a gap between two levels get -1
+    Indices are used to track member movement from one level to the next
+    """
+    starts, ends = level_bins
+    scores = pd.Series(level_scores, copy=False).to_numpy(dtype=float, na_value=np.nan)
+    if len(starts) == 0:
+        return np.full(len(scores), -1, dtype=np.int8)
+
+    # Last level starting at or below each score, the score is in that level if it is also below the level's end
+    # (NaN scores sort after every start and fail the end comparison)
+    level_index = np.searchsorted(starts, scores, side='right') - 1
+    in_level = (level_index >= 0) & (scores < ends[np.maximum(level_index, 0)])
+    return np.where(in_level, level_index, -1).astype(level_index_dtype(len(starts)))
+
+def build_levels_full(levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame, current_date: pd.Timestamp = None) -> LevelsFull:
+    """
+    Builds the LevelsFull metric, with the timelines measured back from current_date
+    (None uses the data load timestamp of member_level_scores, see prepare_levels_full_inputs)
+    """
+
+    levels, level_bins, current_scores, current_date = prepare_levels_full_inputs(levels, member_level_scores, member_level_scores_history, member_product_accounts, current_date)
+    
+    # For each timeline checkpoint, get each member's latest historical record up to the cutoff date (single pass over the history)
+    latest_by_timeline = latest_scores_by_timeline(member_level_scores_history, timeline_cutoffs(current_date))
+
+    return assemble_levels_full(levels, level_bins, current_scores, latest_by_timeline, member_product_accounts)
+
+def assemble_levels_full(levels: pd.DataFrame, level_bins: tuple, current_scores: pd.DataFrame, latest_by_timeline: dict, member_product_accounts: pd.DataFrame) -> LevelsFull:
+    """
+    Builds the LevelsFull metric from the current scores and each member's latest historical record per timeline
+    All per-level counts are computed with a few groupby/bincount operations over level indices instead of one scan per level
+    """
+
+    n_levels = len(levels)
+    timeline_vals = list(latest_by_timeline)
+
+    # Current rows that fall in a level, as (member code, level index)
+    member_ids = current_scores['member_id'].array
+    n_members = max(len(member_ids.categories), 1)
+    current_level_index = current_scores['current_level_index'].to_numpy()
+    in_a_level = current_level_index >= 0
+    current_members = member_ids.codes[in_a_level]
+    current_levels = current_level_index[in_a_level].astype(np.int64)
+
+    # Current member count for every level (a member with several current rows in a level is counted once)
+    level_member_keys = np.unique(current_levels * n_members + current_members)
+    level_member_levels = level_member_keys // n_members
+    level_member_codes = level_member_keys % n_members
+    member_counts = np.bincount(level_member_levels, minlength=n_levels)
+
+    # Total product count of the members in every level
+    product_members = encode_member_ids(member_product_accounts['member_id'], member_ids.categories).codes
+    products_per_member = np.bincount(product_members[product_members >= 0], minlength=n_members)
+    total_products = np.bincount(level_member_levels, weights=products_per_member[level_member_codes], minlength=n_levels)
+
+    # Historical member counts and movement (levels x timelines)
+    history_counts = np.zeros((n_levels, len(timeline_vals)), dtype=int)
+    growth_counts = np.zeros((n_levels, len(timeline_vals)), dtype=int)
+    churn_counts = np.zeros((n_levels, len(timeline_vals)), dtype=int)
+    
+    # Iterate thru each timeline checkpoint
+    for t, hist_latest in enumerate(latest_by_timeline.values()):
+        if hist_latest.empty:
             continue
         
-        # For each member, get latest record at or before the cutoff
-        hist_latest = hist_before_cutoff.sort_values('score_date').groupby('member_id', as_index=False).last()
         # Use level score intervals on historical scores
-        hist_latest['historical_level'] = pd.cut(
-            hist_latest['level_score'],
-            bins=levels_intervals,
-            labels=level_labels,
-            include_lowest=True,
-            right=False
-        )
-        hist_latest['historical_level'] = hist_latest['historical_level'].cat.rename_categories(level_labels)
-        hist_latest['historical_level_index'] = hist_latest['historical_level'].map(level_order)
+        historical_level_index = assign_levels(hist_latest['level_score'], level_bins)
+
+        # Total members in which their latest historical level is each level
+        history_counts[:, t] = np.bincount(historical_level_index[historical_level_index >= 0], minlength=n_levels)
         
-        # Merge current and historical data on member_id
-        merged = pd.merge(current_scores, hist_latest[['member_id', 'historical_level', 'historical_level_index']], on='member_id', how='inner')
+        # Historical level of every current member, looked up by member code
+        # Members without a historical record before the cutoff are not compared
+        historical_members = encode_member_ids(hist_latest['member_id'], member_ids.categories).codes
+        known = historical_members >= 0
+        has_history = np.zeros(n_members, dtype=bool)
+        has_history[historical_members[known]] = True
+        historical_by_member = np.full(n_members, -1, dtype=np.int64)
+        historical_by_member[historical_members[known]] = historical_level_index[known]
+
+        compared = has_history[current_members]
+        current = current_levels[compared]
+        historical = historical_by_member[current_members[compared]]
         
         # Handle missing historical indices with the current index
         # In this case, historical level indices are being filled with the current level indices, but dropping the row would result in the same outcome
         # Ultimately, we must assume that the user did not move up or down any levels if we are met with NaN data for index
-        merged['historical_level_index'] = merged['historical_level_index'].fillna(merged['current_level_index'])
+        historical = np.where(historical >= 0, historical, current)
         
-        # For each level, compute historical count and movement
-        for level in levels['level_name']:
-
-            # Getting total members in which their latest historical level is the one being checked in the loop
-            hist_count = (hist_latest['historical_level'] == level).sum()
-            history_counts[level][timeline_val] = int(hist_count)
-            
-            # Filtering to only get members at level being checked by the loop
-            current_in_level = merged[merged['current_level'] == level]
-            
-            # Compare members' current level with their historical level from x time ago (timeline values)
-            growth = (current_in_level['historical_level_index'].astype(int) < current_in_level['current_level_index'].astype(int)).sum()
-            churn = (current_in_level['historical_level_index'].astype(int) > current_in_level['current_level_index'].astype(int)).sum()
-            movement_counts[level][timeline_val] = {'growth': int(growth), 'churn': int(churn)}
+        # Compare members' current level with their historical level from x time ago (timeline values), counted per current level
+        growth_counts[:, t] = np.bincount(current[historical < current], minlength=n_levels)
+        churn_counts[:, t] = np.bincount(current[historical > current], minlength=n_levels)
     
     # LevelData + LevelsFull assembly
     level_data_list = []
     for i, level_row in levels.iterrows():
-        level_name = level_row['level_name']
-        score_start = level_row['level_score_start']
-        score_end = level_row['level_score_end']
-        
-        # Current member count for this level
-        curr_members = current_scores[current_scores['current_level'] == level_name]
-        member_count = curr_members['member_id'].nunique()
+        member_count = int(member_counts[i])
         
         # Average product count for members in this level
         if member_count > 0:
-            total_products = member_product_accounts[member_product_accounts['member_id'].isin(curr_members['member_id'])].shape[0]
-            avg_product_count = round(total_products / member_count)   # Rounded to nearest whole number
+            avg_product_count = round(int(total_products[i]) / member_count)   # Rounded to nearest whole number
         else:
             avg_product_count = 0
         
         # Building member_count_history chart
-        history_points = []
-        for timeline_val, count in history_counts[level_name].items():
-            history_points.append(StandardDataPoint(key=timeline_val, value=count))
+        history_points = [
+            StandardDataPoint(key=timeline_val, value=int(history_counts[i, t]))
+            for t, timeline_val in enumerate(timeline_vals)
+        ]
         chart_data = StandardChartData(points=history_points)
         
         # Building Movement objects
         movements = []
-        for timeline_val, mv in movement_counts[level_name].items():
+        for t, timeline_val in enumerate(timeline_vals):
             try:
                 timeline_enum = Timeline(timeline_val)
             except ValueError:
                 continue
-            movements.append(Movement(timeline=timeline_enum.value, growth=mv['growth'], churn=mv['churn']))
+            movements.append(Movement(timeline=timeline_enum.value, growth=int(growth_counts[i, t]), churn=int(churn_counts[i, t])))
         
         # Final LevelData assembly
         level_data = LevelData(
-            level=level_name,
+            level=level_row['level_name'],
             member_count=member_count,
-            score_start=score_start,
-            score_end=score_end,
+            score_start=level_row['level_score_start'],
+            score_end=level_row['level_score_end'],
             avg_product_count=avg_product_count,
             member_count_history=chart_data,
             movement=movements
@@ -183,18 +347,13 @@ def build_levels_full(levels: pd.DataFrame, member_level_scores: pd.DataFrame, m
 
 if __name__ == '__main__':
 
-    # Load the CSV files into Dataframes
-    levels = pd.read_csv("../../data/levels.csv")
-    member_level_scores = pd.read_csv("../../data/member_level_scores.csv")
-    member_level_scores_history = pd.read_csv("../../data/member_level_scores_history.csv")
-    member_product_accounts = pd.read_csv("../../data/member_product_accounts.csv")
+    # Load the typed inputs (the CSV files are converted to a Parquet cache on the first run)
+    levels, member_level_scores, member_level_scores_history, member_product_accounts = load_levels_full_inputs("../../data")
     
     # Build the LevelsFull metric
     levels_full_metric = build_levels_full(levels, member_level_scores, member_level_scores_history, member_product_accounts)
     
-    # Print the final output
-    levels_full_output = pprint.pformat(levels_full_metric, width=610, indent=4, compact=False)
-    print(levels_full_output)
-
-    with open('levels_full.txt', 'w') as out:
-        out.write(levels_full_output)
+    # Write the final output: JSON by default, or the output file given as argument (.parquet for the flat table, .txt for pprint)
+    output_file = sys.argv[1] if len(sys.argv) > 1 else 'levels_full.json'
+    write_levels_full(levels_full_metric, output_file)
+    print(f"LevelsFull written to {output_file}")
@@ -0,0 +1,159 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import hashlib
+import time
+import pandas as pd
+from models.LevelsFull import LevelsFull
+from levels_full import build_levels_full, reference_current_date
+from levels_full_io import LEVELS_FULL_INPUTS, load_levels_full_inputs
+from levels_full_serialization import write_levels_full
+
+"""
+Persistent LevelsFull result cache
+
+A LevelsFull only depends on the four inputs and the reference current date, so results are stored on disk
+(one pickle per key in cache_dir) and reused until an input changes:
+  - build_levels_full_cached: keyed by a content hash of the four DataFrames
+  - load_levels_full_cached: keyed by the modification time and size of the four input files, a hit reads none of them
+Both add the current date to the key (the one passed in, or the data load timestamp of member_level_scores).
+Results built with current_date=now (no current_date and no timestamps in the data) are not stored.
+
+The cache keeps the max_entries most recently used results, older ones are evicted.
+
+Usage:
+    cache = LevelsFullCache('levels_full_cache')
+    levels_full_metric = load_levels_full_cached('../../data', cache)
+"""
+
+# Bump when build_levels_full changes its output, so results cached by an older version are not reused
+CACHE_VERSION = 1
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Content hash of a DataFrame (column names, dtypes and values, not the index)
+    """
+    digest = hashlib.sha1()
+    digest.update(repr([(column, str(dtype)) for column, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def file_fingerprint(file: str) -> str:
+    """
+    Cheap fingerprint of an input file: its absolute path, modification time and size
+    """
+    stat = os.stat(file)
+    return f"{os.path.abspath(file)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+def levels_full_cache_key(input_fingerprints: list, current_date=None) -> str:
+    """
+    Cache key of a LevelsFull: the fingerprints of its inputs, the reference current date (None: taken from the data)
+    and CACHE_VERSION
+    """
+    current_date = None if current_date is None else str(pd.Timestamp(current_date))
+    return hashlib.sha1(repr((input_fingerprints, current_date, CACHE_VERSION)).encode()).hexdigest()[:16]
+
+class LevelsFullCache:
+    """
+    On-disk LRU cache of LevelsFull results (one file per key in cache_dir, the file modification time is the last use)
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 32):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"levels_full_{key}.pkl")
+
+    def get(self, key: str):
+        """
+        Cached result for key, or None
+        """
+        path = self._path(key)
+        try:
+            result = pd.read_pickle(path)
+            os.utime(path)  # Most recently used
+        except FileNotFoundError:   # Never stored, or evicted by another process
+            return None
+        return result
+
+    def put(self, key: str, result):
+        """
+        Stores a result and evicts the least recently used entries beyond max_entries
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        # Written to a temporary file first so concurrent readers never see a partial result
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('levels_full_') and name.endswith('.pkl'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _build_and_store(cache: LevelsFullCache, key: str, inputs: tuple, current_date) -> LevelsFull:
+    # Without a current date from the caller or the data, the result depends on when it is built: not stored
+    storable = current_date is not None or reference_current_date(inputs[1]) is not None
+    levels_full = build_levels_full(*inputs, current_date=current_date)
+    if storable:
+        cache.put(key, levels_full)
+    return levels_full
+
+def build_levels_full_cached(levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame, cache: LevelsFullCache, current_date: pd.Timestamp = None) -> LevelsFull:
+    """
+    build_levels_full, reusing the cached result when the four DataFrames have the same content
+    Hashing the inputs takes a fraction of a build, load_levels_full_cached avoids reading them at all
+    """
+    inputs = (levels, member_level_scores, member_level_scores_history, member_product_accounts)
+    key = levels_full_cache_key([frame_fingerprint(df) for df in inputs], current_date)
+    levels_full = cache.get(key)
+    if levels_full is None:
+        levels_full = _build_and_store(cache, key, inputs, current_date)
+    return levels_full
+
+def load_levels_full_cached(data_dir: str, cache: LevelsFullCache, file_format: str = 'csv', current_date: pd.Timestamp = None) -> LevelsFull:
+    """
+    Loads the inputs from data_dir (see load_levels_full_inputs) and builds the LevelsFull, unless the input files
+    have not changed since a cached result was built: the result is then returned without reading them
+    """
+    files = [os.path.join(data_dir, f"{name}.{file_format}") for name in LEVELS_FULL_INPUTS]
+    key = levels_full_cache_key([file_fingerprint(file) for file in files], current_date)
+    levels_full = cache.get(key)
+    if levels_full is None:
+        levels_full = _build_and_store(cache, key, load_levels_full_inputs(data_dir, file_format), current_date)
+    return levels_full
+
+if __name__ == '__main__':
+
+    # Build the LevelsFull metric, or read it from the cache if the input files have not changed since the last run
+    start = time.perf_counter()
+    levels_full_metric = load_levels_full_cached("../../data", LevelsFullCache('levels_full_cache'))
+    print(f"LevelsFull ready in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # Write the final output: JSON by default, or the output file given as argument (.parquet for the flat table, .txt for pprint)
+    output_file = sys.argv[1] if len(sys.argv) > 1 else 'levels_full.json'
+    write_levels_full(levels_full_metric, output_file)
+    print(f"LevelsFull written to {output_file}")
@@ -0,0 +1,201 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import pandas as pd
+from models.LevelsFull import LevelsFull
+from levels_full import prepare_levels_full_inputs, reference_current_date, timeline_cutoffs, latest_scores_by_timeline, assemble_levels_full, encode_member_ids, parsed_dates
+from levels_full_io import read_levels_full_input
+from levels_full_serialization import write_levels_full
+
+"""
+Incremental Levels Full
+
+build_levels_full recomputes each member's latest historical score for every timeline from the whole history.
+This module keeps that result as a persisted state (per timeline: cutoff date + each member's latest score as of the cutoff)
+and, on every refresh, only processes:
+  - History rows from new data-loads (history 'timestamp' later than the last processed load)
+  - Already loaded rows that fall between a timeline's previous cutoff and its new cutoff (when the current date moved forward)
+load_levels_full_incremental only reads those rows: history_filters turns the state into Parquet read filters, so a
+refresh costs the new rows (plus the rows the cutoffs moved over), not the whole history.
+
+The latest score per member is idempotent to recompute, so the updated state gives the same LevelsFull as a full rebuild.
+A timeline is rebuilt from the whole history if its cutoff moves backwards or the history has no 'timestamp' column.
+"""
+
+STATE_VERSION = 1
+
+def latest_scores(history_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    For each member, get the latest non-null level_score and its score_date
+    Members with only null scores are kept with a missing level_score, like groupby.last() does in build_levels_full
+    """
+    history_rows = history_rows.sort_values('score_date', kind='stable')
+    latest = history_rows.assign(
+        # Only keep the date of rows that have a score, so it stays paired with the latest non-null score
+        scored_date=history_rows['score_date'].where(history_rows['level_score'].notna())
+    ).groupby('member_id', as_index=False, sort=False).agg(
+        level_score=('level_score', 'last'),
+        score_date=('scored_date', 'last'),
+    )
+    return latest
+
+def combine_latest_scores(previous: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combines two "latest score per member" frames (previous state and newly processed rows)
+    The most recent non-null score wins, ties go to the newly processed rows
+    """
+    if previous.empty:
+        return delta
+    if delta.empty:
+        return previous
+    return latest_scores(pd.concat([previous, delta], ignore_index=True))
+
+def _needs_rebuild(state: dict, cutoffs: dict) -> dict:
+    """
+    Cutoffs of the timelines the state cannot be brought up to date for, they are rebuilt from the whole history
+    """
+    if state is None or state.get('version') != STATE_VERSION or state['processed_through'] is None:
+        return dict(cutoffs)
+    return {
+        timeline_val: cutoff_date for timeline_val, cutoff_date in cutoffs.items()
+        if timeline_val not in state['timelines'] or cutoff_date < state['timelines'][timeline_val]['cutoff']
+    }
+
+def history_filters(state: dict, current_date: pd.Timestamp):
+    """
+    Parquet read filters (see table_io.read_table) selecting the history rows update_levels_full_state needs on top of
+    the state: rows loaded after the last processed load, and rows scored between a timeline's previous and new cutoff
+    Returns None when a timeline has to be rebuilt, the whole history is needed then
+    """
+    cutoffs = timeline_cutoffs(current_date)
+    if _needs_rebuild(state, cutoffs):
+        return None
+
+    # One conjunction per timeline whose cutoff moved forward, a daily refresh reads a day of scores per timeline
+    filters = [[('timestamp', '>', state['processed_through'])]]
+    for timeline_val, cutoff_date in cutoffs.items():
+        previous_cutoff = state['timelines'][timeline_val]['cutoff']
+        if cutoff_date > previous_cutoff:
+            filters.append([('score_date', '>', previous_cutoff), ('score_date', '<=', cutoff_date)])
+    return filters
+
+def update_levels_full_state(state: dict, member_level_scores_history: pd.DataFrame, current_date: pd.Timestamp) -> dict:
+    """
+    Brings the state up to date with the history and the reference current date
+    member_level_scores_history must have its score_date parsed and its member ids encoded as str (see build_levels_full_incremental).
+    It can be the whole history, or only the rows selected by history_filters(state, current_date) when that is not None:
+    only the rows from new data-loads and the rows between a timeline's previous and new cutoff are processed
+    """
+    history = member_level_scores_history
+    has_timestamp = 'timestamp' in history.columns
+    if has_timestamp:
+        # Already parsed by a typed load, so no rows are converted here
+        load_timestamps = parsed_dates(history['timestamp'])
+
+    cutoffs = timeline_cutoffs(current_date)
+    if not has_timestamp:
+        state = None
+    rebuild_cutoffs = _needs_rebuild(state, cutoffs)
+    if state is None or state.get('version') != STATE_VERSION:
+        state = {'version': STATE_VERSION, 'processed_through': None, 'timelines': {}}
+
+    # Timelines with nothing to build on are rebuilt from every row up to their cutoff, in a single pass
+    timelines = {timeline_val: {'cutoff': cutoffs[timeline_val], 'latest': latest} for timeline_val, latest in latest_scores_by_timeline(history, rebuild_cutoffs).items()} if rebuild_cutoffs else {}
+
+    updated_cutoffs = {timeline_val: cutoff_date for timeline_val, cutoff_date in cutoffs.items() if timeline_val not in rebuild_cutoffs}
+    if updated_cutoffs:
+        # Candidate rows, selected once: rows from new data-loads, and rows between a timeline's previous and new
+        # cutoff (the rows history_filters reads). Only these are masked against each timeline, whatever the size of
+        # the given history
+        score_dates = history['score_date'].to_numpy()
+        is_new = (load_timestamps > state['processed_through']).to_numpy()
+        selected = is_new.copy()
+        for timeline_val, cutoff_date in updated_cutoffs.items():
+            selected |= (score_dates > state['timelines'][timeline_val]['cutoff']) & (score_dates <= cutoff_date)
+        candidates, new_rows, candidate_dates = history[selected], is_new[selected], score_dates[selected]
+
+        for timeline_val, cutoff_date in updated_cutoffs.items():
+            previous = state['timelines'][timeline_val]
+            before_cutoff = candidate_dates <= cutoff_date
+
+            # Already loaded rows that moved inside the timeline because the cutoff moved forward
+            moved_inside = candidate_dates > previous['cutoff']
+            delta = candidates[before_cutoff & (new_rows | moved_inside)]
+            timelines[timeline_val] = {'cutoff': cutoff_date, 'latest': combine_latest_scores(previous['latest'], latest_scores(delta))}
+
+    processed_through = load_timestamps.max() if has_timestamp else None
+    if state['processed_through'] is not None and (pd.isna(processed_through) or processed_through < state['processed_through']):
+        processed_through = state['processed_through']
+
+    return {'version': STATE_VERSION, 'processed_through': processed_through, 'timelines': {timeline_val: timelines[timeline_val] for timeline_val in cutoffs}}
+
+def load_levels_full_state(state_path: str):
+    """
+    Loads a persisted state, or returns None if there is none yet
+    """
+    if not os.path.exists(state_path):
+        return None
+    return pd.read_pickle(state_path)
+
+def save_levels_full_state(state: dict, state_path: str):
+    """
+    Persists the state (written to a temporary file first so a failed write never leaves a corrupt state)
+    """
+    tmp_path = f"{state_path}.tmp"
+    pd.to_pickle(state, tmp_path)
+    os.replace(tmp_path, state_path)
+
+def build_levels_full_incremental(levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame, state_path: str, current_date: pd.Timestamp = None) -> LevelsFull:
+    """
+    Same output as build_levels_full, but reuses the persisted state at state_path so only new history rows are processed
+    member_level_scores_history: the whole history, or only the rows selected by history_filters for the persisted
+    state (see load_levels_full_incremental)
+    The updated state is written back to state_path
+    """
+    levels, level_bins, current_scores, current_date = prepare_levels_full_inputs(levels, member_level_scores, member_level_scores_history, member_product_accounts, current_date)
+
+    # Member ids compared by their str values (as in the persisted state) and parsed score dates, without modifying the caller's history
+    history = member_level_scores_history.assign(
+        member_id=encode_member_ids(member_level_scores_history['member_id']),
+        score_date=parsed_dates(member_level_scores_history['score_date']),
+    )
+    state = update_levels_full_state(load_levels_full_state(state_path), history, current_date)
+    save_levels_full_state(state, state_path)
+
+    latest_by_timeline = {timeline_val: entry['latest'] for timeline_val, entry in state['timelines'].items()}
+    return assemble_levels_full(levels, level_bins, current_scores, latest_by_timeline, member_product_accounts)
+
+def load_levels_full_incremental(data_dir: str, state_path: str, file_format: str = 'csv') -> LevelsFull:
+    """
+    Loads the inputs from data_dir and builds LevelsFull incrementally: with a reusable state, only the history rows
+    selected by history_filters are read (the filters are pushed down into the Parquet read), otherwise the whole history
+    """
+    levels = read_levels_full_input(data_dir, 'levels', file_format)
+    member_level_scores = read_levels_full_input(data_dir, 'member_level_scores', file_format)
+    member_product_accounts = read_levels_full_input(data_dir, 'member_product_accounts', file_format)
+
+    # The reference current date decides the cutoffs, and so the history rows to read
+    current_date = reference_current_date(member_level_scores)
+    current_date = pd.Timestamp.now() if current_date is None else pd.Timestamp(current_date)
+    filters = history_filters(load_levels_full_state(state_path), current_date)
+    member_level_scores_history = read_levels_full_input(data_dir, 'member_level_scores_history', file_format, filters)
+
+    return build_levels_full_incremental(levels, member_level_scores, member_level_scores_history, member_product_accounts, state_path, current_date)
+
+if __name__ == '__main__':
+
+    # Build the LevelsFull metric, reusing the state from the previous run: only the history rows it needs are read
+    # (the CSV files are converted to a Parquet cache on the first run)
+    levels_full_metric = load_levels_full_incremental("../../data", 'levels_full_state.pkl')
+
+    # Write the final output: JSON by default, or the output file given as argument (.parquet for the flat table, .txt for pprint)
+    output_file = sys.argv[1] if len(sys.argv) > 1 else 'levels_full.json'
+    write_levels_full(levels_full_metric, output_file)
+    print(f"LevelsFull written to {output_file}")
@@ -0,0 +1,42 @@
+import os
+import sys
+
+# Add the analytics directory (for the table_io module shared with part 2) to the module search path
+analytics_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if analytics_dir not in sys.path:
+    sys.path.insert(0, analytics_dir)
+
+
+from table_io import LEVELS_SCHEMA, MEMBER_LEVEL_SCORES_SCHEMA, MEMBER_PRODUCT_ACCOUNTS_SCHEMA, read_table
+
+"""
+Typed columnar loading of the Levels Full inputs
+
+The inputs are read through the typed Parquet cache of table_io (analytics/table_io.py, shared with part 2), projected
+to the columns build_levels_full needs (e.g. 2 of the product account columns)
+"""
+
+# Input name: (schema, columns read by build_levels_full and build_levels_full_by_client)
+LEVELS_FULL_INPUTS = {
+    'levels': (LEVELS_SCHEMA, ['client_account_id', 'level_name', 'level_score_start', 'level_score_end']),
+    'member_level_scores': (MEMBER_LEVEL_SCORES_SCHEMA, ['client_account_id', 'member_id', 'level_score', 'score_date', 'timestamp']),
+    'member_level_scores_history': (MEMBER_LEVEL_SCORES_SCHEMA, ['client_account_id', 'member_id', 'level_score', 'score_date', 'timestamp']),
+    'member_product_accounts': (MEMBER_PRODUCT_ACCOUNTS_SCHEMA, ['client_account_id', 'member_id']),
+}
+
+def read_levels_full_input(data_dir: str, name: str, file_format: str = 'csv', filters: list = None):
+    """
+    Loads one input of LEVELS_FULL_INPUTS from data_dir, typed and projected to the columns build_levels_full needs
+    filters: only load the rows matching them (see table_io.read_table), e.g. the history rows of new data-loads
+    """
+    schema, columns = LEVELS_FULL_INPUTS[name]
+    return read_table(os.path.join(data_dir, f"{name}.{file_format}"), schema, columns, filters)
+
+def load_levels_full_inputs(data_dir: str, file_format: str = 'csv') -> tuple:
+    """
+    Loads (levels, member_level_scores, member_level_scores_history, member_product_accounts) from data_dir,
+    typed and projected to the columns build_levels_full needs
+    file_format: 'csv' (converted to the Parquet cache on first load) or 'parquet'
+    """
+    return tuple(read_levels_full_input(data_dir, name, file_format) for name in LEVELS_FULL_INPUTS)
@@ -0,0 +1,105 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from levels_full import build_levels_full
+from levels_full_io import load_levels_full_inputs
+from levels_full_serialization import write_levels_full
+
+"""
+Multi-client Levels Full
+
+Level, MemberLevelScore and MemberProductAccount all carry a client_account_id, but build_levels_full works on a single client.
+build_levels_full_by_client partitions the four inputs by client_account_id and builds one LevelsFull per client across a process pool:
+  - Each worker only receives its client's partition of every input
+  - Partitions are cut from the inputs right before they are sent, and at most max_workers * 2 are in flight at once,
+    so memory stays bounded by the largest clients being processed instead of a full copy of every partition
+"""
+
+CLIENT_COLUMN = 'client_account_id'
+
+def _partition_indices(df: pd.DataFrame) -> dict:
+    """
+    Row positions of every client in a DataFrame
+    """
+    if df.empty or CLIENT_COLUMN not in df.columns:
+        return {}
+    return df.groupby(CLIENT_COLUMN, sort=False).indices
+
+def _client_partition(df: pd.DataFrame, indices: dict, client_account_id) -> pd.DataFrame:
+    """
+    Copy of a client's rows (an empty frame with the same columns if the client has none)
+    """
+    positions = indices.get(client_account_id)
+    if positions is None:
+        return df.iloc[0:0].copy()
+    return df.take(positions).reset_index(drop=True)
+
+def _build_client_levels_full(client_account_id, levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame):
+    """
+    Worker: builds the LevelsFull metric of a single client
+    """
+    return client_account_id, build_levels_full(levels, member_level_scores, member_level_scores_history, member_product_accounts)
+
+def build_levels_full_by_client(levels: pd.DataFrame, member_level_scores: pd.DataFrame, member_level_scores_history: pd.DataFrame, member_product_accounts: pd.DataFrame, max_workers: int = None) -> dict:
+    """
+    Returns a dictionary with
+    - Key: client_account_id
+    - Value: LevelsFull metric of that client
+    for every client that has levels or member level scores
+
+    max_workers: size of the process pool (defaults to the number of CPUs), 1 builds every client in this process
+    """
+    inputs = [levels, member_level_scores, member_level_scores_history, member_product_accounts]
+    indices = [_partition_indices(df) for df in inputs]
+
+    clients = list(dict.fromkeys(list(indices[0]) + list(indices[1])))
+    max_workers = max_workers or os.cpu_count() or 1
+
+    def client_args(client_account_id):
+        return [client_account_id] + [_client_partition(df, idx, client_account_id) for df, idx in zip(inputs, indices)]
+
+    results = {}
+    if max_workers == 1:
+        for client_account_id in clients:
+            _, results[client_account_id] = _build_client_levels_full(*client_args(client_account_id))
+        return results
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for client_account_id in clients:
+            # Bound the number of partitions held in memory waiting for a worker
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    client, levels_full = future.result()
+                    results[client] = levels_full
+            pending.add(executor.submit(_build_client_levels_full, *client_args(client_account_id)))
+
+        for future in pending:
+            client, levels_full = future.result()
+            results[client] = levels_full
+
+    # Same order as the clients appear in the inputs
+    return {client_account_id: results[client_account_id] for client_account_id in clients}
+
+if __name__ == '__main__':
+
+    # Load the typed inputs (the CSV files are converted to a Parquet cache on the first run)
+    levels, member_level_scores, member_level_scores_history, member_product_accounts = load_levels_full_inputs("../../data")
+
+    # Build one LevelsFull metric per client
+    levels_full_by_client = build_levels_full_by_client(levels, member_level_scores, member_level_scores_history, member_product_accounts)
+
+    # Write the final output: JSON by default, or the output file given as argument (.parquet for the flat table, .txt for pprint)
+    output_file = sys.argv[1] if len(sys.argv) > 1 else 'levels_full_by_client.json'
+    write_levels_full(levels_full_by_client, output_file)
+    print(f"LevelsFull written to {output_file}")
@@ -0,0 +1,222 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import dataclasses
+import json
+import pprint
+from enum import Enum
+import numpy as np
+import pandas as pd
+from models.LevelsFull import LevelsFull, LevelData, Movement
+from models.StandardChartData import StandardChartData, StandardDataPoint
+
+try:
+    import orjson
+except ImportError:     # Without orjson the standard json module writes the same output (slower)
+    orjson = None
+
+"""
+Machine-readable LevelsFull output
+
+Every function takes either one LevelsFull or a dict of client_account_id -> LevelsFull (build_levels_full_by_client):
+- JSON: {"levels": [...]} with the same nesting as the dataclasses ({client_account_id: {"levels": [...]}, ...} per client),
+  written one level at a time so the whole document is never held in memory
+- Table: one row per level x timeline (level fields, timeline, member_count_history, growth, churn),
+  with a client_account_id column per client. Stored as Parquet for dashboards
+read_levels_full / levels_full_from_table load both forms back into the dataclasses.
+
+Usage:
+    write_levels_full(levels_full_metric, 'levels_full.json')     # or .parquet, .txt (pprint)
+    levels_full_metric = read_levels_full('levels_full.json')
+"""
+
+TABLE_COLUMNS = ['level', 'member_count', 'score_start', 'score_end', 'avg_product_count', 'timeline', 'member_count_history', 'growth', 'churn']
+
+def _json_default(value):
+    """
+    Values json/orjson cannot serialize natively: NumPy scalars (e.g. level scores read from the levels file) and enums
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__} to JSON")
+
+def _python_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def _timeline_value(timeline) -> str:
+    return timeline.value if isinstance(timeline, Enum) else timeline
+
+def _json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, default=_json_default, separators=(',', ':')).encode()
+
+def _json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _write_levels_json(out, levels_full: LevelsFull):
+    out.write(b'{"levels":[')
+    for i, level_data in enumerate(levels_full.levels):
+        if i > 0:
+            out.write(b',')
+        out.write(_json_dumps(dataclasses.asdict(level_data)))
+    out.write(b']}')
+
+def write_levels_full_json(levels_full, path: str):
+    """
+    Writes a LevelsFull (or a dict of client_account_id -> LevelsFull) as JSON, one level at a time
+    """
+    # Written to a temporary file first so an interrupted write never leaves a partial document
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as out:
+        if isinstance(levels_full, LevelsFull):
+            _write_levels_json(out, levels_full)
+        else:
+            out.write(b'{')
+            for i, (client_account_id, client_levels_full) in enumerate(levels_full.items()):
+                if i > 0:
+                    out.write(b',')
+                out.write(_json_dumps(str(client_account_id)) + b':')
+                _write_levels_json(out, client_levels_full)
+            out.write(b'}')
+    os.replace(tmp_path, path)
+
+def levels_full_from_dict(data: dict) -> LevelsFull:
+    """
+    LevelsFull from its dict form ({"levels": [...]}, as written by write_levels_full_json)
+    """
+    return LevelsFull(levels=[
+        LevelData(
+            level=level_data['level'],
+            member_count=level_data['member_count'],
+            score_start=level_data['score_start'],
+            score_end=level_data['score_end'],
+            avg_product_count=level_data['avg_product_count'],
+            member_count_history=StandardChartData(points=[StandardDataPoint(**point) for point in level_data['member_count_history']['points']]),
+            movement=[Movement(**movement) for movement in level_data['movement']],
+        )
+        for level_data in data['levels']
+    ])
+
+def read_levels_full_json(path: str):
+    """
+    Reads a file written by write_levels_full_json: a LevelsFull, or a dict of client_account_id -> LevelsFull
+    """
+    with open(path, 'rb') as f:
+        data = _json_loads(f.read())
+    if isinstance(data.get('levels'), list):
+        return levels_full_from_dict(data)
+    return {client_account_id: levels_full_from_dict(client_data) for client_account_id, client_data in data.items()}
+
+def _levels_table_rows(levels_full: LevelsFull) -> list:
+    rows = []
+    for level_data in levels_full.levels:
+        level_fields = {
+            'level': level_data.level,
+            'member_count': level_data.member_count,
+            'score_start': level_data.score_start,
+            'score_end': level_data.score_end,
+            'avg_product_count': level_data.avg_product_count,
+        }
+        history = {point.key: point.value for point in level_data.member_count_history.points}
+        movements = {_timeline_value(movement.timeline): movement for movement in level_data.movement}
+        timelines = list(history) + [timeline for timeline in movements if timeline not in history]
+        for timeline in timelines or [None]:    # A level without timelines still gets a row
+            movement = movements.get(timeline)
+            rows.append({
+                **level_fields,
+                'timeline': timeline,
+                'member_count_history': history.get(timeline),
+                'growth': None if movement is None else movement.growth,
+                'churn': None if movement is None else movement.churn,
+            })
+    return rows
+
+def levels_full_table(levels_full) -> pd.DataFrame:
+    """
+    Flat form of a LevelsFull: one row per level x timeline, in level order
+    A dict of client_account_id -> LevelsFull gives one table with a leading client_account_id column
+    Timelines missing from a level's member count history or movements have missing values in those columns
+    """
+    if isinstance(levels_full, LevelsFull):
+        rows, columns = _levels_table_rows(levels_full), TABLE_COLUMNS
+    else:
+        rows = [
+            {'client_account_id': client_account_id, **row}
+            for client_account_id, client_levels_full in levels_full.items()
+            for row in _levels_table_rows(client_levels_full)
+        ]
+        columns = ['client_account_id'] + TABLE_COLUMNS
+    table = pd.DataFrame(rows, columns=columns)
+    return table.astype({'member_count_history': 'Int64', 'growth': 'Int64', 'churn': 'Int64'})
+
+def _levels_full_from_rows(table: pd.DataFrame) -> LevelsFull:
+    level_data_list = []
+    for _, level_rows in table.groupby('level', sort=False):
+        first = level_rows.iloc[0]
+        history_points, movements = [], []
+        for row in level_rows.to_dict('records'):
+            if pd.notna(row['member_count_history']):
+                history_points.append(StandardDataPoint(key=row['timeline'], value=int(row['member_count_history'])))
+            if pd.notna(row['growth']):
+                movements.append(Movement(timeline=row['timeline'], growth=int(row['growth']), churn=int(row['churn'])))
+        level_data_list.append(LevelData(
+            level=first['level'],
+            member_count=int(first['member_count']),
+            score_start=_python_value(first['score_start']),
+            score_end=_python_value(first['score_end']),
+            avg_product_count=_python_value(first['avg_product_count']),
+            member_count_history=StandardChartData(points=history_points),
+            movement=movements,
+        ))
+    return LevelsFull(levels=level_data_list)
+
+def levels_full_from_table(table: pd.DataFrame):
+    """
+    LevelsFull from its flat form (levels_full_table), or a dict of client_account_id -> LevelsFull
+    when the table has a client_account_id column
+    """
+    if 'client_account_id' not in table.columns:
+        return _levels_full_from_rows(table)
+    return {
+        client_account_id: _levels_full_from_rows(client_table)
+        for client_account_id, client_table in table.groupby('client_account_id', sort=False)
+    }
+
+def write_levels_full(levels_full, path: str):
+    """
+    Writes a LevelsFull (or a dict of client_account_id -> LevelsFull) in the format given by the file extension:
+    .json (write_levels_full_json), .parquet (levels_full_table, needs pyarrow) or .txt (pprint)
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.json':
+        write_levels_full_json(levels_full, path)
+    elif extension == '.parquet':
+        tmp_path = f"{path}.tmp"
+        levels_full_table(levels_full).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    elif extension == '.txt':
+        with open(path, 'w') as out:
+            out.write(pprint.pformat(levels_full, width=610, indent=4, compact=False))
+    else:
+        raise ValueError(f"Unsupported LevelsFull output format: {extension}")
+
+def read_levels_full(path: str):
+    """
+    Reads a .json or .parquet file written by write_levels_full back into a LevelsFull (or a dict of them per client)
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.json':
+        return read_levels_full_json(path)
+    if extension == '.parquet':
+        return levels_full_from_table(pd.read_parquet(path))
+    raise ValueError(f"Unsupported LevelsFull input format: {extension}")
@@ -0,0 +1,73 @@
+import os
+import sys
+
+# Add analytics/part2 to the module search path
+part2_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if part2_dir not in sys.path:
+    sys.path.insert(0, part2_dir)
+
+
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmark_sharded_scoring import replicate
+from components.data_ingestion import load_data
+from components.eligibility import eligibility_rules
+from components.score_table import ScoreTable
+from globals import PRODUCT_CATEGORIES_LIST
+from models.rules_based_model import RulesBasedPropensityModel
+from models.system import PropensityScoringSystem
+
+"""
+Benchmark: daily rescoring with the score table
+
+Scores every member once into a score table, then changes the product accounts of a fraction of the members
+(as a daily load would) and compares rescoring every member with score_batch against ScoreTable.update,
+which only rescores the members whose inputs changed. The sample data is replicated (with new member_ids)
+until it has the requested number of members.
+
+Usage (number of members, then the fraction of members whose accounts change, defaults to 1M members and 1%):
+    cd analytics/part2/benchmarks
+    python benchmark_score_table.py 1000000 0.01
+"""
+
+if __name__ == '__main__':
+    n_members = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    changed_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+
+    members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+    members_df, member_products_df = replicate(members_df, member_products_df, n_members)
+
+    system = PropensityScoringSystem()
+    system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+    categories, propensity_types = sorted(PRODUCT_CATEGORIES_LIST), ['growth', 'churn']
+
+    with tempfile.TemporaryDirectory() as table_dir:
+        table = ScoreTable(os.path.join(table_dir, 'score_table.parquet'))
+        start = time.perf_counter()
+        table.update(system, members_df, member_products_df, categories, propensity_types, 'rules')
+        print(f"{len(members_df)} members, {len(member_products_df)} product accounts")
+        print(f"first run (every member scored into the table): {time.perf_counter() - start:.2f}s")
+
+        # Daily load: the balances of the accounts of a fraction of the members change
+        rng = np.random.default_rng(0)
+        member_ids = members_df['member_id'].astype(str)
+        changed_ids = rng.choice(member_ids.to_numpy(), int(len(members_df) * changed_fraction), replace=False)
+        changed_accounts = member_products_df['member_id'].astype(str).isin(changed_ids).to_numpy()
+        daily_products = member_products_df.copy()
+        daily_products.loc[changed_accounts, 'account_balance'] = daily_products.loc[changed_accounts, 'account_balance'] + 1
+
+        start = time.perf_counter()
+        expected = system.score_batch(members_df, daily_products, categories, propensity_types, 'rules')
+        full_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = table.update(system, members_df, daily_products, categories, propensity_types, 'rules')
+        incremental_elapsed = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(table.scores(members_df['member_id'], categories, propensity_types, 'rules'), expected, check_dtype=False)
+        print(f"daily run, {summary['members_scored']} members changed ({summary['rows_skipped']} of {summary['rows_skipped'] + summary['rows_scored']} scores skipped)")
+        print(f"  score_batch (every member): {full_elapsed:.2f}s")
+        print(f"  ScoreTable.update:          {incremental_elapsed:.2f}s")
@@ -0,0 +1,66 @@
+import os
+import sys
+
+# Add analytics/part2 to the module search path
+part2_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if part2_dir not in sys.path:
+    sys.path.insert(0, part2_dir)
+
+
+import time
+import pandas as pd
+from components.data_ingestion import load_data
+from components.eligibility import eligibility_rules
+from globals import PRODUCT_CATEGORIES_LIST
+from models.rules_based_model import RulesBasedPropensityModel
+from models.system import PropensityScoringSystem
+
+"""
+Benchmark: sharded scoring across a process pool
+
+Scores the same members with score_batch (single process) and with score_sharded for several worker counts,
+and reports the speedup over the single process run. The sample data is replicated (with new member_ids)
+until it has the requested number of members.
+
+Usage (number of members, then worker counts, defaults to 1M members and 1 2 4 8 16 workers):
+    cd analytics/part2/benchmarks
+    python benchmark_sharded_scoring.py 1000000 1 2 4 8 16 32
+
+Scaling depends on the number of physical cores: run it on a many-core machine
+"""
+
+def replicate(members_df: pd.DataFrame, member_products_df: pd.DataFrame, n_members: int) -> tuple:
+    """
+    Copies of the sample members and their product accounts with new member_ids, until there are n_members members
+    """
+    copies = -(-n_members // len(members_df))
+    members, products = [], []
+    for copy in range(copies):
+        members.append(members_df.assign(member_id=members_df['member_id'].astype(str) + f"-{copy}"))
+        products.append(member_products_df.assign(member_id=member_products_df['member_id'].astype(str) + f"-{copy}"))
+    return pd.concat(members, ignore_index=True).head(n_members), pd.concat(products, ignore_index=True)
+
+if __name__ == '__main__':
+    n_members = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8, 16]
+
+    members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+    members_df, member_products_df = replicate(members_df, member_products_df, n_members)
+
+    system = PropensityScoringSystem()
+    system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+    categories = sorted(PRODUCT_CATEGORIES_LIST)
+
+    start = time.perf_counter()
+    expected = system.score_batch(members_df, member_products_df, categories, ['growth', 'churn'], 'rules')
+    baseline = time.perf_counter() - start
+    print(f"{len(members_df)} members, {len(member_products_df)} product accounts ({os.cpu_count()} CPUs)")
+    print(f"score_batch (1 process): {baseline:.2f}s")
+
+    for workers in worker_counts:
+        start = time.perf_counter()
+        results = system.score_sharded(members_df, member_products_df, categories, ['growth', 'churn'], 'rules', max_workers=workers)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(results, expected)
+        print(f"score_sharded ({workers} workers): {elapsed:.2f}s, speedup {baseline / elapsed:.2f}x")
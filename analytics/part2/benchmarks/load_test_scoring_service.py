@@ -0,0 +1,110 @@
+import os
+import sys
+
+# Add analytics/part2 to the module search path
+part2_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if part2_dir not in sys.path:
+    sys.path.insert(0, part2_dir)
+
+
+import argparse
+import asyncio
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+from service import http_get
+
+"""
+Load test: online scoring service
+
+Sends GET /score requests for random member_ids (all categories and propensity types) from concurrent keep-alive
+connections, and reports the throughput, the client-side p50/p99 latency and the service's own /metrics.
+Without --port, the service is started on a free localhost port in a separate process and stopped at the end.
+
+Usage:
+    cd analytics/part2/benchmarks
+    python load_test_scoring_service.py --requests 20000 --concurrency 32
+    python load_test_scoring_service.py --port 8080 --model ml      # against a running service.py
+"""
+
+TARGET_P99_MS = 10
+
+def start_service(data_dir: str) -> tuple:
+    """
+    Starts service.py on a free port and returns (process, port) once it is listening
+    """
+    process = subprocess.Popen(
+        [sys.executable, 'service.py', '--port', '0', '--data-dir', os.path.abspath(data_dir)],
+        cwd=part2_dir, stdout=subprocess.PIPE, text=True,
+    )
+    for line in process.stdout:
+        if line.startswith('Scoring service listening on'):
+            return process, int(line.rsplit(':', 1)[1])
+    raise RuntimeError(f"Scoring service exited with code {process.wait()} before listening")
+
+async def run_load(host: str, port: int, member_ids: list, n_requests: int, concurrency: int, model_name: str, seed: int = 0) -> tuple:
+    """
+    (client-side latencies in seconds, non-200 responses, elapsed seconds) of n_requests spread over concurrency connections
+    """
+    rng = np.random.default_rng(seed)
+    targets = [f"/score?member_id={member_id}&model={model_name}" for member_id in rng.choice(member_ids, n_requests)]
+    latencies = []
+    errors = 0
+
+    async def client(client_targets: list):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for target in client_targets:
+                start = time.perf_counter()
+                status, _ = await http_get(reader, writer, target)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(targets[i::concurrency]) for i in range(concurrency)))
+    return np.array(latencies), errors, time.perf_counter() - start
+
+async def fetch_metrics(host: str, port: int) -> dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, metrics = await http_get(reader, writer, '/metrics')
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return metrics
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help="port of a running service, by default one is started")
+    parser.add_argument('--data-dir', default='../../../data', help="data of the service, member_ids are sampled from members.csv")
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=32, help="concurrent keep-alive connections")
+    parser.add_argument('--model', default='rules')
+    args = parser.parse_args()
+
+    member_ids = pd.read_csv(os.path.join(args.data_dir, 'members.csv'), usecols=['member_id'])['member_id'].astype(str).unique()
+
+    process = None
+    port = args.port
+    if port is None:
+        process, port = start_service(args.data_dir)
+    try:
+        latencies, errors, elapsed = asyncio.run(run_load(args.host, port, member_ids, args.requests, args.concurrency, args.model))
+        metrics = asyncio.run(fetch_metrics(args.host, port))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    p50, p99 = np.percentile(latencies * 1000, [50, 99])
+    print(f"{len(latencies)} requests over {args.concurrency} connections in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} requests/s, {errors} errors")
+    print(f"client latency: p50 {p50:.2f}ms, p99 {p99:.2f}ms, max {latencies.max() * 1000:.2f}ms")
+    print(f"service latency (last {metrics['window']} requests): p50 {metrics['p50_ms']}ms, p99 {metrics['p99_ms']}ms, max {metrics['max_ms']}ms")
+    print(f"p99 under {TARGET_P99_MS}ms: {'yes' if p99 < TARGET_P99_MS else 'no'} (client side, includes queueing behind {args.concurrency - 1} other connections)")
@@ -1,55 +1,343 @@
+import os
+import sys
+
+# Add the analytics directory (for the table_io module shared with part 1) to the module search path
+analytics_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+if analytics_dir not in sys.path:
+    sys.path.insert(0, analytics_dir)
+
+
+import math
+import tempfile
+import numpy as np
 import pandas as pd
 
 from globals import PRODUCT_CATEGORIES, PRODUCT_CATEGORIES_LIST
+from table_io import MEMBERS_SCHEMA, MEMBER_PRODUCT_ACCOUNTS_SCHEMA, apply_schema, read_table, iter_table
+from components.product_status_logic import data_reference_date
+
+"""
+Typed columnar ingestion
+
+Members and member product accounts are read through the typed Parquet cache of table_io (analytics/table_io.py,
+shared with part 1): member_id and product_category_id are categoricals, account dates are parsed when the cache is
+written, and only the columns a pipeline asks for are read from the cache
+"""
+
+def map_to_category(product_id: str) -> str:
+
+    """
+    Maps a product_category_id to its general product category
+    The first pattern of PRODUCT_CATEGORIES (in dictionary order) found in the lowercased id wins
+    """
+
+    product_id = product_id.lower()
+    for pattern, category in PRODUCT_CATEGORIES.items():
+        if pattern in product_id:
+            return category
+    return 'other'
+
+# Mapped categories of every product_category_id seen so far, one lookup table per PRODUCT_CATEGORIES contents
+_category_lookups = {}
+
+def map_product_categories(product_category_ids: pd.Series) -> pd.Series:
 
-def load_data(members_file: str, member_product_accounts_file: str):
+    """
+    Maps a product_category_id column to general product categories
+    Product ids repeat heavily, so map_to_category runs once per distinct id (and once per process, the results are
+    cached by PRODUCT_CATEGORIES contents) and the categories are broadcast back to the rows through the factorized codes
+    """
+
+    lookup = _category_lookups.setdefault(tuple(PRODUCT_CATEGORIES.items()), {})
+
+    # Missing ids are kept as a distinct value so they fail in map_to_category like they did row by row
+    if isinstance(product_category_ids.dtype, pd.CategoricalDtype):
+        # Typed loads already store the distinct ids as categories
+        codes = product_category_ids.cat.codes.to_numpy()
+        product_ids = list(product_category_ids.cat.categories)
+        if (codes == -1).any():
+            codes = np.where(codes == -1, len(product_ids), codes)
+            product_ids.append(np.nan)
+    else:
+        codes, product_ids = pd.factorize(product_category_ids.astype(object), use_na_sentinel=False)
+    categories = []
+    for product_id in product_ids:
+        if product_id not in lookup:
+            lookup[product_id] = map_to_category(product_id)
+        categories.append(lookup[product_id])
+
+    return pd.Series(np.array(categories, dtype=object)[codes], index=product_category_ids.index, dtype=object)
+
+def prepare_members(members_df: pd.DataFrame) -> pd.DataFrame:
 
     """
-    Loads members and member product accounts data from CSV files and maps product category IDs to general categories
+    Cleans the loaded members data
+    """
+
+    if 'member_in_good_standing' in members_df.columns:
+        # Missing values count as in good standing, like astype(bool) on the NaN values of a CSV column
+        standing = members_df['member_in_good_standing'].astype(object)
+        members_df['member_in_good_standing'] = standing.where(standing.notna(), True).astype(bool)
+
+    return members_df
+
+def prepare_member_products(member_products_df: pd.DataFrame) -> pd.DataFrame:
+
+    """
+    Maps product category IDs of the loaded member product accounts to general categories
+    """
+
+    # Map product_category_id to general product categories (checking, savings, personal_loans, etc.)
+    member_products_df['product_category'] = map_product_categories(member_products_df['product_category_id'])
+
+    return member_products_df
+
+def load_data(members_file: str, member_product_accounts_file: str, member_columns: list = None, product_columns: list = None):
+
+    """
+    Loads members and member product accounts data from CSV (or Parquet) files and maps product category IDs to general categories
+    member_columns / product_columns: only load these columns (all columns by default)
     """
 
     # Load members data
-    members_df = pd.read_csv(members_file)
+    members_df = read_table(members_file, MEMBERS_SCHEMA, member_columns)
     
     # Load member product accounts data
-    member_products_df = pd.read_csv(member_product_accounts_file)
+    member_products_df = read_table(member_product_accounts_file, MEMBER_PRODUCT_ACCOUNTS_SCHEMA, product_columns)
 
-    members_df['member_in_good_standing'] = members_df['member_in_good_standing'].astype(bool)
-    
-    # Map product_category_id to general product categories (checking, savings, personal_loans, etc.)
-    def map_to_category(product_id: str) -> str:
-        product_id = product_id.lower()
-        for pattern, category in PRODUCT_CATEGORIES.items():
-            if pattern in product_id:
-                return category
-        return 'other'
-
-    # Apply mapping function 'product_category_id' column in member_products_df
-    member_products_df['product_category'] = member_products_df['product_category_id'].apply(map_to_category)
-    
-    return members_df, member_products_df
+    return prepare_members(members_df), prepare_member_products(member_products_df)
+
+def products_reference_date(member_product_accounts_file: str, as_of=None, block_size: int = 100000) -> pd.Timestamp:
+    """
+    As-of date of all the product accounts of a file, the one score_batch resolves when it scores them at once:
+    as_of, else the latest data load timestamp of the file, else now (see data_reference_date)
+    Only the 'timestamp' column is read, block by block (block_size rows at a time), so streamed runs
+    (iter_member_chunks) can score every chunk at this date
+    """
+    if as_of is not None:
+        return pd.Timestamp(as_of)
+    latest = [block['timestamp'].max() for block in iter_table(member_product_accounts_file, MEMBER_PRODUCT_ACCOUNTS_SCHEMA, ['timestamp'], block_size) if 'timestamp' in block.columns]
+    return data_reference_date(pd.DataFrame({'timestamp': pd.Series(latest, dtype='datetime64[ns]')}))
+
+def shard_numbers(member_ids: pd.Series, shards: int) -> np.ndarray:
+    """
+    Shard of every member_id: a stable hash of the id as str, so the same member always lands on the same shard
+    (in every process and run, unlike Python's hash()) and members and product accounts can be sharded separately
+    """
+    return (pd.util.hash_pandas_object(member_ids.astype(str), index=False).to_numpy() % shards).astype(np.int64)
+
+# Share of chunk_size iter_member_chunks sizes its hash buckets for, so few buckets go over chunk_size and need splitting
+CHUNK_FILL = 0.9
+
+def _spill_blocks(file: str, schema: dict, columns: list, buckets: int, spill_dir: str, name: str, block_size: int) -> dict:
+    """
+    Splits a file into member hash buckets: every block is cut by bucket and each piece is written to its own spill file
+    Returns the spill files of every bucket number, in file order
+    """
+    spill_files = {}
+    for block_number, block in enumerate(iter_table(file, schema, columns, block_size)):
+        bucket_numbers = shard_numbers(block['member_id'], buckets)
+        for bucket_number, positions in pd.Series(bucket_numbers).groupby(bucket_numbers, sort=False).indices.items():
+            spill_file = os.path.join(spill_dir, f"{name}_{bucket_number}_{block_number}.pkl")
+            block.take(positions).to_pickle(spill_file)
+            spill_files.setdefault(bucket_number, []).append(spill_file)
+    return spill_files
+
+def _read_spilled_chunk(spill_files: list, schema: dict) -> pd.DataFrame:
+    """
+    Reassembles one member bucket from its spill files (and removes them)
+    """
+    pieces = [pd.read_pickle(spill_file) for spill_file in spill_files]
+    for spill_file in spill_files:
+        os.remove(spill_file)
+    return apply_schema(pd.concat(pieces, ignore_index=True), schema)
+
+def _split_chunk(members_df: pd.DataFrame, member_products_df: pd.DataFrame, chunk_size: int):
+    """
+    Splits one bucket into member_id ranges of at most chunk_size members (a single range for most buckets)
+    Yields (members_df, member_products_df) pairs, members sorted by member_id, product accounts in file order
+    """
+    # Sort members by member_id (stable, so duplicates keep their file order)
+    member_ids = members_df['member_id'].astype(str).to_numpy(dtype=object)
+    order = np.argsort(member_ids, kind='stable')
+    members_df, member_ids = members_df.iloc[order].reset_index(drop=True), member_ids[order]
 
-def get_member_products_by_category(member_id: str, member_products: pd.DataFrame) -> dict:
+    boundaries = np.unique(member_ids)[::chunk_size]
+    member_ranges = np.searchsorted(boundaries, member_ids, side='right') - 1
+    # Ids sorting before the first boundary can only be product accounts of unknown members, they go to the first range
+    product_ranges = np.maximum(np.searchsorted(boundaries, member_products_df['member_id'].astype(str).to_numpy(dtype=object), side='right') - 1, 0)
+    product_positions = pd.Series(product_ranges).groupby(product_ranges).indices
+
+    for member_range, positions in pd.Series(member_ranges).groupby(member_ranges).indices.items():
+        products = product_positions.get(member_range, np.array([], dtype=np.int64))
+        yield members_df.take(positions).reset_index(drop=True), member_products_df.take(products).reset_index(drop=True)
+
+def iter_member_chunks(members_file: str, member_product_accounts_file: str, chunk_size: int = 10000, member_columns: list = None, product_columns: list = None, block_size: int = 100000, spill_dir: str = None):
+
+    """
+    Streams members and their product accounts in chunks of at most chunk_size members
+    Yields (members_df, member_products_df) pairs prepared like load_data, the products of a chunk are all the product
+    accounts of its members. Members are sorted by member_id within a chunk, chunks come in hash bucket order
+
+    Memory stays bounded by chunk_size and block_size instead of the file sizes or the number of members:
+    - The member rows are counted first (one column, block by block) to pick the number of member hash buckets,
+      one per chunk_size * CHUNK_FILL members
+    - Both files are then read block by block (block_size rows at a time) and every block is split by hash bucket
+      of member_id (shard_numbers) into spill files
+    - Buckets are reassembled from the spill files one at a time, the few that have more than chunk_size members are
+      split into member_id ranges
+    spill_dir: directory for the spill files (a temporary directory by default)
+    """
+
+    if chunk_size < 1 or block_size < 1:
+        raise ValueError(f"chunk_size and block_size must be at least 1, got {chunk_size} and {block_size}.")
+
+    n_members = sum(len(block) for block in iter_table(members_file, MEMBERS_SCHEMA, ['member_id'], block_size))
+    buckets = max(math.ceil(n_members / (chunk_size * CHUNK_FILL)), 1)
+
+    with tempfile.TemporaryDirectory(dir=spill_dir) as spill_dir:
+        member_spill_files = _spill_blocks(members_file, MEMBERS_SCHEMA, member_columns, buckets, spill_dir, 'members', block_size)
+        product_spill_files = _spill_blocks(member_product_accounts_file, MEMBER_PRODUCT_ACCOUNTS_SCHEMA, product_columns, buckets, spill_dir, 'products', block_size)
+
+        # Buckets without members only hold product accounts of unknown members, their spill files are left to the directory cleanup
+        for bucket_number in sorted(member_spill_files):
+            members_df = _read_spilled_chunk(member_spill_files.pop(bucket_number), MEMBERS_SCHEMA)
+            if bucket_number in product_spill_files:
+                member_products_df = _read_spilled_chunk(product_spill_files.pop(bucket_number), MEMBER_PRODUCT_ACCOUNTS_SCHEMA)
+            else:
+                member_products_df = pd.DataFrame({'member_id': pd.Series(dtype='category'), 'product_category_id': pd.Series(dtype='category')})
+
+            for chunk_members_df, chunk_products_df in _split_chunk(members_df, member_products_df, chunk_size):
+                yield prepare_members(chunk_members_df), prepare_member_products(chunk_products_df)
+
+class MemberProductsIndex:
+
+    """
+    One-time index of member product accounts grouped by member_id and product_category
+
+    Product rows are sorted once by (member_id, product_category) and every group is stored as
+    (start, stop) offsets into the sorted rows, so looking up a member's products is O(1)
+    instead of a scan of the whole member_products DataFrame
+    """
+
+    def __init__(self, member_products: pd.DataFrame):
+        member_ids = member_products['member_id'].astype(str).to_numpy()
+        categories = member_products['product_category'].to_numpy()
+
+        # Stable sort on integer codes keeps each member's products in their original row order
+        member_codes, _ = pd.factorize(member_ids)
+        category_codes, _ = pd.factorize(categories)
+        order = np.lexsort((category_codes, member_codes))
+
+        self._columns = list(member_products.columns)
+        self._rows = member_products.to_numpy(dtype=object)[order]
+
+        # Group offsets: a new group starts wherever the member or the category changes
+        sorted_members = member_codes[order]
+        sorted_categories = category_codes[order]
+        group_change = (sorted_members[1:] != sorted_members[:-1]) | (sorted_categories[1:] != sorted_categories[:-1])
+        starts = np.flatnonzero(np.concatenate(([True], group_change))) if len(order) else np.array([], dtype=int)
+        stops = np.append(starts[1:], len(order))
+
+        self._offsets = {}
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            member_id = member_ids[order[start]]
+            category = categories[order[start]]
+            self._offsets.setdefault(member_id, {})[category] = (start, stop)
+
+    def __contains__(self, member_id) -> bool:
+        return str(member_id) in self._offsets
+
+    def get(self, member_id: str) -> dict:
+
+        """
+        Returns the same dictionary as get_member_products_by_category for member_id
+        """
+
+        products = {category: [] for category in PRODUCT_CATEGORIES_LIST}
+        for category, (start, stop) in self._offsets.get(str(member_id), {}).items():
+            if category in products:
+                products[category] = [dict(zip(self._columns, row)) for row in self._rows[start:stop]]
+
+        return products
+
+class MemberIndex:
+
+    """
+    One-time index of member records by member_id (as str)
+
+    Every member row is stored once in a dict keyed by member_id, so looking up a member is O(1)
+    instead of a scan of the whole members DataFrame. Duplicate member_ids keep their first row
+    """
+
+    def __init__(self, members_df: pd.DataFrame):
+        member_ids = members_df['member_id'].astype(str).to_numpy(dtype=object)
+        first = ~pd.Series(member_ids).duplicated().to_numpy()
+
+        self._columns = list(members_df.columns)
+        self._rows = dict(zip(member_ids[first].tolist(), members_df.to_numpy(dtype=object)[first]))
+
+    def __contains__(self, member_id) -> bool:
+        return str(member_id) in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def member_ids(self) -> list:
+        return list(self._rows)
+
+    def get(self, member_id: str) -> dict:
+
+        """
+        Returns the member record of member_id as a dict (column: value), or None if the member is unknown
+        """
+
+        row = self._rows.get(str(member_id))
+        return None if row is None else dict(zip(self._columns, row))
+
+def get_member_products_by_category(member_id: str, member_products) -> dict:
 
     """
     Returns a dictionary with
     - Key: product category
     - Values: list of products of product category that belongs to member_id
     for every product category
+
+    member_products can be a MemberProductsIndex (O(1) lookup, preferred when looking up many members)
+    or the member_products DataFrame (full scan, the DataFrame is not modified)
     """
 
+    if isinstance(member_products, MemberProductsIndex):
+        return member_products.get(member_id)
+
     # Filter the member products dataframe for member_id
-    member_products['member_id'] = member_products['member_id'].astype(str)
-    member_df = member_products[member_products['member_id'] == member_id]
+    member_df = member_products[member_products['member_id'].astype(str) == str(member_id)]
     
     # Initialize products dictionary using PRODUCT_CATEGORIES_LIST from globals.py
     products = {category: [] for category in PRODUCT_CATEGORIES_LIST}
     
-    # Iterate over each product row for this member
-    for i, row in member_df.iterrows():
-        product = row.to_dict()
+    # Add each product record for this member to its category
+    for product in member_df.to_dict('records'):
         cat = product.get('product_category')
         if cat in products:
             products[cat].append(product)
     
     return products
+
+def group_products_by_member(member_products: pd.DataFrame) -> dict:
+
+    """
+    Returns a dictionary with
+    - Key: member_id (as str)
+    - Values: list of product records (dicts) that belong to member_id
+    Product rows are converted to dicts in a single pass instead of once per member
+    """
+
+    products = {}
+    member_ids = member_products['member_id'].astype(str).tolist()
+    for member_id, product in zip(member_ids, member_products.to_dict('records')):
+        products.setdefault(member_id, []).append(product)
+
+    return products
+
@@ -1,152 +1,81 @@
-from datetime import datetime
 import pandas as pd
-from .data_ingestion import get_member_products_by_category, load_data
-from .product_status_logic import (
-    checking_growth_indicator, checking_churn_indicator,
-    savings_growth_indicator, savings_churn_indicator,
-    personal_loans_growth_indicator, personal_loans_churn_indicator,
-    business_loans_growth_indicator, business_loans_churn_indicator,
-    certificates_growth_indicator, certificates_churn_indicator
-)
+from .data_ingestion import group_products_by_member
+from .product_status_logic import product_status_indicators
+from .eligibility_engine import compile_eligibility_rules, EligibilityRule, RuleEvaluationCache
 from globals import PRODUCT_CATEGORIES, PRODUCT_CATEGORIES_LIST
 
-def eligibility_check_checking(member: dict, products: list, propensity_type: str) -> bool:
-    """
-    Checking rules:
-      - Member in good standing (member_in_good_standing)
-      - No closed checking accounts in last 90 days (account_close_date)
-      - For growth: member must not already have a checking account
-      - For churn: member must have a checking account
-    """
-    if not member.get('member_in_good_standing', False):
-        return False
-
-    if propensity_type == 'growth':
-        if checking_growth_indicator(products):
-            return False
-        
-    elif propensity_type == 'churn':
-        if not products or checking_churn_indicator(products):
-            return False
-
-    return True
-
-def eligibility_check_savings(member: dict, products: list, propensity_type: str) -> bool:
-    """
-    Savings rules:
-      - Member in good standing (member_in_good_standing)
-      - Current total relationship balance < $100,000 (member_total_relationship_balance)
-      - For growth: must not already have a savings account
-      - For churn: must have a savings account
-    """
-    if not member.get('member_in_good_standing', False):
-        return False
-
-    try:
-        balance = float(member.get('member_total_relationship_balance', 0))
-        if balance >= 100000:
-            return False
-    except (ValueError, TypeError):
-        return False
-
-    if propensity_type == 'growth':
-        if savings_growth_indicator(products):
-            return False
-        
-    elif propensity_type == 'churn':
-        if not products or savings_churn_indicator(products):
-            return False
-
-    return True
-
-def eligibility_check_personal_loans(member: dict, products: list, propensity_type: str) -> bool:
-    """
-    Personal Loans rules:
-      - Member in good standing (member_in_good_standing)
-      - Estimated income > $24,000 (member_estimated_income)
-      - For growth: must not already have a personal loan
-      - For churn: must have a personal loan
-    """
-    if not member.get('member_in_good_standing', False):
-        return False
-
-    try:
-        income = float(member.get('member_estimated_income', 0))
-        if income <= 24000:
-            return False
-    except (ValueError, TypeError):
-        return False
+"""
+Eligibility rules for every product category
+
+Rules are declared as (member field, operator, value) conditions that must all hold, see components/eligibility_engine.py
+for the supported operators. On top of the member conditions, every category applies its product status logic:
+  - For growth: member must not already have the product
+  - For churn: member must have the product
+
+To add or modify a rule, edit eligibility_rule_definitions, it is compiled once into eligibility_rules below
+"""
+
+eligibility_rule_definitions = {
+    # Checking rules:
+    #   - Member in good standing (member_in_good_standing)
+    #   - No closed checking accounts in last 90 days (account_close_date)
+    'checking': [
+        ('member_in_good_standing', 'is', True),
+    ],
+    # Savings rules:
+    #   - Member in good standing (member_in_good_standing)
+    #   - Current total relationship balance < $100,000 (member_total_relationship_balance)
+    'savings': [
+        ('member_in_good_standing', 'is', True),
+        ('member_total_relationship_balance', '<', 100000),
+    ],
+    # Personal Loans rules:
+    #   - Member in good standing (member_in_good_standing)
+    #   - Estimated income > $24,000 (member_estimated_income)
+    'personal_loans': [
+        ('member_in_good_standing', 'is', True),
+        ('member_estimated_income', '>', 24000),
+    ],
+    # Business Loans rules:
+    #   - Member type is business (member_current_type should equal 'business')
+    #   - Member tenure > 2 years (member_tenure)
+    'business_loans': [
+        ('member_current_type', '==', 'business'),
+        ('member_tenure', '>', 2),
+    ],
+    # Certificates (CDs) rules:
+    #   - Total relationship balance > $500 (member_total_relationship_balance)
+    #   - Member in good standing (member_in_good_standing)
+    'certificates': [
+        ('member_total_relationship_balance', '>', 500),
+        ('member_in_good_standing', 'is', True),
+    ],
+}
 
-    if propensity_type == 'growth':
-        if personal_loans_growth_indicator(products):
-            return False
-    elif propensity_type == 'churn':
-        if not products or personal_loans_churn_indicator(products):
-            return False
+# Map product category keys to their corresponding compiled eligibility rules
+# Each rule is callable like an eligibility function: eligibility_rules[category](member, products, propensity_type)
+eligibility_rules = compile_eligibility_rules(eligibility_rule_definitions, product_status_indicators)
 
-    return True
+# Member fields read by the eligibility rules (the columns a scoring pipeline needs to load)
+eligibility_member_fields = sorted({
+    field for conditions in eligibility_rule_definitions.values() for field, _, _ in conditions
+})
 
-def eligibility_check_business_loans(member: dict, products: list, propensity_type: str) -> bool:
+def eligibility_mask(eligibility_fn, members: pd.DataFrame, products: pd.DataFrame, propensity_type: str, cache: RuleEvaluationCache = None) -> pd.Series:
     """
-    Business Loans rules:
-      - Member type is business (member_current_type should equal 'business')
-      - Member tenure > 2 years (member_tenure)
-      - For growth: must not already have a business loan
-      - For churn: must have a business loan
-    """
-    if member.get('member_current_type', '').lower() != 'business':
-        return False
-
-    try:
-        tenure = float(member.get('member_tenure', 0))
-        if tenure <= 2:
-            return False
-    except (ValueError, TypeError):
-        return False
+    Evaluates an eligibility function for every member in the members frame
+    - products: DataFrame of product accounts already filtered to the product category
+    - cache: RuleEvaluationCache shared across the categories and propensity types of one batch
 
-    if propensity_type == 'growth':
-        if business_loans_growth_indicator(products):
-            return False
-    elif propensity_type == 'churn':
-        if not products or business_loans_churn_indicator(products):
-            return False
-
-    return True
-
-def eligibility_check_certificates(member: dict, products: list, propensity_type: str) -> bool:
-    """
-    Certificates (CDs) rules:
-      - Total relationship balance > $500 (member_total_relationship_balance)
-      - Member in good standing (member_in_good_standing)
-      - For growth: must not already have a certificate/CD
-      - For churn: must have a certificate/CD
+    Compiled EligibilityRule objects are evaluated as vectorized masks, any other eligibility
+    function (e.g. custom rules added by data scientists) is called once per member
     """
-    try:
-        balance = float(member.get('member_total_relationship_balance', 0))
-        if balance <= 500:
-            return False
-    except (ValueError, TypeError):
-        return False
-
-    if not member.get('member_in_good_standing', False):
-        return False
-
-    if propensity_type == 'growth':
-        if certificates_growth_indicator(products):
-            return False
-    elif propensity_type == 'churn':
-        if not products or certificates_churn_indicator(products):
-            return False
-
-    return True
-
-# Map product category keys to their corresponding eligibility functions
-eligibility_rules = {
-    'checking': eligibility_check_checking,
-    'savings': eligibility_check_savings,
-    'personal_loans': eligibility_check_personal_loans,
-    'business_loans': eligibility_check_business_loans,
-    'certificates': eligibility_check_certificates,
-}
-        
-
+    if isinstance(eligibility_fn, EligibilityRule):
+        return eligibility_fn.mask(members, products, propensity_type, cache)
+
+    products_by_member = group_products_by_member(products)
+    eligible = [
+        bool(eligibility_fn(member, products_by_member.get(str(member['member_id']), []), propensity_type))
+        for member in members.to_dict('records')
+    ]
+    return pd.Series(eligible, index=members.index, dtype=bool)
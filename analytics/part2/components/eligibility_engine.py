@@ -0,0 +1,247 @@
+import operator
+import pandas as pd
+from .product_status_logic import product_status_columns
+
+"""
+Compiled eligibility rule engine
+
+Eligibility rules are written declaratively (see eligibility_rule_definitions in components/eligibility.py)
+as a list of (member field, operator, value) conditions per product category, e.g.
+
+    'savings': [
+        ('member_in_good_standing', 'is', True),
+        ('member_total_relationship_balance', '<', 100000),
+    ]
+
+compile_eligibility_rules turns the definitions into EligibilityRule objects once:
+- rule(member, products, propensity_type) checks a single member, like the original eligibility functions
+- rule.mask(members, products, propensity_type) checks every member of a members DataFrame at once
+Date-dependent product status logic is evaluated at an as-of date (rule(..., as_of) or the batch's
+RuleEvaluationCache.as_of), which defaults to the data load timestamp of the product accounts
+
+Supported operators:
+- 'is': truthiness of the field equals the value (e.g. ('member_in_good_standing', 'is', True))
+- '==', '!=': case-insensitive string comparison (e.g. ('member_current_type', '==', 'business'))
+- '<', '<=', '>', '>=': numeric threshold, the field is parsed as a float
+"""
+
+NUMERIC_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# A numeric condition fails when its opposite comparison holds, so a missing (NaN) value never fails a threshold
+# This matches the original "if balance >= 100000: return False" style checks
+OPPOSITE_OPERATORS = {
+    '<': '>=',
+    '<=': '>',
+    '>': '<=',
+    '>=': '<',
+}
+
+STRING_OPERATORS = {'==', '!='}
+
+# Default used when a member field is missing, same as member.get(field, default) in the original checks
+FIELD_DEFAULTS = {
+    'is': False,
+    '==': '',
+    '!=': '',
+}
+
+def _validate_condition(condition: tuple):
+    if len(condition) != 3:
+        raise ValueError(f"Eligibility condition {condition!r} must be (member field, operator, value).")
+    field, op, value = condition
+    if op not in NUMERIC_OPERATORS and op not in STRING_OPERATORS and op != 'is':
+        raise ValueError(f"Unsupported operator '{op}' in eligibility condition {condition!r}.")
+    if op in STRING_OPERATORS and not isinstance(value, str):
+        raise ValueError(f"Operator '{op}' in eligibility condition {condition!r} compares strings.")
+
+def condition_holds(member: dict, condition: tuple) -> bool:
+    """
+    Checks one condition for a single member (member is a dict of member fields)
+    """
+    field, op, value = condition
+
+    if op == 'is':
+        return bool(member.get(field, False)) == value
+
+    if op in STRING_OPERATORS:
+        member_value = member.get(field, '')
+        if not isinstance(member_value, str):
+            return False
+        return (member_value.lower() == value.lower()) == (op == '==')
+
+    try:
+        member_value = float(member.get(field, 0))
+    except (ValueError, TypeError):
+        return False
+    return not NUMERIC_OPERATORS[OPPOSITE_OPERATORS[op]](member_value, value)
+
+def condition_mask(members: pd.DataFrame, condition: tuple) -> pd.Series:
+    """
+    Vectorized condition_holds over every member of a members DataFrame
+    """
+    field, op, value = condition
+    if field in members.columns:
+        member_values = members[field]
+    else:
+        member_values = pd.Series(FIELD_DEFAULTS.get(op, 0), index=members.index)
+
+    if op == 'is':
+        return member_values.astype(object).astype(bool) == value
+
+    if op in STRING_OPERATORS:
+        is_string = member_values.map(lambda member_value: isinstance(member_value, str)).astype(bool)
+        matches = member_values.where(is_string).str.lower().eq(value.lower())
+        return is_string & (matches if op == '==' else ~matches)
+
+    numeric = pd.to_numeric(member_values, errors='coerce')
+    unparsable = numeric.isna() & member_values.notna()
+    return ~unparsable & ~NUMERIC_OPERATORS[OPPOSITE_OPERATORS[op]](numeric, value)
+
+class RuleEvaluationCache:
+    """
+    Shared intermediate results for one batch over a members DataFrame
+
+    - Member condition masks are keyed by condition, so a condition used by several rules
+      (e.g. good standing) is evaluated once across all categories and propensity types
+    - Parsed product status columns are keyed by category, so growth and churn reuse them
+    - The member feature matrix (see components/feature_store.py) is loaded once, the first time a model asks for it
+    - Eligibility masks are keyed by (eligibility function, category, propensity type), so models sharing the same
+      eligibility rules evaluate them once (PropensityScoringSystem keeps the cache across models of the same batch)
+    - as_of: date the product status indicators of the whole batch are evaluated at
+      (None: the data load timestamp of each category's product accounts, see data_reference_date)
+    """
+
+    def __init__(self, members: pd.DataFrame, feature_loader=None, as_of=None):
+        self.members = members
+        self.as_of = as_of
+        self._condition_masks = {}
+        self._product_status = {}
+        self._feature_loader = feature_loader
+        self._member_features = None
+        self._eligibility_masks = {}
+        self._category_products = {}
+
+    def condition_mask(self, condition: tuple) -> pd.Series:
+        if condition not in self._condition_masks:
+            self._condition_masks[condition] = condition_mask(self.members, condition)
+        return self._condition_masks[condition]
+
+    def conditions_mask(self, conditions: tuple) -> pd.Series:
+        """
+        Combined mask of several conditions (all must hold), cached as well
+        """
+        if conditions not in self._condition_masks:
+            mask = pd.Series(True, index=self.members.index)
+            for condition in conditions:
+                mask &= self.condition_mask(condition)
+            self._condition_masks[conditions] = mask
+        return self._condition_masks[conditions]
+
+    def product_status(self, category: str, products: pd.DataFrame) -> pd.DataFrame:
+        if category not in self._product_status:
+            self._product_status[category] = product_status_columns(products)
+        return self._product_status[category]
+
+    def category_products(self, category: str, products: pd.DataFrame) -> pd.DataFrame:
+        """
+        Product accounts filtered to one category, filtered once for every model and propensity type
+        """
+        if category not in self._category_products:
+            self._category_products[category] = products[products['product_category'] == category]
+        return self._category_products[category]
+
+    def eligibility_mask(self, key: tuple, compute) -> pd.Series:
+        """
+        Eligibility mask of key = (eligibility function, category, propensity type), compute() is only called the first time
+        """
+        if key not in self._eligibility_masks:
+            self._eligibility_masks[key] = compute()
+        return self._eligibility_masks[key]
+
+    def member_features(self) -> pd.DataFrame:
+        """
+        Feature matrix of the batch's members, or None when the batch has no feature loader
+        """
+        if self._member_features is None and self._feature_loader is not None:
+            self._member_features = self._feature_loader()
+        return self._member_features
+
+class EligibilityRule:
+    """
+    Compiled eligibility rule for one product category
+    - All member conditions must hold
+    - For growth: member must not already have the product (growth indicator not met)
+    - For churn: member must have the product and must not have churned (churn indicator not met)
+    """
+
+    def __init__(self, category: str, conditions: list, indicators: dict):
+        for condition in conditions:
+            _validate_condition(condition)
+        self.category = category
+        self.conditions = tuple(tuple(condition) for condition in conditions)
+        self.growth_indicator, self.growth_indicator_by_member = indicators['growth']
+        self.churn_indicator, self.churn_indicator_by_member = indicators['churn']
+
+    def __repr__(self) -> str:
+        return f"EligibilityRule(category={self.category!r}, conditions={list(self.conditions)!r})"
+
+    def __call__(self, member: dict, products: list, propensity_type: str, as_of=None) -> bool:
+        """
+        Single member check, same signature as the original eligibility functions
+        as_of: date the product status indicators are evaluated at (None: the load timestamp of the products)
+        """
+        for condition in self.conditions:
+            if not condition_holds(member, condition):
+                return False
+
+        if propensity_type == 'growth':
+            if self.growth_indicator(products, as_of):
+                return False
+        elif propensity_type == 'churn':
+            if not products or self.churn_indicator(products, as_of):
+                return False
+
+        return True
+
+    def mask(self, members: pd.DataFrame, products: pd.DataFrame, propensity_type: str, cache: RuleEvaluationCache = None) -> pd.Series:
+        """
+        Checks every member of the members frame at once
+        - products: DataFrame of product accounts already filtered to this rule's category
+        - cache: shared RuleEvaluationCache for the members frame (with the batch's as-of date), created here if not given
+        Returns a boolean Series aligned with the members index
+        """
+        if cache is None or cache.members is not members:
+            cache = RuleEvaluationCache(members, as_of=cache.as_of if cache is not None else None)
+        mask = cache.conditions_mask(self.conditions)
+
+        member_ids = members['member_id'].astype(str)
+        if propensity_type == 'growth':
+            has_product = member_ids.map(self.growth_indicator_by_member(cache.product_status(self.category, products), cache.as_of)).eq(True)
+            mask = mask & ~has_product
+        elif propensity_type == 'churn':
+            churned = self.churn_indicator_by_member(cache.product_status(self.category, products), cache.as_of)
+            mask = mask & member_ids.isin(churned.index) & ~member_ids.map(churned).eq(True)
+        else:
+            mask = mask.copy()
+
+        return mask
+
+def compile_eligibility_rules(rule_definitions: dict, indicators: dict) -> dict:
+    """
+    Compiles declarative rule definitions into a dictionary of EligibilityRule objects
+    - Key: product category
+    - Value: EligibilityRule, callable like the original eligibility functions
+
+    indicators maps each product category to its growth and churn indicators (see product_status_indicators)
+    """
+    rules = {}
+    for category, conditions in rule_definitions.items():
+        if category not in indicators:
+            raise ValueError(f"No product status indicators defined for category '{category}'.")
+        rules[category] = EligibilityRule(category, conditions, indicators[category])
+    return rules
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from .product_status_logic import product_status_columns, data_reference_date
+
+try:
+    import pyarrow  # noqa: F401
+    STORE_FORMAT = 'parquet'
+except ImportError:     # Without pyarrow the feature matrices are stored as pickles
+    STORE_FORMAT = 'pkl'
+
+"""
+Feature extraction and feature store
+
+build_member_features computes one columnar feature matrix per batch of members (indexed by member_id):
+- Member features: relationship balance, estimated income, tenure
+- Product features per category, e.g. 'savings_balance' or 'checking_days_since_open'
+  (account counts, open account counts, balances, transaction counts, days since the latest open/close date)
+
+FeatureStore keeps every matrix on disk keyed by a snapshot of the data it was computed from, so all models,
+categories and propensity types of a run (and later runs on the same data) reuse it instead of recomputing it.
+The store keeps the max_snapshots most recently used matrices, older ones are evicted.
+
+Usage:
+    store = FeatureStore('feature_store')
+    features = store.get(members_df, member_products_df, PRODUCT_CATEGORIES_LIST)
+    savings_features = features[category_feature_columns('savings')]
+"""
+
+# Bump when the feature definitions change, so matrices stored by an older version are not reused
+FEATURE_VERSION = 1
+
+MEMBER_FEATURES = [
+    'member_total_relationship_balance',
+    'member_estimated_income',
+    'member_tenure',
+]
+
+PRODUCT_FEATURES = [
+    'account_count',
+    'open_account_count',
+    'balance',
+    'original_balance',
+    'transaction_count',
+    'days_since_open',
+    'days_since_close',
+]
+
+# Product account columns the features are computed from
+PRODUCT_FEATURE_COLUMNS = [
+    'member_id',
+    'product_category',
+    'account_open_date',
+    'account_close_date',
+    'account_balance',
+    'account_original_balance',
+    'account_transaction_count',
+]
+
+def category_feature_columns(category: str) -> list:
+    """
+    Feature columns used to score one product category: member features + the category's product features
+    """
+    return MEMBER_FEATURES + [f"{category}_{feature}" for feature in PRODUCT_FEATURES]
+
+def feature_reference_date(products: pd.DataFrame, as_of=None) -> pd.Timestamp:
+    """
+    Date the "days since" features are measured from: the same as-of date as the product status indicators
+    (as_of, else the data load timestamp of the product accounts, else now, see data_reference_date)
+    """
+    return data_reference_date(products, as_of)
+
+def build_member_features(members: pd.DataFrame, products: pd.DataFrame, categories: list, as_of=None) -> pd.DataFrame:
+    """
+    Returns the feature matrix of every member in members (one row per member_id, as str)
+    - members: members DataFrame
+    - products: product accounts with a product_category column (only the given categories are used)
+    Members without accounts in a category get 0 counts and balances and missing "days since" features
+    """
+    member_ids = members['member_id'].astype(str)
+    features = pd.DataFrame(index=pd.Index(member_ids.drop_duplicates(), name='member_id'))
+
+    first_rows = ~member_ids.duplicated().to_numpy()
+    for feature in MEMBER_FEATURES:
+        values = members[feature] if feature in members.columns else pd.Series(np.nan, index=members.index)
+        features[feature] = pd.to_numeric(values, errors='coerce').to_numpy()[first_rows]
+
+    products = products[products['product_category'].isin(categories)]
+    reference_date = feature_reference_date(products, as_of)
+    status = product_status_columns(products)
+
+    accounts = pd.DataFrame({
+        'member_id': status['member_id'],
+        'product_category': products['product_category'].to_numpy(),
+        'account_count': 1,
+        'open_account_count': (status['is_open'] & ~status['is_closed']).astype(int),
+        'balance': status['balance'],
+        'original_balance': status['original_balance'],
+        'transaction_count': status['transaction_count'],
+        'open_date': status['open_date'],
+        'close_date': status['close_date'],
+    })
+    totals = accounts.groupby(['product_category', 'member_id'], sort=False).agg(
+        account_count=('account_count', 'sum'),
+        open_account_count=('open_account_count', 'sum'),
+        balance=('balance', 'sum'),
+        original_balance=('original_balance', 'sum'),
+        transaction_count=('transaction_count', 'sum'),
+        latest_open_date=('open_date', 'max'),
+        latest_close_date=('close_date', 'max'),
+    )
+    totals['days_since_open'] = (reference_date - totals.pop('latest_open_date')).dt.days
+    totals['days_since_close'] = (reference_date - totals.pop('latest_close_date')).dt.days
+
+    for category in categories:
+        category_totals = totals.xs(category, level='product_category') if category in totals.index.get_level_values(0) else totals.iloc[0:0].droplevel(0)
+        category_totals = category_totals.reindex(features.index)
+        for feature in PRODUCT_FEATURES:
+            values = category_totals[feature]
+            if not feature.startswith('days_since'):
+                values = values.fillna(0)   # No accounts in the category
+            features[f"{category}_{feature}"] = values.astype(float)
+
+    return features
+
+def data_snapshot(members: pd.DataFrame, products: pd.DataFrame, categories: list, as_of=None) -> str:
+    """
+    Key of the data a feature matrix is computed from: a hash of the member and product columns the features read,
+    the categories, the reference date and FEATURE_VERSION
+    """
+    digest = hashlib.sha1()
+    for df, columns in [(members, ['member_id'] + MEMBER_FEATURES), (products, PRODUCT_FEATURE_COLUMNS)]:
+        columns = [column for column in columns if column in df.columns]
+        digest.update(repr(columns).encode())
+        digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    digest.update(repr((sorted(categories), str(feature_reference_date(products, as_of)), FEATURE_VERSION)).encode())
+    return digest.hexdigest()[:16]
+
+class FeatureStore:
+    """
+    On-disk LRU store of feature matrices keyed by data snapshot (one file per snapshot in store_dir, the file
+    modification time is the last use)
+    The last matrix read or computed is also kept in memory, for the other models and propensity types of the batch
+    """
+
+    def __init__(self, store_dir: str, max_snapshots: int = 32):
+        if max_snapshots < 1:
+            raise ValueError(f"max_snapshots must be at least 1, got {max_snapshots}")
+        self.store_dir = store_dir
+        self.max_snapshots = max_snapshots
+        self._features = {}
+
+    def _path(self, snapshot: str) -> str:
+        return os.path.join(self.store_dir, f"features_{snapshot}.{STORE_FORMAT}")
+
+    def get(self, members: pd.DataFrame, products: pd.DataFrame, categories: list, as_of=None) -> pd.DataFrame:
+        """
+        Feature matrix of the members, read from the store if this snapshot was computed before
+        """
+        snapshot = data_snapshot(members, products, categories, as_of)
+        if snapshot in self._features:
+            return self._features[snapshot]
+
+        path = self._path(snapshot)
+        features = self._read(path)
+        if features is None:
+            features = build_member_features(members, products, categories, as_of)
+            os.makedirs(self.store_dir, exist_ok=True)
+            # Written to a temporary file first so an interrupted write never leaves a partial matrix
+            tmp_path = f"{path}.tmp"
+            if STORE_FORMAT == 'parquet':
+                features.to_parquet(tmp_path)
+            else:
+                features.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+            self._evict()
+
+        self._features = {snapshot: features}
+        return features
+
+    def _read(self, path: str):
+        # Stored matrix, or None if it was never stored (or evicted by another process)
+        try:
+            features = pd.read_parquet(path) if STORE_FORMAT == 'parquet' else pd.read_pickle(path)
+            os.utime(path)  # Most recently used
+        except FileNotFoundError:
+            return None
+        return features
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.store_dir):
+            if name.startswith('features_') and name.endswith(f".{STORE_FORMAT}"):
+                path = os.path.join(self.store_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_snapshots, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
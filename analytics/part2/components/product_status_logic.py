@@ -1,12 +1,50 @@
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 
-def checking_growth_indicator(products: list) -> bool:
+def _parse_date(value) -> datetime:
+    """
+    account_open_date as a datetime, whether it was loaded as a '%Y-%m-%d' string or already parsed at load time
+    Raises like strptime does for missing or invalid dates
+    """
+    if isinstance(value, datetime):
+        if pd.isna(value):
+            raise ValueError("Missing date")
+        return value
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def _load_timestamp(value):
+    # Data load timestamp of one product record, None when it is missing or invalid
+    if isinstance(value, str):
+        value = pd.to_datetime(value, errors='coerce')
+    if isinstance(value, datetime) and not pd.isna(value):
+        return pd.Timestamp(value)
+    return None
+
+def data_reference_date(products, as_of=None) -> pd.Timestamp:
+    """
+    As-of date the date-dependent indicators (and the "days since" features) are evaluated at:
+    as_of, else the data load timestamp of the product accounts (latest 'timestamp', as build_levels_full does with
+    current_date), else now (the result then depends on the moment it is computed)
+    - products: product accounts DataFrame, or a member's list of product records
+    """
+    if as_of is not None:
+        return pd.Timestamp(as_of)
+    if isinstance(products, pd.DataFrame):
+        load_timestamp = _timestamps(products['timestamp']).max() if 'timestamp' in products.columns else None
+    else:
+        timestamps = [timestamp for timestamp in (_load_timestamp(prod.get('timestamp')) for prod in products) if timestamp is not None]
+        load_timestamp = max(timestamps) if timestamps else None
+    if load_timestamp is not None and pd.notna(load_timestamp):
+        return load_timestamp
+    return pd.Timestamp(datetime.now())
+
+def checking_growth_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one checking account 
     with an account_open_date and no account_close_date
     """
-    if checking_churn_indicator(products):  # Checking if member had account(s) but churned
+    if checking_churn_indicator(products, as_of):  # Checking if member had account(s) but churned
         return False
     for prod in products:
         try:
@@ -18,7 +56,7 @@ def checking_growth_indicator(products: list) -> bool:
             return True
     return False
 
-def checking_churn_indicator(products: list) -> bool:
+def checking_churn_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one checking account record, and 
     every checking account record meets the churn indicator:
@@ -38,12 +76,12 @@ def checking_churn_indicator(products: list) -> bool:
             return False
     return True
 
-def savings_growth_indicator(products: list) -> bool:
+def savings_growth_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one savings account 
     with an account_open_date and no account_close_date
     """
-    if savings_churn_indicator(products):   # Checking if member had account(s) but churned
+    if savings_churn_indicator(products, as_of):   # Checking if member had account(s) but churned
         return False
     for prod in products:
         open_date = prod.get('account_open_date')
@@ -52,13 +90,15 @@ def savings_growth_indicator(products: list) -> bool:
             return True
     return False
 
-def savings_churn_indicator(products: list) -> bool:
+def savings_churn_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one savings account record, and
     every savings account record meets the churn indicator:
       - If the account is closed, it qualifies as churn
-      - Otherwise, account_balance < $100 and the account has been open for at least 60 days
+      - Otherwise, account_balance < $100 and the account has been open for at least 60 days on the as-of date
+    as_of: see data_reference_date, resolved once for all of the member's records
     """
+    as_of = data_reference_date(products, as_of) if products else None
     for prod in products:
         close_date = prod.get('account_close_date')
         if close_date and (not pd.isna(close_date) and close_date != ''):
@@ -71,19 +111,19 @@ def savings_churn_indicator(products: list) -> bool:
         if not open_date_str:
             return False
         try:
-            open_date = datetime.strptime(open_date_str, '%Y-%m-%d')
+            open_date = _parse_date(open_date_str)
         except Exception:
             return False
-        if (datetime.now() - open_date).days < 60 or balance >= 100:
+        if (as_of - open_date).days < 60 or balance >= 100:
             return False
     return True
 
-def personal_loans_growth_indicator(products: list) -> bool:
+def personal_loans_growth_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one personal loan 
     with an account_open_date and no account_close_date
     """
-    if personal_loans_churn_indicator(products):    # Checking if member had account(s) but churned
+    if personal_loans_churn_indicator(products, as_of):    # Checking if member had account(s) but churned
         return False
     for prod in products:
         open_date = prod.get('account_open_date')
@@ -92,7 +132,7 @@ def personal_loans_growth_indicator(products: list) -> bool:
             return True
     return False
 
-def personal_loans_churn_indicator(products: list) -> bool:
+def personal_loans_churn_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one personal loan record, and
     every personal loan record meets the churn indicator:
@@ -112,12 +152,12 @@ def personal_loans_churn_indicator(products: list) -> bool:
             return False
     return True
 
-def business_loans_growth_indicator(products: list) -> bool:
+def business_loans_growth_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one business loan 
     with an account_open_date and no account_close_date
     """
-    if business_loans_churn_indicator(products):    # Checking if member had account(s) but churned
+    if business_loans_churn_indicator(products, as_of):    # Checking if member had account(s) but churned
         return False
     for prod in products:
         open_date = prod.get('account_open_date')
@@ -126,7 +166,7 @@ def business_loans_growth_indicator(products: list) -> bool:
             return True
     return False
 
-def business_loans_churn_indicator(products: list) -> bool:
+def business_loans_churn_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one business loan record, and
     every business loan record meets the churn indicator:
@@ -143,12 +183,12 @@ def business_loans_churn_indicator(products: list) -> bool:
             return False
     return True
 
-def certificates_growth_indicator(products: list) -> bool:
+def certificates_growth_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one certificates/CD 
     with an account_open_date and no account_close_date
     """
-    if certificates_churn_indicator(products):  # Checking if member had account(s) but churned
+    if certificates_churn_indicator(products, as_of):  # Checking if member had account(s) but churned
         return False
     for prod in products:
         open_date = prod.get('account_open_date')
@@ -157,15 +197,17 @@ def certificates_growth_indicator(products: list) -> bool:
             return True
     return False
 
-def certificates_churn_indicator(products: list) -> bool:
+def certificates_churn_indicator(products: list, as_of=None) -> bool:
     """
     Returns True if the member has at least one certificates/CD record, and
     every certificates/CD record meets the churn indicator:
       - If the account is closed, it qualifies as churn
-      - Otherwise, today's date is within 30 days of term end (calculated as 
+      - Otherwise, the as-of date is within 30 days of term end (calculated as 
         account_open_date + product_term days) and there is no renewal activity
     Assumes 'product_term' is in days and 'renewal_activity' is a boolean flag
+    as_of: see data_reference_date, resolved once for all of the member's records
     """
+    as_of = data_reference_date(products, as_of) if products else None
     for prod in products:
         close_date = prod.get('account_close_date')
         if close_date and (not pd.isna(close_date) and close_date != ''):
@@ -178,12 +220,245 @@ def certificates_churn_indicator(products: list) -> bool:
         if not open_date:
             return False
         try:
-            open_date = datetime.strptime(open_date, '%Y-%m-%d')
+            open_date = _parse_date(open_date)
         except Exception:
             return False
         term_end = open_date + timedelta(days=product_term)
-        days_to_term_end = (term_end - datetime.now()).days
+        days_to_term_end = (term_end - as_of).days
         renewal_activity = prod.get('renewal_activity', False)
         if days_to_term_end > 30 or renewal_activity:
             return False
     return True
+
+
+"""
+Columnar product status indicators
+
+Each "_by_member" function mirrors the list-based indicator with the same name, but evaluates it for
+every member in a products DataFrame of a single category at once:
+- Row-level checks are vectorized over the whole frame
+- The "every record" / "at least one record" parts are groupby all/any reductions over member_id
+- Dates are parsed once by product_status_columns and compared against a single as-of date
+  (as_of, else the data load timestamp of the product accounts, see data_reference_date)
+
+Usage:
+    status = product_status_columns(products_df)
+    churned = checking_churn_indicator_by_member(status, as_of)
+
+Each function returns a boolean Series indexed by member_id (as str), members without products are not included
+"""
+
+def _truthy(values: pd.Series) -> pd.Series:
+    """
+    Python truthiness of every value (missing values like NaN are truthy, None and '' are not)
+    """
+    return values.astype(object).astype(bool)
+
+def _column(products: pd.DataFrame, column: str, default) -> pd.Series:
+    """
+    Returns a product column, or a column filled with the default used by prod.get() when the field is missing
+    """
+    if column in products.columns:
+        return products[column]
+    return pd.Series(default, index=products.index, dtype=object)
+
+def _numeric(values: pd.Series) -> tuple:
+    """
+    Returns the values as floats, and a mask of values that could be parsed by float()
+    Missing values are valid and come back as NaN
+    """
+    numeric = pd.to_numeric(values, errors='coerce')
+    return numeric, numeric.notna() | values.isna()
+
+def _timestamps(values: pd.Series) -> pd.Series:
+    """
+    Data load timestamps as datetimes, anything that isn't a valid timestamp becomes NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors='coerce')
+
+def _dates(values: pd.Series) -> pd.Series:
+    """
+    Parses '%Y-%m-%d' strings once for the whole column, anything that isn't a valid date string becomes NaT
+    Columns already parsed at load time are returned as is
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    strings = values.where(values.map(lambda value: isinstance(value, str)))
+    return pd.to_datetime(strings, format='%Y-%m-%d', errors='coerce')
+
+# Product account fields read by the indicators (the columns a scoring pipeline needs to load)
+# 'timestamp' (the data load timestamp) is the default as-of date of the date-dependent indicators
+PRODUCT_STATUS_FIELDS = [
+    'account_open_date',
+    'account_close_date',
+    'account_balance',
+    'account_original_balance',
+    'account_transaction_count',
+    'product_term',
+    'monthly_payment',
+    'renewal_activity',
+    'timestamp',
+]
+
+def product_status_columns(products: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extracts and parses the product fields used by the columnar indicators, once per products frame
+    """
+    open_dates = _column(products, 'account_open_date', None)
+    close_dates = _column(products, 'account_close_date', None)
+    balance, balance_valid = _numeric(_column(products, 'account_balance', 0))
+    original_balance, original_balance_valid = _numeric(_column(products, 'account_original_balance', 0))
+    transaction_count, _ = _numeric(_column(products, 'account_transaction_count', 0))
+    product_term, _ = _numeric(_column(products, 'product_term', 0))
+    monthly_payment = _column(products, 'monthly_payment', False)
+
+    return pd.DataFrame({
+        'member_id': products['member_id'].astype(str),
+        'is_open': _truthy(open_dates),
+        'is_closed': close_dates.notna() & _truthy(close_dates),
+        'open_date': _dates(open_dates),
+        'close_date': _dates(close_dates),
+        'balance': balance,
+        'balance_valid': balance_valid,
+        'original_balance': original_balance,
+        'original_balance_valid': original_balance_valid,
+        'transaction_count': transaction_count,
+        'transaction_count_valid': transaction_count.notna(),   # int() fails on missing values
+        'product_term_days': pd.to_timedelta(np.trunc(product_term), unit='D'),
+        'monthly_payment_set': monthly_payment.notna() & _truthy(monthly_payment),
+        'renewal_activity': _truthy(_column(products, 'renewal_activity', False)),
+        'load_timestamp': _timestamps(_column(products, 'timestamp', None)),
+    }, index=products.index)
+
+def _reference_date(status: pd.DataFrame, as_of) -> pd.Timestamp:
+    """
+    Single as-of date for a whole batch: as_of, else the latest data load timestamp of the records, else now
+    (same as data_reference_date)
+    """
+    if as_of is not None:
+        return pd.Timestamp(as_of)
+    load_timestamp = status['load_timestamp'].max()
+    return load_timestamp if pd.notna(load_timestamp) else pd.Timestamp(datetime.now())
+
+def _every_record(status: pd.DataFrame, record_meets_churn: pd.Series) -> pd.Series:
+    """
+    True for members whose every record is closed or meets the churn check
+    """
+    return (status['is_closed'] | record_meets_churn).groupby(status['member_id'], sort=False).all()
+
+def _growth_by_member(status: pd.DataFrame, churned: pd.Series) -> pd.Series:
+    """
+    True for members that have not churned and have at least one record with an account_open_date and no account_close_date
+    """
+    has_open_account = (status['is_open'] & ~status['is_closed']).groupby(status['member_id'], sort=False).any()
+    return has_open_account & ~churned.reindex(has_open_account.index)
+
+def checking_growth_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar checking_growth_indicator
+    """
+    return _growth_by_member(status, checking_churn_indicator_by_member(status, as_of))
+
+def checking_churn_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar checking_churn_indicator
+    """
+    low_activity = status['transaction_count_valid'] & (status['transaction_count'] < 3)
+    return _every_record(status, low_activity)
+
+def savings_growth_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar savings_growth_indicator
+    """
+    return _growth_by_member(status, savings_churn_indicator_by_member(status, as_of))
+
+def savings_churn_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar savings_churn_indicator
+    """
+    days_open = _reference_date(status, as_of) - status['open_date']
+    low_balance = (
+        status['balance_valid']
+        & (days_open >= pd.Timedelta(days=60))
+        & ~(status['balance'] >= 100)
+    )
+    return _every_record(status, low_balance)
+
+def personal_loans_growth_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar personal_loans_growth_indicator
+    """
+    return _growth_by_member(status, personal_loans_churn_indicator_by_member(status, as_of))
+
+def personal_loans_churn_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar personal_loans_churn_indicator
+    """
+    paid_down = (
+        status['balance_valid'] & status['original_balance_valid']
+        & ~(status['original_balance'] <= 0)
+        & ~(status['balance'] >= 0.8 * status['original_balance'])
+    )
+    return _every_record(status, paid_down)
+
+def business_loans_growth_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar business_loans_growth_indicator
+    """
+    return _growth_by_member(status, business_loans_churn_indicator_by_member(status, as_of))
+
+def business_loans_churn_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar business_loans_churn_indicator
+    """
+    return _every_record(status, ~status['monthly_payment_set'])
+
+def certificates_growth_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar certificates_growth_indicator
+    """
+    return _growth_by_member(status, certificates_churn_indicator_by_member(status, as_of))
+
+def certificates_churn_indicator_by_member(status: pd.DataFrame, as_of=None) -> pd.Series:
+    """
+    Columnar certificates_churn_indicator
+    """
+    time_to_term_end = status['open_date'] + status['product_term_days'] - _reference_date(status, as_of)
+    near_term_end = (
+        status['product_term_days'].notna()
+        & status['open_date'].notna()
+        & (time_to_term_end < pd.Timedelta(days=31))   # (term_end - as_of).days <= 30
+        & ~status['renewal_activity']
+    )
+    return _every_record(status, near_term_end)
+
+# Categories whose indicators read the as-of date (savings: accounts open for at least 60 days, certificates: terms
+# ending in the next 30 days), the indicators of the other categories only depend on the product records
+DATE_DEPENDENT_CATEGORIES = ['savings', 'certificates']
+
+# Map product category keys to their growth and churn indicators as (list-based, columnar) pairs
+product_status_indicators = {
+    'checking': {
+        'growth': (checking_growth_indicator, checking_growth_indicator_by_member),
+        'churn': (checking_churn_indicator, checking_churn_indicator_by_member),
+    },
+    'savings': {
+        'growth': (savings_growth_indicator, savings_growth_indicator_by_member),
+        'churn': (savings_churn_indicator, savings_churn_indicator_by_member),
+    },
+    'personal_loans': {
+        'growth': (personal_loans_growth_indicator, personal_loans_growth_indicator_by_member),
+        'churn': (personal_loans_churn_indicator, personal_loans_churn_indicator_by_member),
+    },
+    'business_loans': {
+        'growth': (business_loans_growth_indicator, business_loans_growth_indicator_by_member),
+        'churn': (business_loans_churn_indicator, business_loans_churn_indicator_by_member),
+    },
+    'certificates': {
+        'growth': (certificates_growth_indicator, certificates_growth_indicator_by_member),
+        'churn': (certificates_churn_indicator, certificates_churn_indicator_by_member),
+    },
+}
+
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from .feature_store import STORE_FORMAT
+
+"""
+Persisted score table with incremental rescoring
+
+The table holds one row per (member_id, category, propensity_type, model) with the score and the input hash of
+the member it was computed from. The input hash covers the member's row and all of their product account rows
+(in any order), so a daily run only rescores the members whose inputs changed (or who have no score yet)
+and merges their scores into the table.
+
+- The data load timestamp column ('timestamp') is not part of the input hash, since it changes on every load
+  even when nothing else does. The as-of date the date-dependent rules are evaluated at (system.resolve_as_of,
+  the data load timestamp unless the system has a fixed as_of) is only part of the input hash of the members whose
+  scores depend on it: members with product accounts in the model's as_of_categories (for the rules model, savings
+  and certificates accounts). A new as-of date only rescores those members
+- context: any other value the scores depend on (e.g. a model version), hashed into every input hash,
+  so changing it rescores every member
+- Rows of members that are not in the scored members frame are kept
+
+Usage:
+    table = ScoreTable('score_table.parquet')
+    summary = table.update(system, members_df, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+    scores_df = table.scores(members_df['member_id'], PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+"""
+
+# Bump when scoring changes in a way the input hashes do not capture, so every member is rescored
+SCORE_TABLE_VERSION = 3
+
+TABLE_COLUMNS = ['member_id', 'category', 'propensity_type', 'model', 'score', 'input_hash']
+
+# Stored as categoricals: a few distinct values each
+CATEGORICAL_COLUMNS = ['category', 'propensity_type', 'model']
+
+# Columns left out of the input hashes: the data load timestamp differs on every load
+IGNORED_COLUMNS = ['timestamp']
+
+def member_input_hashes(members: pd.DataFrame, products: pd.DataFrame, context=None, as_of=None, as_of_categories: list = None) -> pd.Series:
+    """
+    Input hash of every member (uint64, indexed by member_id as str, first row of duplicated member_ids):
+    a hash of the member row, the order-independent sum of the hashes of their product account rows, their number
+    of accounts, the hashed column names, context and SCORE_TABLE_VERSION
+    as_of: as-of date of the scores, hashed for the members with product accounts (product_category) in
+    as_of_categories, or for every member when as_of_categories is None. None leaves it out of every hash
+    """
+    member_ids = members['member_id'].astype(str)
+    first_rows = ~member_ids.duplicated().to_numpy()
+    member_ids = pd.Index(member_ids.to_numpy()[first_rows], name='member_id')
+    member_columns = [column for column in members.columns if column not in IGNORED_COLUMNS]
+    product_columns = [column for column in products.columns if column not in IGNORED_COLUMNS]
+
+    member_hashes = pd.util.hash_pandas_object(members.loc[first_rows, member_columns], index=False).to_numpy()
+
+    # Product rows of members that are not in the members frame are left out
+    codes = member_ids.get_indexer(products['member_id'].astype(str))
+    in_members = codes >= 0
+    product_hashes = pd.util.hash_pandas_object(products[product_columns], index=False).to_numpy()
+    product_sums = np.zeros(len(member_ids), dtype=np.uint64)
+    np.add.at(product_sums, codes[in_members], product_hashes[in_members])   # Wraps around, order-independent
+    product_counts = np.bincount(codes[in_members], minlength=len(member_ids)).astype(np.uint64)
+
+    as_of_hashes = np.zeros(len(member_ids), dtype=np.uint64)
+    if as_of is not None:
+        dated = np.ones(len(member_ids), dtype=bool)
+        if as_of_categories is not None:
+            dated = np.zeros(len(member_ids), dtype=bool)
+            dated[codes[in_members & products['product_category'].isin(as_of_categories).to_numpy()]] = True
+        as_of_hashes[dated] = int.from_bytes(hashlib.sha1(str(pd.Timestamp(as_of)).encode()).digest()[:8], 'little')
+
+    salt = hashlib.sha1(repr((member_columns, product_columns, context, SCORE_TABLE_VERSION)).encode()).digest()
+    combined = pd.DataFrame({
+        'member': member_hashes,
+        'products': product_sums,
+        'accounts': product_counts,
+        'as_of': as_of_hashes,
+        'salt': np.uint64(int.from_bytes(salt[:8], 'little')),
+    })
+    return pd.Series(pd.util.hash_pandas_object(combined, index=False).to_numpy(), index=member_ids, name='input_hash')
+
+def _value_positions(column: pd.Series, values: list) -> np.ndarray:
+    # Position in values of every row of a column with few distinct values (-1 if not in values),
+    # each distinct value is looked up once
+    codes, uniques = pd.factorize(column)
+    return np.append(pd.Index(values).get_indexer(uniques), -1)[codes]
+
+def _concat_rows(table: pd.DataFrame, new_rows: dict) -> pd.DataFrame:
+    # Categorical columns are merged with union_categoricals (with str categories), pd.concat would turn them into
+    # str columns when the new rows have other categories
+    merged = {}
+    for column in TABLE_COLUMNS:
+        if column in CATEGORICAL_COLUMNS:
+            parts = [pd.Categorical(table[column]), new_rows[column]]
+            merged[column] = union_categoricals([part.rename_categories(part.categories.astype(str)) for part in parts])
+        else:
+            merged[column] = pd.concat([table[column], pd.Series(new_rows[column], dtype=table[column].dtype)], ignore_index=True)
+    return pd.DataFrame(merged)
+
+class ScoreTable:
+    """
+    Score table stored in one file (Parquet, or a pickle without pyarrow), see the module docstring
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> pd.DataFrame:
+        """
+        The stored table, empty if nothing was stored yet
+        """
+        if not os.path.exists(self.path):
+            return pd.DataFrame({
+                'member_id': pd.Series(dtype=str), 'category': pd.Series(dtype='category'),
+                'propensity_type': pd.Series(dtype='category'), 'model': pd.Series(dtype='category'),
+                'score': pd.Series(dtype=float), 'input_hash': pd.Series(dtype=np.uint64),
+            })
+        return pd.read_parquet(self.path) if STORE_FORMAT == 'parquet' else pd.read_pickle(self.path)
+
+    def _save(self, table: pd.DataFrame):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file first so an interrupted write never leaves a partial table
+        tmp_path = f"{self.path}.tmp"
+        if STORE_FORMAT == 'parquet':
+            table.to_parquet(tmp_path, index=False)
+        else:
+            table.to_pickle(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def update(self, system, members_df: pd.DataFrame, products_df: pd.DataFrame, categories: list, propensity_types: list, model_name: str, context=None) -> dict:
+        """
+        Rescores (with system.score_batch) the members whose input hash differs from the one stored with any of their
+        (category, propensity_type) scores for model_name, or who are missing one of them, and merges their scores
+        into the table. Every member is scored at the same as-of date, system.resolve_as_of(products_df), which is
+        part of the input hash of the members with accounts in the model's as_of_categories (see the module docstring)
+
+        Returns a summary: members and rows (member x category x propensity type) rescored and skipped
+        """
+        as_of = system.resolve_as_of(products_df)
+        model = system.models.get(model_name)
+        as_of_categories = model.as_of_categories() if model is not None else None
+        input_hashes = member_input_hashes(members_df, products_df, context, as_of, as_of_categories)
+        hashes = input_hashes.to_numpy()
+        table = self.load()
+
+        # Position in input_hashes of the member of every stored score of the requested model, categories and
+        # propensity types (-1 for other scores and for members that are not in members_df)
+        requested = (table['model'] == model_name).to_numpy() & (_value_positions(table['category'], categories) >= 0) & (_value_positions(table['propensity_type'], propensity_types) >= 0)
+        positions = np.where(requested, input_hashes.index.get_indexer(table['member_id']), -1)
+
+        # A member is up to date when every requested score is stored with their current input hash
+        current = positions >= 0
+        current[current] = table['input_hash'].to_numpy(dtype=np.uint64)[current] == hashes[positions[current]]
+        rows_per_member = len(categories) * len(propensity_types)
+        changed = np.bincount(positions[current], minlength=len(hashes)) != rows_per_member
+
+        # Only the changed members (first row per member_id, in the order of input_hashes) and their product accounts are scored
+        first_rows = np.flatnonzero(~members_df['member_id'].astype(str).duplicated().to_numpy())
+        changed_members = members_df.iloc[first_rows[changed]]
+        product_positions = input_hashes.index.get_indexer(products_df['member_id'].astype(str))
+        product_changed = product_positions >= 0
+        product_changed[product_changed] = changed[product_positions[product_changed]]
+        changed_products = products_df[product_changed]
+        results = system.score_batch(changed_members, changed_products, categories, propensity_types, model_name, as_of)
+
+        # Long form: one row per member x category x propensity type, category block by category block
+        combination_codes = np.repeat(np.arange(len(categories) * len(propensity_types)), len(results))
+        new_rows = {
+            'member_id': np.tile(results['member_id'].astype(str).to_numpy(), len(categories) * len(propensity_types)),
+            'category': pd.Categorical.from_codes(combination_codes // len(propensity_types), categories=categories),
+            'propensity_type': pd.Categorical.from_codes(combination_codes % len(propensity_types), categories=propensity_types),
+            'model': pd.Categorical.from_codes(np.zeros(len(combination_codes), dtype=np.int8), categories=[model_name]),
+            'score': np.concatenate([results[f"{category}_{propensity_type}_score"].to_numpy(dtype=float) for category in categories for propensity_type in propensity_types] or [np.array([], dtype=float)]),
+            'input_hash': np.tile(hashes[changed], len(categories) * len(propensity_types)),
+        }
+
+        replaced = positions >= 0
+        replaced[replaced] = changed[positions[replaced]]
+        self._save(_concat_rows(table[~replaced], new_rows))
+
+        members_skipped = int((~changed).sum())
+        return {
+            'members_scored': len(results),
+            'members_skipped': members_skipped,
+            'rows_scored': len(combination_codes),
+            'rows_skipped': members_skipped * rows_per_member,
+        }
+
+    def scores(self, member_ids: pd.Series, categories: list, propensity_types: list, model_name: str) -> pd.DataFrame:
+        """
+        Stored scores in the form of score_batch: one row per member_id (in the given order) and one
+        "{category}_{propensity_type}_score" column per combination, missing values for scores that are not stored
+        """
+        table = self.load()
+        member_ids = pd.Series(member_ids).astype(str).reset_index(drop=True)
+        unique_ids = pd.Index(member_ids.unique())
+
+        # Row (member) and column (category x propensity type) of every stored score of the model
+        rows = unique_ids.get_indexer(table['member_id'])
+        category_codes = _value_positions(table['category'], categories)
+        propensity_type_codes = _value_positions(table['propensity_type'], propensity_types)
+        stored = (table['model'] == model_name).to_numpy() & (rows >= 0) & (category_codes >= 0) & (propensity_type_codes >= 0)
+
+        scores = np.full((len(unique_ids), len(categories) * len(propensity_types)), np.nan)
+        scores[rows[stored], category_codes[stored] * len(propensity_types) + propensity_type_codes[stored]] = table['score'].to_numpy(dtype=float)[stored]
+        scores = scores[unique_ids.get_indexer(member_ids)]
+
+        results = {'member_id': member_ids}
+        for i, (category, propensity_type) in enumerate((category, propensity_type) for category in categories for propensity_type in propensity_types):
+            results[f"{category}_{propensity_type}_score"] = scores[:, i]
+        return pd.DataFrame(results)
@@ -1,10 +1,12 @@
 import pandas as pd
-from components.data_ingestion import load_data, get_member_products_by_category
+from components.data_ingestion import load_data, get_member_products_by_category, MemberIndex, MemberProductsIndex
 from globals import PRODUCT_CATEGORIES, PRODUCT_CATEGORIES_LIST
-from components.eligibility import eligibility_rules
+from components.eligibility import eligibility_rules, eligibility_member_fields
+from components.product_status_logic import PRODUCT_STATUS_FIELDS, data_reference_date
 from models.rules_based_model import RulesBasedPropensityModel
 from models.ml_model import MLPropensityModel
 from models.system import PropensityScoringSystem
+from models.registry import ModelSpec
 
 """
 Demo:
@@ -12,7 +14,7 @@ Demo:
 Allows user to self-input member_id, product categories to get scores for, propensity type, and model (if loaded to system)
 """
 
-def propensity_score_retrieval(members_df, member_products_df, scoring_system):
+def propensity_score_retrieval(member_index, member_products_index, scoring_system):
 
     print("Available product categories: " + ", ".join(PRODUCT_CATEGORIES))
     print("Available models: 'rules', 'ml'")
@@ -28,12 +30,11 @@ def propensity_score_retrieval(members_df, member_products_df, scoring_system):
         if not member_id:
             continue
         
-        # Look up the member in members_df
-        member_row = members_df[members_df['member_id'] == member_id]
-        if member_row.empty:
+        # Look up the member in the member index
+        member = member_index.get(member_id)
+        if member is None:
             print(f"Member id '{member_id}' not found.")
             continue
-        member = member_row.iloc[0].to_dict()
         
         # Prompt for product categories; if empty, use all
         print("Available product categories: " + ", ".join(PRODUCT_CATEGORIES_LIST))
@@ -57,7 +58,7 @@ def propensity_score_retrieval(members_df, member_products_df, scoring_system):
             model_name = 'rules'
         
         # Retrieve this member's product records by category
-        products_by_category = get_member_products_by_category(member_id, member_products_df)
+        products_by_category = get_member_products_by_category(member_id, member_products_index)
         
         print(f"\nScores for member {member_id} using model '{model_name}':")
         for category in categories:
@@ -69,26 +70,34 @@ def propensity_score_retrieval(members_df, member_products_df, scoring_system):
         
 def main():
     # Load data from CSV files
-    members_df, member_products_df = load_data('../../data/members.csv', '../../data/member_product_accounts.csv')
+    # Only the columns read by the eligibility rules and product status indicators are loaded
+    members_df, member_products_df = load_data(
+        '../../data/members.csv', '../../data/member_product_accounts.csv',
+        member_columns=['member_id'] + eligibility_member_fields,
+        product_columns=['member_id', 'product_category_id'] + PRODUCT_STATUS_FIELDS,
+    )
     
     # Ensure member_id columns are strings
     members_df['member_id'] = members_df['member_id'].astype(str)
     member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+
+    # Index members and product accounts by member once so each lookup is constant time
+    member_index = MemberIndex(members_df)
+    member_products_index = MemberProductsIndex(member_products_df)
     
     # Initialize the scoring system and register a rules-based model
-    scoring_system = PropensityScoringSystem()
+    # Date-dependent rules are evaluated at the data load timestamp, the same date for every lookup
+    scoring_system = PropensityScoringSystem(as_of=data_reference_date(member_products_df))
 
-    # Initialize rules-based propensity model + add it to the scoring system
-    rules_model = RulesBasedPropensityModel(eligibility_rules)
-    scoring_system.add_model('rules', rules_model)
+    # Register the rules-based propensity model, it is built the first time it scores a member
+    scoring_system.add_model_spec(ModelSpec('rules', RulesBasedPropensityModel, kwargs={'eligibility_rules': eligibility_rules}))
 
-    # Initialize ML propensity model + add it to the scoring system
+    # Register the ML propensity model, only built if it is chosen
     model_x = None  # Dummy pretrained machine learning model for MLPropensityModel
-    ml_model = MLPropensityModel(model_x, eligibility_rules)
-    scoring_system.add_model('ml', ml_model)
+    scoring_system.add_model_spec(ModelSpec('ml', MLPropensityModel, kwargs={'ml_model': model_x, 'eligibility_rules': eligibility_rules}))
     
     # Start the loop
-    propensity_score_retrieval(members_df, member_products_df, scoring_system)
+    propensity_score_retrieval(member_index, member_products_index, scoring_system)
 
 if __name__ == '__main__':
     main()
@@ -1,65 +1,89 @@
+import argparse
 import pandas as pd
-from components.data_ingestion import load_data
-from components.data_ingestion import get_member_products_by_category
+from components.data_ingestion import load_data, iter_member_chunks, products_reference_date
 from globals import PRODUCT_CATEGORIES, PRODUCT_CATEGORIES_LIST
 from models.rules_based_model import RulesBasedPropensityModel
 from models.ml_model import MLPropensityModel
 from models.system import PropensityScoringSystem
-from components.eligibility import eligibility_rules
+from models.registry import ModelSpec
+from components.eligibility import eligibility_rules, eligibility_member_fields
+from components.product_status_logic import PRODUCT_STATUS_FIELDS
+from components.feature_store import FeatureStore, MEMBER_FEATURES
+from components.score_table import ScoreTable
 
 """
 The main purpose of this file is to test the general flow of the system.
 To see and test the modularity of the system, run "demo.py"
 """
 
-def main():
+# Columns read by the eligibility rules, product status indicators and member features, the only ones that are loaded
+MEMBER_COLUMNS = ['member_id'] + sorted(set(eligibility_member_fields + MEMBER_FEATURES))
+PRODUCT_COLUMNS = ['member_id', 'product_category_id'] + PRODUCT_STATUS_FIELDS
+
+def main(stream: bool = False, chunk_size: int = 10000, block_size: int = 100000, limit: int = 20, workers: int = 1, score_table: str = None, as_of: str = None):
+    # Initialize the Propensity Scoring System and register a rules-based model
+    # Member features used by the ML model are computed once per data snapshot and kept in feature_store/
+    # Date-dependent rules are evaluated at as_of (None: the data load timestamp), so the same data always gets the same scores
+    system = PropensityScoringSystem(feature_store=FeatureStore('feature_store'), as_of=as_of)
+    # Models are registered by spec and only built when first used
+    # The rules-based model now contains its own scoring function internally.
+    system.add_model_spec(ModelSpec('rules', RulesBasedPropensityModel, kwargs={'eligibility_rules': eligibility_rules}))
+
+    model_x = None  # Dummy pretrained machine learning model for MLPropensityModel (a real one would be loaded from artifact_path)
+    system.add_model_spec(ModelSpec('ml', MLPropensityModel, kwargs={'ml_model': model_x, 'eligibility_rules': eligibility_rules}))
+
+    if stream:
+        # Score every member in chunks (member_id hash buckets), appending each chunk's scores to scores.csv
+        member_chunks = iter_member_chunks(
+            '../../data/members.csv', '../../data/member_product_accounts.csv', chunk_size,
+            member_columns=MEMBER_COLUMNS, product_columns=PRODUCT_COLUMNS, block_size=block_size,
+        )
+        # Every chunk is scored at the as-of date of all the product accounts (as_of, else their latest load timestamp)
+        stream_as_of = products_reference_date('../../data/member_product_accounts.csv', as_of, block_size)
+        scored = system.score_stream(member_chunks, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', 'scores.csv', stream_as_of)
+        print(f"Scored {scored} members in chunks of {chunk_size}, written to scores.csv")
+        return
+
     # Load the data
-    members_df, member_products_df = load_data('../../data/members.csv', '../../data/member_product_accounts.csv')
+    members_df, member_products_df = load_data(
+        '../../data/members.csv', '../../data/member_product_accounts.csv',
+        member_columns=MEMBER_COLUMNS, product_columns=PRODUCT_COLUMNS,
+    )
     
     # Ensure member_id columns are strings
     members_df['member_id'] = members_df['member_id'].astype(str)
     member_products_df['member_id'] = member_products_df['member_id'].astype(str)
 
-    test_members = members_df.head(20)
-    
-    # Initialize the Propensity Scoring System and register a rules-based model
-    system = PropensityScoringSystem()
-    # The rules-based model now contains its own scoring function internally.
-    rules_model = RulesBasedPropensityModel(eligibility_rules)
-    system.add_model('rules', rules_model)
+    test_members = members_df.head(limit) if limit else members_df
 
-    model_x = None  # Dummy pretrained machine learning model for MLPropensityModel
-    ml_model = MLPropensityModel(model_x, eligibility_rules)
-    system.add_model('ml', ml_model)
-    
-    results = []
-    for _, member_row in test_members.iterrows():
-        member = member_row.to_dict()
-        member_id = member['member_id']
-        member_result = {'member_id': member_id}
-        
-        # Get the member's product records, grouped by category
-        products_by_category = get_member_products_by_category(member_id, member_products_df)
-        
-        # Loop over each defined product category
-        for category in PRODUCT_CATEGORIES_LIST:
-            # Retrieve the list of product records for this category
-            products_list = products_by_category.get(category, [])
-            
-            # For each propensity type, call the model's score function
-            for propensity_type in ['growth', 'churn']:
-                score = system.score_member(member, products_list, category, propensity_type, 'rules') # model name can be switched out to either 'rules' or 'ml'
-                key = f"{category}_{propensity_type}_score"
-                member_result[key] = score
-        
-        results.append(member_result)
+    if score_table:
+        # Only rescore the members whose member or product account rows changed since the last run
+        table = ScoreTable(score_table)
+        summary = table.update(system, test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+        print(f"Rescored {summary['members_scored']} members ({summary['rows_scored']} scores), skipped {summary['members_skipped']} unchanged members ({summary['rows_skipped']} scores)")
+        results_df = table.scores(test_members['member_id'], PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+    # Score every member for each defined product category and propensity type in one batch
+    # model name can be switched out to either 'rules' or 'ml'
+    elif workers == 1:
+        results_df = system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+    else:
+        # Members sharded by member_id across a process pool (0 workers: one per CPU)
+        results_df = system.score_sharded(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', max_workers=workers or None)
     
-    # Convert the results list into a DataFrame and print.
-    results_df = pd.DataFrame(results)
+    # Print the results DataFrame
     pd.set_option('display.max_columns', None)
     print("Member-Level Propensity Scores:")
     print(results_df)
     results_df.to_csv('scores.csv', index=False)
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stream', action='store_true', help="score every member in chunks of member_id hash buckets with bounded memory")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="members per chunk in streaming mode")
+    parser.add_argument('--block-size', type=int, default=100000, help="rows read from the input files at a time in streaming mode")
+    parser.add_argument('--limit', type=int, default=20, help="number of members to score, 0 scores every member")
+    parser.add_argument('--workers', type=int, default=1, help="processes scoring member shards in parallel, 0 uses one per CPU")
+    parser.add_argument('--score-table', default=None, help="persisted score table, only members whose inputs changed since the last run are rescored")
+    parser.add_argument('--as-of', default=None, help="date the date-dependent rules are evaluated at (YYYY-MM-DD), defaults to the data load timestamp")
+    args = parser.parse_args()
+    main(stream=args.stream, chunk_size=args.chunk_size, block_size=args.block_size, limit=args.limit, workers=args.workers, score_table=args.score_table, as_of=args.as_of)
@@ -1,4 +1,8 @@
+import pandas as pd
 from .propensity_model import BasePropensityModel
+from components.eligibility_engine import EligibilityRule
+from components.feature_store import build_member_features, category_feature_columns
+from globals import PRODUCT_CATEGORIES_LIST
 
 class MLPropensityModel(BasePropensityModel):
     def __init__(self, ml_model, eligibility_rules: dict):
@@ -19,6 +23,21 @@ class MLPropensityModel(BasePropensityModel):
             return None  # Not eligible.
         return self._scoring_logic(member, products, category, propensity_type)
 
+    def score_eligible(self, member: dict, products: list, category: str, propensity_type: str) -> float:
+        """
+        Scoring logic only, for members whose eligibility was already checked
+        """
+        return self._scoring_logic(member, products, category, propensity_type)
+
+    def as_of_categories(self):
+        """
+        The "days since" features of every category are computed at the as-of date, so the scores of any member with
+        product accounts depend on it. Custom eligibility functions may read any date
+        """
+        if not all(isinstance(rule, EligibilityRule) for rule in self.eligibility_rules.values()):
+            return None
+        return list(PRODUCT_CATEGORIES_LIST)
+
     def _scoring_logic(self, member: dict, products: list, category: str, propensity_type: str) -> list:
         """
         Scoring logic for ML model can include using sklearn's predict or predict_proba
@@ -33,4 +52,28 @@ class MLPropensityModel(BasePropensityModel):
 
         """
         return 1.0
-        
+
+    def extract_features(self, members: pd.DataFrame, products: pd.DataFrame, category: str, propensity_type: str, cache=None) -> pd.DataFrame:
+        """
+        Feature matrix of the eligible members, one row per member (same index as members):
+        member features + the category's product features (see components/feature_store.py)
+        Taken from the batch's shared feature matrix when the scoring system has a feature store, computed for this category otherwise
+        """
+        member_features = cache.member_features() if cache is not None else None
+        if member_features is None:
+            member_features = build_member_features(members, products, [category], cache.as_of if cache is not None else None)
+        features = member_features.reindex(members['member_id'].astype(str))[category_feature_columns(category)]
+        return features.set_axis(members.index)
+
+    def score_many(self, features: pd.DataFrame, category: str, propensity_type: str) -> pd.Series:
+        """
+        Batch version of _scoring_logic: a single ML model call for every eligible member of the category
+
+        Ex:
+
+        probs = self.ml_model.predict_proba(features)[:, 1]
+
+        return pd.Series(probs, index=features.index)
+
+        """
+        return pd.Series(1.0, index=features.index)
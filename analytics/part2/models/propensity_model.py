@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from components.data_ingestion import group_products_by_member
+from components.eligibility import eligibility_mask
 
 class BasePropensityModel(ABC):
+    # Dictionary mapping product categories to eligibility functions, set by models that check eligibility
+    eligibility_rules = None
+
     @abstractmethod
     def score(self, member: dict, products: list, category: str, propensity_type: str) -> float:
         """
@@ -8,3 +15,80 @@ class BasePropensityModel(ABC):
         If user is eligible, invoke a scoring function that will return a float score value
         """
         pass
+
+    def as_of_categories(self):
+        """
+        Product categories in which a member needs accounts for any of their scores to depend on the as-of date,
+        so a new as-of date only rescores those members (see ScoreTable)
+        None when the scores of any member may depend on it, the default for models that do not say
+        """
+        return None
+
+    def score_eligible(self, member: dict, products: list, category: str, propensity_type: str) -> float:
+        """
+        Scores a member that already passed the eligibility check (PropensityScoringSystem checks eligibility
+        once for every model sharing the same eligibility rules)
+        Default implementation calls score, which checks eligibility again
+        """
+        return self.score(member, products, category, propensity_type)
+
+    def score_batch(self, members: pd.DataFrame, products: pd.DataFrame, category: str, propensity_type: str, cache=None) -> pd.Series:
+        """
+        Scores every member of the members frame for one product category and propensity type
+        - members: DataFrame of members (one row per member)
+        - products: DataFrame of product accounts already filtered to the product category
+        - cache: RuleEvaluationCache shared by every category and propensity type of the batch
+        Returns a float Series aligned with the members index, with missing values for ineligible members
+
+        Eligibility masking is handled here: features are only extracted for the eligible members,
+        and score_many is called once for all of them
+        """
+        scores = pd.Series(np.nan, index=members.index)
+        eligible = self.eligible_mask(members, products, category, propensity_type, cache)
+        if eligible.any():
+            features = self.extract_features(members[eligible], products, category, propensity_type, cache)
+            scores[eligible] = pd.Series(self.score_many(features, category, propensity_type), index=features.index, dtype=float)
+        return scores
+
+    def eligible_mask(self, members: pd.DataFrame, products: pd.DataFrame, category: str, propensity_type: str, cache=None) -> pd.Series:
+        """
+        Boolean Series (aligned with the members index) of the members to score
+        Models without eligibility rules score every member, their score function checks eligibility itself
+        """
+        if self.eligibility_rules is None:
+            return pd.Series(True, index=members.index)
+        eligibility_fn = self.eligibility_rules.get(category)
+        if eligibility_fn is None:
+            return pd.Series(False, index=members.index)  # Not eligible.
+        if cache is None or cache.members is not members:
+            return eligibility_mask(eligibility_fn, members, products, propensity_type, cache)
+        # Shared with every other model of the batch that uses the same eligibility function
+        return cache.eligibility_mask(
+            (eligibility_fn, category, propensity_type),
+            lambda: eligibility_mask(eligibility_fn, members, products, propensity_type, cache),
+        )
+
+    def extract_features(self, members: pd.DataFrame, products: pd.DataFrame, category: str, propensity_type: str, cache=None) -> pd.DataFrame:
+        """
+        Feature matrix of the eligible members (one row per member, same index as members)
+        cache: the batch's RuleEvaluationCache, cache.member_features() gives the shared member feature matrix
+        Default: the member fields plus a 'products' column holding each member's product records,
+        which is what score needs for the fallback in score_many
+        """
+        products_by_member = group_products_by_member(products)
+        member_products = [products_by_member.get(member_id, []) for member_id in members['member_id'].astype(str)]
+        return members.assign(products=pd.Series(member_products, index=members.index, dtype=object))
+
+    def score_many(self, features: pd.DataFrame, category: str, propensity_type: str) -> pd.Series:
+        """
+        Scores every row of the feature matrix at once, models with batch inference (e.g. one predict_proba
+        call per batch) should override it together with extract_features
+        Returns the scores aligned with the features index
+
+        Default implementation calls score once per member
+        """
+        scores = []
+        for member in features.to_dict('records'):
+            products = member.pop('products')
+            scores.append(self.score(member, products, category, propensity_type))
+        return pd.Series(scores, index=features.index, dtype=float)
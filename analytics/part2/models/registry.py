@@ -0,0 +1,260 @@
+import importlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import numpy as np
+
+try:
+    import joblib
+except ImportError:     # Without joblib, .joblib artifacts cannot be loaded (.npy and pickle artifacts still can)
+    joblib = None
+
+"""
+Model registry with lazy loading and hot swaps
+
+Models are registered either as constructed objects (add, never evicted) or as ModelSpecs:
+- A spec's model is only built on its first use (get), from its artifact file when it has one
+- Artifacts are memory-mapped where the format allows it (.npy, .joblib), so large arrays are paged in on use
+- swap replaces a model atomically: callers that already got the previous version keep using it until they are done,
+  every later get returns the new one. reload_changed swaps every loaded model whose artifact file changed
+- With a memory_budget, the least recently used spec models are unloaded once the loaded models exceed it
+  (they are loaded again on their next use)
+
+Usage:
+    registry = ModelRegistry(memory_budget=2 * 2**30)
+    registry.register(ModelSpec('ml', MLPropensityModel, 'artifacts/ml_v1.joblib', {'eligibility_rules': eligibility_rules}))
+    model = registry.get('ml')      # Loaded here
+    registry.swap(ModelSpec('ml', MLPropensityModel, 'artifacts/ml_v2.joblib', {'eligibility_rules': eligibility_rules}))
+"""
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """
+    How to build a model:
+    - model_class: the model class, or its import path as 'module:ClassName'
+    - artifact_path: file of the pretrained model (e.g. an ML estimator), passed as first argument of model_class
+    - kwargs: other keyword arguments of model_class
+    - size_bytes: memory counted against the registry budget (defaults to the artifact file size)
+    """
+    name: str
+    model_class: object
+    artifact_path: str = None
+    kwargs: dict = field(default_factory=dict)
+    version: str = None
+    size_bytes: int = None
+
+def resolve_model_class(model_class):
+    """
+    The class itself, or the class named by a 'module:ClassName' import path
+    """
+    if not isinstance(model_class, str):
+        return model_class
+    module_name, _, class_name = model_class.partition(':')
+    if not class_name:
+        raise ValueError(f"Model class must be given as 'module:ClassName', got '{model_class}'")
+    return getattr(importlib.import_module(module_name), class_name)
+
+def load_artifact(path: str):
+    """
+    Loads a model artifact, memory-mapped where possible:
+    - .npy: read-only numpy memmap
+    - .joblib: joblib.load with mmap_mode='r' (the estimator's numpy arrays are memory-mapped, needs joblib)
+    - anything else: pickle
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r')
+    if extension == '.joblib':
+        if joblib is None:
+            raise ValueError(f"joblib is needed to load {path}")
+        return joblib.load(path, mmap_mode='r')
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def load_model(spec: ModelSpec):
+    """
+    Builds the model of a spec
+    """
+    model_class = resolve_model_class(spec.model_class)
+    if spec.artifact_path is None:
+        return model_class(**spec.kwargs)
+    return model_class(load_artifact(spec.artifact_path), **spec.kwargs)
+
+def _artifact_fingerprint(spec: ModelSpec):
+    if spec.artifact_path is None:
+        return None
+    stat = os.stat(spec.artifact_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+class _Entry:
+    """
+    One registered model: its spec (None for models added as objects), the loaded model and what it was loaded from
+    """
+    __slots__ = ('spec', 'model', 'size', 'fingerprint', 'load_lock')
+
+    def __init__(self, spec: ModelSpec = None, model=None):
+        self.spec = spec
+        self.model = model
+        self.size = 0
+        self.fingerprint = None
+        self.load_lock = threading.Lock()
+
+    def load(self):
+        # The fingerprint is taken first, so an artifact rewritten while loading is reloaded by the next reload_changed
+        self.fingerprint = _artifact_fingerprint(self.spec)
+        self.model = load_model(self.spec)
+        if self.spec.size_bytes is not None:
+            self.size = self.spec.size_bytes
+        else:
+            self.size = self.fingerprint[1] if self.fingerprint is not None else 0
+
+class ModelRegistry:
+    """
+    Thread-safe registry of models by name, with the dict interface PropensityScoringSystem uses
+    (get, in, iteration, keys); see the module docstring
+    memory_budget: bytes of spec models kept loaded (None: no limit)
+    """
+
+    def __init__(self, memory_budget: int = None):
+        if memory_budget is not None and memory_budget < 0:
+            raise ValueError(f"memory_budget must be at least 0, got {memory_budget}")
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()     # name: _Entry, least recently used first
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to process pool workers (score_sharded) without the locks and without the spec models,
+        # which workers load from their artifacts on first use
+        with self._lock:
+            entries = [(name, entry.spec, None if entry.spec is not None else entry.model) for name, entry in self._entries.items()]
+        return {'memory_budget': self.memory_budget, 'entries': entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['memory_budget'])
+        for name, spec, model in state['entries']:
+            self._entries[name] = _Entry(spec, model)
+
+    def __contains__(self, name) -> bool:
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, name: str):
+        model = self.get(name)
+        if model is None:
+            raise KeyError(name)
+        return model
+
+    def keys(self) -> list:
+        return list(self._entries)
+
+    def add(self, name: str, model):
+        """
+        Registers (or atomically replaces) an already constructed model, which is never evicted
+        """
+        with self._lock:
+            self._entries[name] = _Entry(model=model)
+            self._entries.move_to_end(name)
+
+    def register(self, spec: ModelSpec):
+        """
+        Registers a model spec, the model is loaded on its first use
+        Replaces a model of the same name (see swap to load the new version before replacing it)
+        """
+        self.swap(spec, preload=False)
+
+    def swap(self, spec: ModelSpec, preload: bool = True):
+        """
+        Replaces the model named spec.name by the one built from spec (hot swap)
+        With preload, the new model is loaded before the swap, so no request waits for it to load
+        Callers that already got the previous model keep it, the registry only drops its own reference
+        """
+        entry = _Entry(spec)
+        if preload:
+            entry.load()
+        with self._lock:
+            self._entries[spec.name] = entry
+            self._entries.move_to_end(spec.name)
+            self._evict(keep=spec.name)
+
+    def get(self, name: str, default=None):
+        """
+        The model registered as name (loaded now if it is a spec that is not loaded), or default
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return default
+            self._entries.move_to_end(name)
+            if entry.model is not None:
+                return entry.model
+
+        # Loaded outside the registry lock so other models stay available, concurrent first uses load it once
+        with entry.load_lock:
+            if entry.model is None:
+                entry.load()
+            model = entry.model
+        with self._lock:
+            if self._entries.get(name) is entry:
+                self._evict(keep=name)
+        return model
+
+    def unload(self, name: str):
+        """
+        Drops a loaded spec model (it is loaded again on its next use), models added as objects stay
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.spec is not None:
+                entry.model, entry.size = None, 0
+
+    def loaded(self) -> list:
+        """
+        Names of the models currently loaded, least recently used first
+        """
+        with self._lock:
+            return [name for name, entry in self._entries.items() if entry.model is not None]
+
+    def loaded_bytes(self) -> int:
+        """
+        Memory counted against the budget: the sizes of the loaded spec models
+        """
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values() if entry.model is not None)
+
+    def reload_changed(self) -> list:
+        """
+        Swaps in a new version of every loaded spec model whose artifact file changed since it was loaded,
+        returns their names. Models that are not loaded pick up the new artifact on their next use anyway
+        """
+        with self._lock:
+            loaded = [entry for entry in self._entries.values() if entry.spec is not None and entry.model is not None]
+        reloaded = []
+        for entry in loaded:
+            try:
+                changed = _artifact_fingerprint(entry.spec) != entry.fingerprint
+            except FileNotFoundError:   # Being replaced, picked up by the next call
+                continue
+            if changed:
+                self.swap(entry.spec)
+                reloaded.append(entry.spec.name)
+        return reloaded
+
+    def _evict(self, keep: str):
+        # Called with the lock held: unloads the least recently used spec models while over the budget
+        # (models without a size, e.g. without an artifact, do not count against it and are kept)
+        if self.memory_budget is None:
+            return
+        loaded_bytes = sum(entry.size for entry in self._entries.values() if entry.model is not None)
+        for name, entry in self._entries.items():
+            if loaded_bytes <= self.memory_budget:
+                break
+            if name != keep and entry.spec is not None and entry.model is not None and entry.size > 0:
+                loaded_bytes -= entry.size
+                entry.model, entry.size = None, 0
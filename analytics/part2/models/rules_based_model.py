@@ -1,4 +1,7 @@
+import pandas as pd
 from .propensity_model import BasePropensityModel
+from components.eligibility_engine import EligibilityRule
+from components.product_status_logic import DATE_DEPENDENT_CATEGORIES
 
 class RulesBasedPropensityModel(BasePropensityModel):
     def __init__(self, eligibility_rules: dict):
@@ -17,6 +20,21 @@ class RulesBasedPropensityModel(BasePropensityModel):
             return None  # Not eligible.
         return self._scoring_logic(member, products, category, propensity_type)
 
+    def score_eligible(self, member: dict, products: list, category: str, propensity_type: str) -> float:
+        """
+        Scoring logic only, for members whose eligibility was already checked
+        """
+        return self._scoring_logic(member, products, category, propensity_type)
+
+    def as_of_categories(self):
+        """
+        The scoring logic only uses member fields, so the scores depend on the as-of date through the compiled
+        eligibility rules of the date-dependent categories. Custom eligibility functions may read any date
+        """
+        if not all(isinstance(rule, EligibilityRule) for rule in self.eligibility_rules.values()):
+            return None
+        return list(DATE_DEPENDENT_CATEGORIES)
+
     def _scoring_logic(self, member: dict, products: list, category: str, propensity_type: str) -> float:
         """
         Scoring logic for the rules-based model
@@ -24,3 +42,16 @@ class RulesBasedPropensityModel(BasePropensityModel):
         can be easily added/modified here by data scientists
         """
         return 1.0
+
+    def extract_features(self, members: pd.DataFrame, products: pd.DataFrame, category: str, propensity_type: str, cache=None) -> pd.DataFrame:
+        """
+        The rules-based scoring logic only uses member fields, so the eligible members are the feature matrix
+        """
+        return members
+
+    def score_many(self, features: pd.DataFrame, category: str, propensity_type: str) -> pd.Series:
+        """
+        Batch version of _scoring_logic for every eligible member
+        Must return the same scores as _scoring_logic would for each member
+        """
+        return pd.Series(1.0, index=features.index)
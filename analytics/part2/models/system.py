@@ -1,9 +1,89 @@
+import os
+import numpy as np
+from collections import OrderedDict
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from components.eligibility_engine import RuleEvaluationCache, EligibilityRule
+from components.product_status_logic import data_reference_date
+from components.data_ingestion import shard_numbers
+from .registry import ModelRegistry, ModelSpec
+
+def _score_shard(system, members_df: pd.DataFrame, products_df: pd.DataFrame, categories: list, propensity_types: list, model_name: str, as_of=None) -> pd.DataFrame:
+    """
+    Worker: scores one shard with score_batch
+    """
+    return system.score_batch(members_df, products_df, categories, propensity_types, model_name, as_of)
+
 class PropensityScoringSystem:
-    def __init__(self):
+    def __init__(self, feature_store=None, memory_budget: int = None, as_of=None, max_member_eligibility: int = 1000000):
         """
         Creating a registry to store loaded models
+        feature_store: optional FeatureStore, the member features of a batch are then computed once and shared by every model
+        memory_budget: bytes of models registered from specs kept loaded (see ModelRegistry), None for no limit
+        as_of: fixed date the date-dependent eligibility rules and features are evaluated at. None resolves it once per
+               scoring run: per batch from the data load timestamp of its product accounts (see resolve_as_of), and for
+               score_member once per run (see member_as_of)
+        max_member_eligibility: per-member eligibility results kept by score_member, the least recently used ones beyond
+               it are dropped (a long-running service sees new members and queries without ever invalidating)
+        """
+        if max_member_eligibility < 1:
+            raise ValueError(f"max_member_eligibility must be at least 1, got {max_member_eligibility}")
+        self.models = ModelRegistry(memory_budget)  # Registry for propensity models
+        self.feature_store = feature_store
+        self.as_of = None if as_of is None else pd.Timestamp(as_of)
+
+        # Eligibility results of the current data snapshot, shared by every model using the same eligibility rules
+        # Call invalidate_eligibility when member or product account data changes
+        self.max_member_eligibility = max_member_eligibility
+        self._member_eligibility = OrderedDict()    # (eligibility function, member_id, category, propensity_type, as_of): bool, least recently used first
+        self._batch = None              # (members_df, products_df, categories, as_of, RuleEvaluationCache) of the last batch
+        self._member_as_of = None       # As-of date of the per-member scoring run, resolved at its first score_member call
+
+    def __getstate__(self):
+        # Cached eligibility is not sent to process pool workers (score_sharded)
+        state = self.__dict__.copy()
+        state['_member_eligibility'] = OrderedDict()
+        state['_batch'] = None
+        return state
+
+    def invalidate_eligibility(self, member_ids: list = None):
+        """
+        Invalidation hook for cached eligibility results, call it when member or product account data changes
+        - member_ids: only drop the per-member results of these members, None drops every cached result
+        Batch results (whole-frame masks) are always dropped. Dropping every result also starts a new per-member
+        scoring run, its as-of date is resolved again (see member_as_of)
         """
-        self.models = {}  # Registry for propensity models
+        self._batch = None
+        if member_ids is None:
+            self._member_eligibility = OrderedDict()
+            self._member_as_of = None
+            return
+        member_ids = {str(member_id) for member_id in member_ids}
+        self._member_eligibility = OrderedDict(
+            (key, eligible) for key, eligible in self._member_eligibility.items() if key[1] not in member_ids
+        )
+
+    def resolve_as_of(self, products) -> pd.Timestamp:
+        """
+        As-of date used to score these product accounts (a DataFrame, or one member's list of product records):
+        the system's as_of, else their data load timestamp, else now (see data_reference_date)
+        Results of the same data and as-of date are always the same, so it can be part of any cache key
+        """
+        return data_reference_date(products, self.as_of)
+
+    def member_as_of(self, products: list) -> pd.Timestamp:
+        """
+        As-of date of per-member scoring (score_member): the system's as_of, else the date of the current run, resolved
+        by resolve_as_of from the products of the first score_member call (after creating the system or invalidating
+        every cached result) and kept for every later call
+        Pin the system's as_of (e.g. data_reference_date of all product accounts) to score per member at the same date
+        as score_batch: a member without products of the category has no load timestamp to resolve it from
+        """
+        if self.as_of is not None:
+            return self.as_of
+        if self._member_as_of is None:
+            self._member_as_of = self.resolve_as_of(products)
+        return self._member_as_of
 
     def add_model(self, name: str, model):
         """
@@ -11,15 +91,170 @@ class PropensityScoringSystem:
         Value: initialized model object
 
         For this project, the existing model types are RulesBasedPropensityModel() and MLPropensityModel()
+        Replaces a model registered under the same name
         """
-        self.models[name] = model
+        self.models.add(name, model)
 
-    def score_member(self, member: dict, products: list, category: str, propensity_type: str, model_name: str) -> float:
+    def add_model_spec(self, spec: ModelSpec):
+        """
+        Registers a model by its ModelSpec (name, model class, artifact path): the model is only loaded on first use,
+        and can be evicted under the memory budget and loaded again later
+        """
+        self.models.register(spec)
+
+    def swap_model(self, spec: ModelSpec):
+        """
+        Hot swap: loads the new version of model spec.name, then replaces the registered one
+        Scoring calls already running finish with the previous version
+        """
+        self.models.swap(spec)
+
+    def score_member(self, member: dict, products: list, category: str, propensity_type: str, model_name: str, as_of=None) -> float:
         """
         Checks to see if model exists in registry
         If it does, the "score" function for the corresponding model will be invoked
+        as_of: date of this call, overrides the as-of date of the run (None: member_as_of)
         """
         model = self.models.get(model_name)
         if not model:
             raise ValueError(f"Model '{model_name}' is not registered.")
-        return model.score(member, products, category, propensity_type)
+
+        eligibility_fn = model.eligibility_rules.get(category) if model.eligibility_rules is not None else None
+        member_id = member.get('member_id')
+        if eligibility_fn is None or member_id is None:
+            return model.score(member, products, category, propensity_type)
+
+        # Eligibility is evaluated once per (member, category, propensity type, as-of date) for all models sharing the rules
+        # Custom eligibility functions keep the original (member, products, propensity_type) signature
+        as_of = self.member_as_of(products) if as_of is None else pd.Timestamp(as_of)
+        key = (eligibility_fn, str(member_id), category, propensity_type, as_of)
+        eligible = self._member_eligibility.get(key)
+        if eligible is None:
+            if isinstance(eligibility_fn, EligibilityRule):
+                eligible = bool(eligibility_fn(member, products, propensity_type, as_of))
+            else:
+                eligible = bool(eligibility_fn(member, products, propensity_type))
+            self._member_eligibility[key] = eligible
+            if len(self._member_eligibility) > self.max_member_eligibility:
+                self._member_eligibility.popitem(last=False)
+        else:
+            self._member_eligibility.move_to_end(key)
+        if not eligible:
+            return None  # Not eligible.
+        return model.score_eligible(member, products, category, propensity_type)
+
+    def _batch_cache(self, members_df: pd.DataFrame, products_df: pd.DataFrame, categories: list, as_of: pd.Timestamp) -> RuleEvaluationCache:
+        """
+        RuleEvaluationCache of a batch, reused while the same members and product frames are scored at the same
+        as-of date (e.g. by several models)
+        - Member conditions and eligibility masks shared by several rules or models are evaluated once
+        - The member features are read from the feature store (or computed) once, if a model uses them
+        """
+        categories = tuple(categories)
+        if self._batch is not None:
+            batch_members, batch_products, batch_categories, batch_as_of, cache = self._batch
+            if batch_members is members_df and batch_products is products_df and batch_categories == categories and batch_as_of == as_of:
+                return cache
+
+        feature_loader = None
+        if self.feature_store is not None:
+            feature_loader = lambda: self.feature_store.get(members_df, products_df, list(categories), as_of)
+        cache = RuleEvaluationCache(members_df, feature_loader, as_of)
+        self._batch = (members_df, products_df, categories, as_of, cache)
+        return cache
+
+    def score_batch(self, members_df: pd.DataFrame, products_df: pd.DataFrame, categories: list, propensity_types: list, model_name: str, as_of=None) -> pd.DataFrame:
+        """
+        Scores every member of members_df for every category and propensity type in one pass
+        Eligibility and scoring are evaluated column-wise by the model's score_batch function
+        as_of: date of this batch, overrides the system's as_of (None: resolve_as_of(products_df), once for the whole batch)
+
+        Returns a DataFrame with one row per member: member_id + one "{category}_{propensity_type}_score" column
+        per combination, matching the output of calling score_member for each member
+        """
+        model = self.models.get(model_name)
+        if not model:
+            raise ValueError(f"Model '{model_name}' is not registered.")
+
+        as_of = data_reference_date(products_df, self.as_of if as_of is None else as_of)
+        cache = self._batch_cache(members_df, products_df, categories, as_of)
+
+        results = {'member_id': members_df['member_id']}
+        for category in categories:
+            # Filter the product accounts to the category once for all members
+            category_products = cache.category_products(category, products_df)
+            for propensity_type in propensity_types:
+                key = f"{category}_{propensity_type}_score"
+                results[key] = model.score_batch(members_df, category_products, category, propensity_type, cache)
+
+        return pd.DataFrame(results).reset_index(drop=True)
+
+    def score_sharded(self, members_df: pd.DataFrame, products_df: pd.DataFrame, categories: list, propensity_types: list, model_name: str, max_workers: int = None, shards: int = None) -> pd.DataFrame:
+        """
+        Same output as score_batch, with members split into shards scored across a process pool
+        - Members are sharded by a hash of member_id, product accounts use the same hash so every member's
+          accounts are on the member's shard
+        - Shard outputs are merged back in the order of members_df, so the result does not depend on the
+          number of workers or on which shard finishes first
+        - The as-of date is resolved once from all product accounts, so every shard is scored at the same date
+
+        max_workers: size of the process pool (defaults to the number of CPUs), 1 scores every shard in this process
+        shards: number of shards (defaults to max_workers)
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model '{model_name}' is not registered.")
+
+        max_workers = max_workers or os.cpu_count() or 1
+        shards = shards or max_workers
+        if shards < 1:
+            raise ValueError(f"shards must be at least 1, got {shards}.")
+
+        as_of = self.resolve_as_of(products_df)
+        member_shards = shard_numbers(members_df['member_id'], shards)
+        product_shards = shard_numbers(products_df['member_id'], shards)
+        member_positions = pd.Series(member_shards).groupby(member_shards).indices
+        product_positions = pd.Series(product_shards).groupby(product_shards).indices
+
+        def shard_args(shard):
+            positions = product_positions.get(shard, np.array([], dtype=np.int64))
+            return (members_df.take(member_positions[shard]), products_df.take(positions), categories, propensity_types, model_name, as_of)
+
+        if max_workers == 1 or len(member_positions) == 1:
+            shard_results = {shard: _score_shard(self, *shard_args(shard)) for shard in member_positions}
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {shard: executor.submit(_score_shard, self, *shard_args(shard)) for shard in member_positions}
+                shard_results = {shard: future.result() for shard, future in futures.items()}
+
+        if not shard_results:
+            return self.score_batch(members_df, products_df, categories, propensity_types, model_name, as_of)
+
+        # Deterministic merge: put every shard's rows back at their members' original positions
+        positions = np.concatenate([member_positions[shard] for shard in shard_results])
+        results = pd.concat(shard_results.values(), ignore_index=True)
+        return results.iloc[np.argsort(positions, kind='stable')].reset_index(drop=True)
+
+    def score_stream(self, member_chunks, categories: list, propensity_types: list, model_name: str, output_file: str, as_of=None) -> int:
+        """
+        Scores (members_df, products_df) chunks one at a time (e.g. from iter_member_chunks) and appends each chunk's
+        scores to the output CSV file as soon as it is scored, so the scores of all members are never held in memory
+        as_of: date every chunk is scored at, None uses the system's as_of. One of them is required: a chunk only holds
+               some of the product accounts, so its load timestamp is not the one of the whole data (resolve it from
+               the products file with products_reference_date)
+
+        Returns the number of members scored
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model '{model_name}' is not registered.")
+        as_of = self.as_of if as_of is None else pd.Timestamp(as_of)
+        if as_of is None:
+            raise ValueError("score_stream needs an as-of date: pass as_of (e.g. products_reference_date of the products file) or create the system with one.")
+
+        scored = 0
+        for members_df, products_df in member_chunks:
+            results_df = self.score_batch(members_df, products_df, categories, propensity_types, model_name, as_of)
+            # The first chunk replaces any previous output file and writes the header
+            results_df.to_csv(output_file, mode='w' if scored == 0 else 'a', header=scored == 0, index=False)
+            scored += len(results_df)
+
+        return scored
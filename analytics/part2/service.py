@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from components.data_ingestion import load_data, MemberIndex, MemberProductsIndex
+from globals import PRODUCT_CATEGORIES_LIST
+from components.eligibility import eligibility_rules, eligibility_member_fields
+from components.product_status_logic import PRODUCT_STATUS_FIELDS, data_reference_date
+from models.rules_based_model import RulesBasedPropensityModel
+from models.ml_model import MLPropensityModel
+from models.system import PropensityScoringSystem
+from models.registry import ModelSpec
+
+"""
+Online scoring service
+
+Serves per-member scores over HTTP for applications that look up one member at a time (branch, call center):
+- Members and product accounts are loaded once and indexed by member_id (MemberIndex, MemberProductsIndex),
+  so a lookup never scans the DataFrames
+- One asyncio server handles every connection (HTTP/1.1 keep-alive), each request is scored with score_member
+- Server-side latencies of the last metrics_window score requests are kept for p50/p99 metrics
+- Every request is scored at one as-of date (--as-of, else the data load timestamp), fixed when the data is loaded
+
+Endpoints:
+    GET /score?member_id=123&categories=checking,savings&propensity_types=growth,churn&model=rules
+        {"member_id": "123", "model": "rules", "scores": {"checking_growth_score": 1.0, ...}}
+        categories and propensity_types are comma-separated and default to all of them, model defaults to 'rules'
+        404 for an unknown member, 400 for an unknown model, category or propensity type
+    GET /metrics    request and error counts, p50/p99/max latency in ms
+    GET /health     number of members loaded and the as-of date
+
+Usage:
+    cd analytics/part2
+    python service.py --port 8080
+"""
+
+PROPENSITY_TYPES = ['growth', 'churn']
+
+# Only the columns read by the eligibility rules and product status indicators are loaded
+MEMBER_COLUMNS = ['member_id'] + eligibility_member_fields
+PRODUCT_COLUMNS = ['member_id', 'product_category_id'] + PRODUCT_STATUS_FIELDS
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to JSON")
+
+def _split(values: str) -> list:
+    return [value.strip() for value in values.split(',') if value.strip()]
+
+class LatencyMetrics:
+    """
+    Request and error counts since start, and the latencies of the last window requests
+    """
+
+    def __init__(self, window: int = 10000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool = True):
+        self.latencies.append(seconds)
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        """
+        Counts and latency percentiles (ms) over the window, None before the first request
+        """
+        snapshot = {'requests': self.requests, 'errors': self.errors, 'window': len(self.latencies)}
+        if not self.latencies:
+            return {**snapshot, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+        latencies = np.fromiter(self.latencies, dtype=float) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99])
+        return {**snapshot, 'p50_ms': round(float(p50), 3), 'p99_ms': round(float(p99), 3), 'max_ms': round(float(latencies.max()), 3)}
+
+class ScoringService:
+    """
+    Scores single members from the in-memory indexes and serves them over HTTP (see start)
+    """
+
+    def __init__(self, scoring_system: PropensityScoringSystem, member_index: MemberIndex, member_products_index: MemberProductsIndex, metrics_window: int = 10000):
+        self.scoring_system = scoring_system
+        self.member_index = member_index
+        self.member_products_index = member_products_index
+        self.metrics = LatencyMetrics(metrics_window)
+
+    def score(self, member_id: str, categories: list = None, propensity_types: list = None, model_name: str = 'rules') -> dict:
+        """
+        {"{category}_{propensity_type}_score": score} for one member (the columns of score_batch),
+        None if the member is unknown. Raises ValueError for an unknown model, category or propensity type
+        """
+        categories = categories or PRODUCT_CATEGORIES_LIST
+        propensity_types = propensity_types or PROPENSITY_TYPES
+        if model_name not in self.scoring_system.models:
+            raise ValueError(f"Model '{model_name}' is not registered.")
+        unknown = [category for category in categories if category not in PRODUCT_CATEGORIES_LIST]
+        if unknown:
+            raise ValueError(f"Unknown product categories: {', '.join(unknown)}")
+        unknown = [ptype for ptype in propensity_types if ptype not in PROPENSITY_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown propensity types: {', '.join(unknown)}")
+
+        member = self.member_index.get(member_id)
+        if member is None:
+            return None
+        products_by_category = self.member_products_index.get(member_id)
+
+        scores = {}
+        for category in categories:
+            for ptype in propensity_types:
+                scores[f"{category}_{ptype}_score"] = self.scoring_system.score_member(member, products_by_category[category], category, ptype, model_name)
+        return scores
+
+    def handle(self, method: str, target: str) -> tuple:
+        """
+        (status, JSON payload) of one request
+        """
+        url = urlsplit(target)
+        if url.path not in ('/score', '/metrics', '/health'):
+            return 404, {'error': f"Unknown path: {url.path}"}
+        if method != 'GET':
+            return 405, {'error': f"Method {method} is not allowed"}
+        if url.path == '/metrics':
+            return 200, self.metrics.snapshot()
+        if url.path == '/health':
+            as_of = self.scoring_system.as_of
+            return 200, {'status': 'ok', 'members': len(self.member_index), 'as_of': None if as_of is None else as_of.isoformat()}
+
+        start = time.perf_counter()
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        member_id = params.get('member_id', '').strip()
+        model_name = params.get('model', 'rules')
+        if not member_id:
+            status, payload = 400, {'error': "member_id is required"}
+        else:
+            try:
+                scores = self.score(member_id, _split(params.get('categories', '')), _split(params.get('propensity_types', '')), model_name)
+                if scores is None:
+                    status, payload = 404, {'error': f"Member id '{member_id}' not found."}
+                else:
+                    status, payload = 200, {'member_id': member_id, 'model': model_name, 'scores': scores}
+            except ValueError as error:
+                status, payload = 400, {'error': str(error)}
+        self.metrics.record(time.perf_counter() - start, ok=status == 200)
+        return status, payload
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break   # Client closed the connection (or sent a header block over the stream limit)
+
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                parts = request_line.split(' ')
+                if len(parts) != 3:
+                    writer.write(_response(400, {'error': "Malformed request line"}, keep_alive=False))
+                    break
+                method, target, version = parts
+
+                # Request bodies are not used, but are read so the next request on the connection starts at its line
+                length = int(headers.get('content-length', 0) or 0)
+                if length:
+                    await reader.readexactly(length)
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                status, payload = self.handle(method, target)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> asyncio.AbstractServer:
+        """
+        Starts serving on host:port (port 0 picks a free port, see server.sockets[0].getsockname())
+        """
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+def _response(status: int, payload: dict, keep_alive: bool = True) -> bytes:
+    body = json.dumps(payload, default=_json_default).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+async def http_get(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, target: str) -> tuple:
+    """
+    Minimal keep-alive client for the service: sends GET target on an open connection and returns (status, JSON payload)
+    """
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return int(status_line.split(' ')[1]), json.loads(body)
+
+def load_service(members_file: str, member_product_accounts_file: str, metrics_window: int = 10000, ml_artifact: str = None, memory_budget: int = None, as_of=None) -> ScoringService:
+    """
+    Loads the data once, indexes it by member_id and registers the 'rules' and 'ml' models (see ModelRegistry)
+    as_of: date the date-dependent rules are evaluated at, defaults to the data load timestamp of the product accounts
+    """
+    members_df, member_products_df = load_data(members_file, member_product_accounts_file, member_columns=MEMBER_COLUMNS, product_columns=PRODUCT_COLUMNS)
+
+    # Ensure member_id columns are strings
+    members_df['member_id'] = members_df['member_id'].astype(str)
+    member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+
+    # Models are registered by spec and only built when first used, ml_artifact is the file of a pretrained ML model
+    # The as-of date is fixed for the lifetime of the loaded data, so cached eligibility results stay valid
+    scoring_system = PropensityScoringSystem(memory_budget=memory_budget, as_of=data_reference_date(member_products_df, as_of))
+    scoring_system.add_model_spec(ModelSpec('rules', RulesBasedPropensityModel, kwargs={'eligibility_rules': eligibility_rules}))
+    if ml_artifact is None:
+        model_x = None  # Dummy pretrained machine learning model for MLPropensityModel
+        scoring_system.add_model_spec(ModelSpec('ml', MLPropensityModel, kwargs={'ml_model': model_x, 'eligibility_rules': eligibility_rules}))
+    else:
+        scoring_system.add_model_spec(ModelSpec('ml', MLPropensityModel, ml_artifact, {'eligibility_rules': eligibility_rules}))
+
+    return ScoringService(scoring_system, MemberIndex(members_df), MemberProductsIndex(member_products_df), metrics_window)
+
+async def reload_models(service: ScoringService, interval: float):
+    """
+    Hot reload: every interval seconds, swaps in the models whose artifact file changed
+    A swap happens between two requests, requests already scored used the previous version
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for name in service.scoring_system.models.reload_changed():
+            print(f"Reloaded model '{name}'", flush=True)
+
+async def serve(service: ScoringService, host: str, port: int, reload_interval: float = None):
+    server = await service.start(host, port)
+    host, port = server.sockets[0].getsockname()[:2]
+    # The load test harness reads the address from this line when it starts the service itself
+    print(f"Scoring service listening on {host}:{port}", flush=True)
+    reloader = asyncio.create_task(reload_models(service, reload_interval)) if reload_interval else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reloader is not None:
+            reloader.cancel()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=8080, help="port to listen on, 0 picks a free port")
+    parser.add_argument('--data-dir', default='../../data', help="directory of members.csv and member_product_accounts.csv")
+    parser.add_argument('--metrics-window', type=int, default=10000, help="number of recent requests in the latency percentiles")
+    parser.add_argument('--ml-artifact', default=None, help="pretrained ML model file (.joblib, .npy or pickle), loaded on first use")
+    parser.add_argument('--memory-budget', type=int, default=None, help="bytes of models kept loaded, least recently used ones are unloaded")
+    parser.add_argument('--reload-interval', type=float, default=None, help="seconds between checks for changed model artifacts (hot reload)")
+    parser.add_argument('--as-of', default=None, help="date the date-dependent rules are evaluated at (YYYY-MM-DD), defaults to the data load timestamp")
+    args = parser.parse_args()
+
+    service = load_service(f"{args.data_dir}/members.csv", f"{args.data_dir}/member_product_accounts.csv", args.metrics_window, args.ml_artifact, args.memory_budget, args.as_of)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.reload_interval))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,185 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import tempfile
+import pandas as pd
+from components.data_ingestion import get_member_products_by_category, load_data, MemberProductsIndex, iter_member_chunks, products_reference_date
+from globals import PRODUCT_CATEGORIES_LIST
+from components.eligibility import eligibility_rules
+from components.product_status_logic import data_reference_date
+from models.propensity_model import BasePropensityModel
+from models.rules_based_model import RulesBasedPropensityModel
+from models.ml_model import MLPropensityModel
+from models.system import PropensityScoringSystem
+
+pd.set_option('display.max_columns', None)
+members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+members_df['member_id'] = members_df['member_id'].astype(str)
+member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+member_products_index = MemberProductsIndex(member_products_df)
+test_members = members_df.head(200)   # Change this value to test for more members
+
+class PerMemberModel(BasePropensityModel):
+    """
+    Model that only implements score, batch scoring falls back to score_many's per-member loop
+    """
+    def score(self, member: dict, products: list, category: str, propensity_type: str) -> float:
+        if not eligibility_rules[category](member, products, propensity_type):
+            return None
+        return 1.0 if products else 0.5
+
+# Per-member and batch scoring at the same as-of date: the data load timestamp of all product accounts
+system = PropensityScoringSystem(as_of=data_reference_date(member_products_df))
+system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+system.add_model('ml', MLPropensityModel(None, eligibility_rules))
+system.add_model('per_member', PerMemberModel())
+
+for model_name in system.models:
+    # Per-member scoring path
+    results = []
+    for _, member_row in test_members.iterrows():
+        member = member_row.to_dict()
+        member_result = {'member_id': member['member_id']}
+        products_by_category = get_member_products_by_category(member['member_id'], member_products_index)
+        for category in PRODUCT_CATEGORIES_LIST:
+            for propensity_type in ['growth', 'churn']:
+                score = system.score_member(member, products_by_category.get(category, []), category, propensity_type, model_name)
+                member_result[f"{category}_{propensity_type}_score"] = score
+        results.append(member_result)
+    # Ineligible scores are None per member and NaN in batches, the score columns are compared as floats
+    expected = pd.DataFrame(results).astype({'member_id': str})
+    expected = expected.astype(dict.fromkeys(expected.columns.drop('member_id'), float))
+
+    # Batch scoring path
+    actual = system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], model_name)
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    print(f"Model '{model_name}': batch scores match per-member scores for {len(actual)} members")
+
+# Streaming path: member hash bucket chunks appended to a CSV give the same scores as one batch over all members
+expected = system.score_batch(members_df, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+expected = expected.sort_values('member_id', kind='stable').reset_index(drop=True)
+for chunk_members_df, chunk_products_df in iter_member_chunks('../../../data/members.csv', '../../../data/member_product_accounts.csv', chunk_size=250, block_size=1000):
+    assert chunk_members_df['member_id'].nunique() <= 250
+    assert set(chunk_products_df['member_id'].astype(str)) <= set(chunk_members_df['member_id'].astype(str))
+with tempfile.TemporaryDirectory() as output_dir:
+    output_file = os.path.join(output_dir, 'scores.csv')
+    member_chunks = iter_member_chunks('../../../data/members.csv', '../../../data/member_product_accounts.csv', chunk_size=250, block_size=1000)
+    scored = system.score_stream(member_chunks, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', output_file)
+    streamed = pd.read_csv(output_file, dtype={'member_id': str}).sort_values('member_id', kind='stable').reset_index(drop=True)
+
+assert scored == len(members_df)
+pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+print(f"Streamed scores match batch scores for {scored} members")
+
+# Sharded path: members hashed into shards scored across a process pool, merged back in members_df order
+# The system is pickled for the pool workers, so it only holds models importable outside this (still importing) script
+sharded_system = PropensityScoringSystem()
+sharded_system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+sharded = sharded_system.score_sharded(members_df, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', max_workers=2, shards=5)
+pd.testing.assert_frame_equal(sharded, system.score_batch(members_df, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules'))
+print(f"Sharded scores match batch scores for {len(sharded)} members")
+
+# With product accounts loaded at different times, every chunk is scored at the latest load timestamp of the whole file,
+# like score_batch (a chunk's own accounts may all be older)
+mixed_timestamps = pd.read_csv('../../../data/member_product_accounts.csv', dtype=str)
+mixed_timestamps['timestamp'] = '2024-06-01 00:00:00.000'
+mixed_timestamps.loc[0, 'timestamp'] = '2026-06-01 00:00:00.000'
+with tempfile.TemporaryDirectory() as mixed_dir:
+    products_file = os.path.join(mixed_dir, 'member_product_accounts.csv')
+    mixed_timestamps.to_csv(products_file, index=False)
+    _, mixed_products_df = load_data('../../../data/members.csv', products_file)
+    mixed_products_df['member_id'] = mixed_products_df['member_id'].astype(str)
+    assert products_reference_date(products_file, block_size=1000) == pd.Timestamp('2026-06-01')
+    output_file = os.path.join(mixed_dir, 'scores.csv')
+    member_chunks = iter_member_chunks('../../../data/members.csv', products_file, chunk_size=250, block_size=1000)
+    sharded_system.score_stream(member_chunks, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', output_file, products_reference_date(products_file))
+    streamed = pd.read_csv(output_file, dtype={'member_id': str}).sort_values('member_id', kind='stable').reset_index(drop=True)
+expected = sharded_system.score_batch(members_df, mixed_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+pd.testing.assert_frame_equal(streamed, expected.sort_values('member_id', kind='stable').reset_index(drop=True), check_dtype=False)
+try:
+    sharded_system.score_stream(iter([]), PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', output_file)
+    raise AssertionError("score_stream without an as-of date")
+except ValueError:
+    pass
+print("Streamed scores match batch scores with mixed load timestamps")
+
+# Eligibility is evaluated once per (member, category, propensity type) for all models sharing the same rules
+evaluations = []
+def counted_checking_rule(member: dict, products: list, propensity_type: str) -> bool:
+    evaluations.append(member['member_id'])
+    return eligibility_rules['checking'](member, products, propensity_type)
+
+counted_rules = {'checking': counted_checking_rule}
+counted_system = PropensityScoringSystem()
+counted_system.add_model('rules', RulesBasedPropensityModel(counted_rules))
+counted_system.add_model('ml', MLPropensityModel(None, counted_rules))
+
+member = test_members.iloc[0].to_dict()
+checking_products = get_member_products_by_category(member['member_id'], member_products_index)['checking']
+member_scores = [counted_system.score_member(member, checking_products, 'checking', 'growth', model_name) for model_name in ['rules', 'ml', 'rules']]
+assert len(evaluations) == 1 and len(set(member_scores)) == 1
+counted_system.invalidate_eligibility([member['member_id']])
+counted_system.score_member(member, checking_products, 'checking', 'growth', 'ml')
+assert len(evaluations) == 2
+
+# Without a fixed as-of date, per-member scoring resolves it once per run, so members without products also hit the cache
+member_without_products = test_members.iloc[1].to_dict()
+for _ in range(5):
+    counted_system.score_member(member_without_products, [], 'checking', 'growth', 'rules')
+assert len(evaluations) == 3
+
+# Per-member results beyond max_member_eligibility are evicted, least recently used first
+limited_system = PropensityScoringSystem(max_member_eligibility=2)
+limited_system.add_model('rules', RulesBasedPropensityModel(counted_rules))
+evaluations.clear()
+for member_id in ['a', 'b', 'a', 'c', 'a', 'b']:
+    limited_system.score_member(dict(member, member_id=member_id), checking_products, 'checking', 'growth', 'rules')
+assert evaluations == ['a', 'b', 'c', 'b'] and len(limited_system._member_eligibility) == 2
+
+# Batch eligibility masks are shared across models scoring the same frames, until invalidated
+evaluations.clear()
+for model_name in ['rules', 'ml']:
+    counted_system.score_batch(test_members, member_products_df, ['checking'], ['growth'], model_name)
+assert len(evaluations) == len(test_members)
+counted_system.invalidate_eligibility()
+counted_system.score_batch(test_members, member_products_df, ['checking'], ['growth'], 'rules')
+assert len(evaluations) == 2 * len(test_members)
+print("Eligibility evaluated once across models, and again after invalidation")
+
+# As-of date: scores only depend on the data and the as-of date (the data load timestamp unless the system has a fixed one)
+load_timestamp = member_products_df['timestamp'].max()
+pinned_system = PropensityScoringSystem(as_of=load_timestamp)
+pinned_system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+# sharded_system has no fixed as-of date
+pd.testing.assert_frame_equal(
+    pinned_system.score_batch(members_df, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules'),
+    sharded_system.score_batch(members_df, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules'),
+)
+
+later_system = PropensityScoringSystem(as_of='2030-01-01')
+later_system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+later = later_system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules')
+later_per_member = []
+for member in test_members.to_dict('records'):
+    products_by_category = get_member_products_by_category(member['member_id'], member_products_index)
+    later_per_member.append({'member_id': member['member_id'], **{
+        f"{category}_{propensity_type}_score": later_system.score_member(member, products_by_category.get(category, []), category, propensity_type, 'rules')
+        for category in PRODUCT_CATEGORIES_LIST for propensity_type in ['growth', 'churn']
+    }})
+later_per_member = pd.DataFrame(later_per_member).astype({'member_id': str})
+later_per_member = later_per_member.astype(dict.fromkeys(later_per_member.columns.drop('member_id'), float))
+pd.testing.assert_frame_equal(later, later_per_member, check_dtype=False)
+pd.testing.assert_frame_equal(later_system.score_sharded(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', max_workers=1, shards=3), later)
+assert not later.equals(system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules'))
+
+# The as-of date of a batch can also be given per call, cached batch results are not reused across dates
+assert system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'rules', as_of='2030-01-01').equals(later)
+print(f"Scores as of {load_timestamp.date()} are reproducible, scores as of 2030-01-01 match across the batch, per-member and sharded paths")
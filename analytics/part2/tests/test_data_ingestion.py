@@ -10,13 +10,36 @@ if parent_dir not in sys.path:
 import pandas as pd
 import random
 import pprint
-from components.data_ingestion import load_data, get_member_products_by_category
+from components.data_ingestion import load_data, get_member_products_by_category, MemberProductsIndex, read_table, MEMBER_PRODUCT_ACCOUNTS_SCHEMA, map_product_categories, map_to_category
 from globals import PRODUCT_CATEGORIES
 
 members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
 
 sample_member_id = str(member_products_df['member_id'].iloc[0])
-prods = get_member_products_by_category(sample_member_id, member_products_df)
+member_products_index = MemberProductsIndex(member_products_df)
+prods = get_member_products_by_category(sample_member_id, member_products_index)
+
+# Indexed lookup must return the same products as filtering the full DataFrame
+scanned_prods = get_member_products_by_category(sample_member_id, member_products_df)
+for category in prods:
+    pd.testing.assert_frame_equal(pd.DataFrame(prods[category]), pd.DataFrame(scanned_prods[category]), check_dtype=False)
+
+# Typed load: categorical ids and dates parsed once when the Parquet cache is written
+assert isinstance(member_products_df['member_id'].dtype, pd.CategoricalDtype)
+assert isinstance(member_products_df['product_category_id'].dtype, pd.CategoricalDtype)
+assert pd.api.types.is_datetime64_any_dtype(member_products_df['account_open_date'])
+
+# Reading the cache with a column projection gives the same values as parsing the CSV
+projected = read_table('../../../data/member_product_accounts.csv', MEMBER_PRODUCT_ACCOUNTS_SCHEMA, ['member_id', 'account_open_date', 'not_a_column'])
+assert list(projected.columns) == ['member_id', 'account_open_date']
+csv_df = pd.read_csv('../../../data/member_product_accounts.csv', usecols=['member_id', 'account_open_date'], dtype={'member_id': str})
+assert projected['member_id'].astype(str).tolist() == csv_df['member_id'].tolist()
+pd.testing.assert_series_equal(projected['account_open_date'], pd.to_datetime(csv_df['account_open_date'], format='%Y-%m-%d', errors='coerce'), check_dtype=False)
+
+# Category lookup per distinct id matches mapping every row, and keeps the PRODUCT_CATEGORIES order ('checking' before 'business')
+row_by_row = member_products_df['product_category_id'].astype(object).apply(map_to_category)
+assert map_product_categories(member_products_df['product_category_id']).tolist() == row_by_row.tolist()
+assert map_product_categories(pd.Series(['Business Checking', 'Business Loan', 'Jumbo CD'])).tolist() == ['checking', 'business_loans', 'certificates']
 
 print("PRODUCT_CATEGORIES:", PRODUCT_CATEGORIES)
 print(f"Products for member {sample_member_id}:")
@@ -9,12 +9,13 @@ if parent_dir not in sys.path:
 
 
 import pandas as pd
-from components.data_ingestion import get_member_products_by_category, load_data
+from components.data_ingestion import get_member_products_by_category, load_data, MemberProductsIndex
 from globals import PRODUCT_CATEGORIES_LIST
 from components.eligibility import eligibility_rules
 
 pd.set_option('display.max_columns', None)
 members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+member_products_index = MemberProductsIndex(member_products_df)
 test_members = members_df.head(2)   # Change this value to test for more members
 
 for _, member_row in test_members.iterrows():
@@ -23,7 +24,7 @@ for _, member_row in test_members.iterrows():
     print(f"\nEligibility for Member ID: {member_id}")
     
     # Retrieve this member's product records by category
-    products_by_category = get_member_products_by_category(member_id, member_products_df)
+    products_by_category = get_member_products_by_category(member_id, member_products_index)
     
     # Loop over each product category and test eligibility for both growth and churn
     for category in PRODUCT_CATEGORIES_LIST:
@@ -0,0 +1,86 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from components.data_ingestion import load_data, group_products_by_member
+from components.eligibility import eligibility_rules
+from components.feature_store import build_member_features, category_feature_columns, data_snapshot, feature_reference_date, FeatureStore
+from globals import PRODUCT_CATEGORIES_LIST
+from models.ml_model import MLPropensityModel
+from models.system import PropensityScoringSystem
+
+pd.set_option('display.max_columns', None)
+members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+members_df['member_id'] = members_df['member_id'].astype(str)
+member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+
+features = build_member_features(members_df, member_products_df, PRODUCT_CATEGORIES_LIST)
+assert list(features.index) == list(members_df['member_id'].drop_duplicates())
+
+# Columnar features match the features computed from each member's product records
+reference_date = feature_reference_date(member_products_df)
+products_by_member = group_products_by_member(member_products_df)
+for member_id in members_df['member_id'].head(100):
+    for category in PRODUCT_CATEGORIES_LIST:
+        products = [product for product in products_by_member.get(member_id, []) if product['product_category'] == category]
+        open_dates = [product['account_open_date'] for product in products if pd.notna(product['account_open_date'])]
+        expected = {
+            'account_count': len(products),
+            'balance': sum(product['account_balance'] for product in products if pd.notna(product['account_balance'])),
+            'days_since_open': (reference_date - max(open_dates)).days if open_dates else np.nan,
+        }
+        for feature, value in expected.items():
+            actual = features.loc[member_id, f"{category}_{feature}"]
+            assert np.isclose(actual, value, equal_nan=True), (member_id, category, feature, actual, value)
+
+with tempfile.TemporaryDirectory() as store_dir:
+    # Computed once per snapshot: a new store on the same directory reads the stored matrix
+    stored = FeatureStore(store_dir).get(members_df, member_products_df, PRODUCT_CATEGORIES_LIST)
+    reloaded = FeatureStore(store_dir).get(members_df, member_products_df, PRODUCT_CATEGORIES_LIST)
+    pd.testing.assert_frame_equal(reloaded, stored)
+    assert len(os.listdir(store_dir)) == 1
+
+    # Changed data is a new snapshot
+    changed_products = member_products_df.assign(account_balance=member_products_df['account_balance'] + 1)
+    FeatureStore(store_dir).get(members_df, changed_products, PRODUCT_CATEGORIES_LIST)
+    assert len(os.listdir(store_dir)) == 2
+
+    # Beyond max_snapshots, the least recently used snapshot is evicted (the first one was read last)
+    time.sleep(0.01)
+    FeatureStore(store_dir).get(members_df, member_products_df, PRODUCT_CATEGORIES_LIST)
+    time.sleep(0.01)
+    limited_store = FeatureStore(store_dir, max_snapshots=2)
+    limited_store.get(members_df, member_products_df.assign(account_balance=0.0), PRODUCT_CATEGORIES_LIST)
+    assert len(os.listdir(store_dir)) == 2
+    assert os.path.exists(limited_store._path(data_snapshot(members_df, member_products_df, PRODUCT_CATEGORIES_LIST)))
+    assert not os.path.exists(limited_store._path(data_snapshot(members_df, changed_products, PRODUCT_CATEGORIES_LIST)))
+
+    # The ML model reads the shared feature matrix, with the same features it computes on its own
+    ml_model = MLPropensityModel(None, eligibility_rules)
+    system = PropensityScoringSystem(feature_store=FeatureStore(store_dir))
+    system.add_model('ml', ml_model)
+    system_without_store = PropensityScoringSystem()
+    system_without_store.add_model('ml', ml_model)
+    test_members = members_df.head(50)
+    pd.testing.assert_frame_equal(
+        system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'ml'),
+        system_without_store.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], 'ml'),
+    )
+    savings_products = member_products_df[member_products_df['product_category'] == 'savings']
+    pd.testing.assert_frame_equal(
+        ml_model.extract_features(test_members, savings_products, 'savings', 'growth'),
+        stored.loc[test_members['member_id'], category_feature_columns('savings')].set_axis(test_members.index),
+    )
+
+print(features.head())
+print(f"Features match per-member computation, {len(features)} members x {features.shape[1]} features")
@@ -0,0 +1,156 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import pickle
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from components.data_ingestion import load_data
+from globals import PRODUCT_CATEGORIES_LIST
+from components.eligibility import eligibility_rules
+from models.propensity_model import BasePropensityModel
+from models.rules_based_model import RulesBasedPropensityModel
+from models.ml_model import MLPropensityModel
+from models.registry import ModelRegistry, ModelSpec
+from models.system import PropensityScoringSystem
+
+members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+members_df['member_id'] = members_df['member_id'].astype(str)
+member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+test_members = members_df.head(200)
+
+builds = []
+
+class WeightsModel(BasePropensityModel):
+    """
+    Model whose score is the sum of its artifact (a weights array), counts how many times it is built
+    """
+    def __init__(self, weights, eligibility_rules: dict):
+        builds.append(self)
+        self.weights = weights
+        self.eligibility_rules = eligibility_rules
+
+    def score(self, member: dict, products: list, category: str, propensity_type: str) -> float:
+        if not self.eligibility_rules[category](member, products, propensity_type):
+            return None
+        return float(self.weights.sum())
+
+def write_weights(path: str, value: float, size: int = 1000):
+    # Written to a temporary file first, as a model artifact would be published
+    np.save(f"{path}.tmp.npy", np.full(size, value))
+    os.replace(f"{path}.tmp.npy", path)
+
+with tempfile.TemporaryDirectory() as artifact_dir:
+    weights_v1 = os.path.join(artifact_dir, 'weights_v1.npy')
+    weights_v2 = os.path.join(artifact_dir, 'weights_v2.npy')
+    write_weights(weights_v1, 1.0)
+    write_weights(weights_v2, 2.0)
+    spec_v1 = ModelSpec('weights', WeightsModel, weights_v1, {'eligibility_rules': eligibility_rules}, version='v1')
+    spec_v2 = ModelSpec('weights', WeightsModel, weights_v2, {'eligibility_rules': eligibility_rules}, version='v2')
+
+    # Lazy loading: nothing is built until the first use, concurrent first uses build the model once
+    registry = ModelRegistry()
+    registry.register(spec_v1)
+    assert 'weights' in registry and registry.loaded() == [] and not builds
+    barrier = threading.Barrier(8)
+    models = []
+    def first_use():
+        barrier.wait()
+        models.append(registry.get('weights'))
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1 and all(model is builds[0] for model in models)
+    print("Models are built on first use, once")
+
+    # .npy artifacts are memory-mapped
+    model_v1 = registry.get('weights')
+    assert isinstance(model_v1.weights, np.memmap) and model_v1.weights.sum() == 1000
+    print("Artifacts are memory-mapped")
+
+    # Hot swap: callers holding the previous version keep it, later calls get the new one
+    registry.swap(spec_v2)
+    model_v2 = registry.get('weights')
+    assert model_v2 is not model_v1 and model_v2.weights.sum() == 2000 and model_v1.weights.sum() == 1000
+
+    # Swapping while other threads score: every score comes from one of the two versions, none fails
+    system = PropensityScoringSystem()
+    system.add_model_spec(spec_v1)
+    member = test_members.iloc[0].to_dict()
+    scores, errors = [], []
+    stop = threading.Event()
+    def score_loop():
+        try:
+            while not stop.is_set():
+                scores.append(system.models.get('weights').score(member, [], 'checking', 'growth'))
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=score_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(50):
+        system.swap_model(spec_v2 if i % 2 == 0 else spec_v1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors and set(scores) <= {None, 1000.0, 2000.0}
+    assert system.models.get('weights').weights.sum() == 1000   # Last swap
+    print(f"Swapped 50 times while {len(scores)} scores were computed concurrently")
+
+    # Hot reload: a rewritten artifact is swapped in by reload_changed, unchanged ones are not
+    registry = ModelRegistry()
+    registry.register(spec_v1)
+    previous = registry.get('weights')
+    assert registry.reload_changed() == []
+    write_weights(weights_v1, 3.0)
+    stat = os.stat(weights_v1)
+    os.utime(weights_v1, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))  # Coarse file system timestamps
+    assert registry.reload_changed() == ['weights']
+    assert registry.get('weights').weights.sum() == 3000 and previous.weights.sum() == 1000
+    print("Changed artifacts are reloaded")
+
+    # Memory budget: least recently used spec models are unloaded, models added as objects are never evicted
+    artifact_bytes = os.path.getsize(weights_v1)
+    registry = ModelRegistry(memory_budget=int(artifact_bytes * 1.5))
+    registry.add('rules', RulesBasedPropensityModel(eligibility_rules))
+    registry.register(ModelSpec('a', WeightsModel, weights_v1, {'eligibility_rules': eligibility_rules}))
+    registry.register(ModelSpec('b', WeightsModel, weights_v2, {'eligibility_rules': eligibility_rules}))
+    registry.get('a')
+    assert registry.loaded() == ['rules', 'a'] and registry.loaded_bytes() == artifact_bytes
+    registry.get('b')
+    assert registry.loaded() == ['rules', 'b'] and registry.loaded_bytes() == artifact_bytes
+    builds.clear()
+    assert registry.get('a').weights.sum() == 3000 and len(builds) == 1   # Loaded again
+    assert registry.loaded() == ['rules', 'a']
+    print("Least recently used models are evicted under the memory budget")
+
+    # Scoring with spec models gives the same scores as models added as objects, also across a process pool
+    pickled_artifact = os.path.join(artifact_dir, 'ml_model.pkl')
+    with open(pickled_artifact, 'wb') as f:
+        pickle.dump(None, f)    # Stands in for a pretrained estimator
+    eager_system = PropensityScoringSystem()
+    eager_system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+    eager_system.add_model('ml', MLPropensityModel(None, eligibility_rules))
+    lazy_system = PropensityScoringSystem(memory_budget=0)
+    lazy_system.add_model_spec(ModelSpec('rules', 'models.rules_based_model:RulesBasedPropensityModel', kwargs={'eligibility_rules': eligibility_rules}))
+    lazy_system.add_model_spec(ModelSpec('ml', MLPropensityModel, pickled_artifact, {'eligibility_rules': eligibility_rules}, size_bytes=1))
+    for model_name in ['rules', 'ml']:
+        expected = eager_system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], model_name)
+        pd.testing.assert_frame_equal(lazy_system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], model_name), expected)
+        pd.testing.assert_frame_equal(lazy_system.score_sharded(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], model_name, max_workers=2), expected)
+    # The model in use is kept even over the budget, loading another one evicts it
+    assert lazy_system.models.loaded() == ['rules', 'ml']
+    lazy_system.add_model_spec(spec_v1)
+    lazy_system.models.get('weights')
+    assert lazy_system.models.loaded() == ['rules', 'weights']
+    print("Spec models score the same as models added as objects, in batch and sharded")
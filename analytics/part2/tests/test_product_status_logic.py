@@ -0,0 +1,51 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import pandas as pd
+from components.data_ingestion import load_data, group_products_by_member
+from components import product_status_logic
+from globals import PRODUCT_CATEGORIES_LIST
+
+members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+
+# Without an as_of, the indicators are evaluated at the data load timestamp, not at the time of the call
+load_timestamp = member_products_df['timestamp'].max()
+assert product_status_logic.data_reference_date(member_products_df) == load_timestamp
+assert product_status_logic.data_reference_date(member_products_df.head(10).to_dict('records')) == load_timestamp
+assert product_status_logic.data_reference_date(member_products_df, '2025-01-01') == pd.Timestamp('2025-01-01')
+
+# List-based and columnar indicators agree at the default as-of date and at fixed ones
+for as_of in [None, pd.Timestamp('2024-06-01'), pd.Timestamp('2030-01-01')]:
+    for category in PRODUCT_CATEGORIES_LIST:
+        category_products = member_products_df[member_products_df['product_category'] == category]
+        products_by_member = group_products_by_member(category_products)
+        status = product_status_logic.product_status_columns(category_products)
+
+        for propensity_type in ['growth', 'churn']:
+            # List-based indicator, called once per member
+            indicator_fn = getattr(product_status_logic, f"{category}_{propensity_type}_indicator")
+            expected = pd.Series({member_id: indicator_fn(products, as_of) for member_id, products in products_by_member.items()}, dtype=bool)
+
+            # Columnar indicator, evaluated for every member at once
+            indicator_by_member_fn = getattr(product_status_logic, f"{category}_{propensity_type}_indicator_by_member")
+            actual = indicator_by_member_fn(status, as_of)
+
+            pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+            print(f"As of: {str(as_of or load_timestamp)[:10]} | Category: {category:15} | Indicator: {propensity_type:6} | Members: {len(actual):6} | Flagged: {int(actual.sum())}")
+
+# Date-dependent indicators change with the as-of date, and only with it
+savings_status = product_status_logic.product_status_columns(member_products_df[member_products_df['product_category'] == 'savings'])
+flagged = {as_of: int(product_status_logic.savings_churn_indicator_by_member(savings_status, as_of).sum()) for as_of in ['2000-01-01', '2030-01-01']}
+assert flagged['2000-01-01'] != flagged['2030-01-01'], flagged
+pd.testing.assert_series_equal(
+    product_status_logic.savings_churn_indicator_by_member(savings_status),
+    product_status_logic.savings_churn_indicator_by_member(savings_status, load_timestamp),
+)
+print(f"Savings churn flagged as of 2000-01-01: {flagged['2000-01-01']}, as of 2030-01-01: {flagged['2030-01-01']}")
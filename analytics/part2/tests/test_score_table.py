@@ -0,0 +1,107 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import tempfile
+import pandas as pd
+from components.data_ingestion import load_data
+from components.eligibility import eligibility_rules
+from components.score_table import ScoreTable, member_input_hashes
+from globals import PRODUCT_CATEGORIES_LIST
+from models.rules_based_model import RulesBasedPropensityModel
+from models.ml_model import MLPropensityModel
+from models.system import PropensityScoringSystem
+
+members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+members_df['member_id'] = members_df['member_id'].astype(str)
+member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+members_df = members_df.drop_duplicates('member_id').reset_index(drop=True)
+
+system = PropensityScoringSystem()
+system.add_model('rules', RulesBasedPropensityModel(eligibility_rules))
+system.add_model('ml', MLPropensityModel(None, eligibility_rules))
+categories, propensity_types = PRODUCT_CATEGORIES_LIST, ['growth', 'churn']
+rows_per_member = len(categories) * len(propensity_types)
+
+# Input hashes do not depend on the order of the product account rows or on the data load timestamp
+hashes = member_input_hashes(members_df, member_products_df)
+shuffled = member_products_df.sample(frac=1, random_state=0)
+reloaded = shuffled.assign(timestamp=pd.Timestamp('2030-01-01'))
+pd.testing.assert_series_equal(member_input_hashes(members_df, reloaded), hashes)
+assert not member_input_hashes(members_df, member_products_df, context='v2').equals(hashes)
+
+# The as-of date only changes the hashes of the members with accounts in as_of_categories
+at_load, later = (member_input_hashes(members_df, member_products_df, as_of=date, as_of_categories=['certificates']) for date in ('2024-11-09', '2025-01-01'))
+certificate_members = member_products_df.loc[member_products_df['product_category'] == 'certificates', 'member_id'].unique()
+assert (at_load != later).sum() == len(certificate_members) and (at_load != later)[certificate_members].all()
+print(f"Input hashes are stable for {len(hashes)} members")
+
+with tempfile.TemporaryDirectory() as table_dir:
+    table = ScoreTable(os.path.join(table_dir, 'score_table.parquet'))
+
+    # First run: every member is scored, for every model
+    for model_name in system.models:
+        summary = table.update(system, members_df, member_products_df, categories, propensity_types, model_name)
+        assert summary['members_scored'] == len(members_df) and summary['rows_skipped'] == 0
+        expected = system.score_batch(members_df, member_products_df, categories, propensity_types, model_name)
+        pd.testing.assert_frame_equal(table.scores(members_df['member_id'], categories, propensity_types, model_name), expected, check_dtype=False)
+    print(f"First run scored {len(members_df)} members for every model")
+
+    # Same inputs: nothing is rescored
+    summary = table.update(system, members_df, shuffled, categories, propensity_types, 'rules')
+    assert summary['members_scored'] == 0 and summary['rows_skipped'] == len(members_df) * rows_per_member
+
+    # Changed accounts, a changed member row and a new member: only those members are rescored
+    changed_products = member_products_df.copy()
+    changed_account_members = changed_products['member_id'].drop_duplicates().head(5).tolist()
+    changed_rows = changed_products['member_id'].isin(changed_account_members)
+    changed_products.loc[changed_rows, 'account_close_date'] = pd.NaT
+    changed_products.loc[changed_rows, 'account_transaction_count'] = 0
+    changed_members = members_df.copy()
+    changed_members.loc[10, 'member_in_good_standing'] = not changed_members.loc[10, 'member_in_good_standing']
+    new_member = changed_members.iloc[[0]].assign(member_id='new-member')
+    changed_members = pd.concat([changed_members, new_member], ignore_index=True)
+
+    expected_changed = set(changed_account_members) | {changed_members.loc[10, 'member_id'], 'new-member'}
+    summary = table.update(system, changed_members, changed_products, categories, propensity_types, 'rules')
+    assert summary['members_scored'] == len(expected_changed), summary
+    assert summary['members_skipped'] == len(changed_members) - len(expected_changed)
+    assert summary['rows_skipped'] == summary['members_skipped'] * rows_per_member
+    expected = system.score_batch(changed_members, changed_products, categories, propensity_types, 'rules')
+    pd.testing.assert_frame_equal(table.scores(changed_members['member_id'], categories, propensity_types, 'rules'), expected, check_dtype=False)
+    print(f"Rescored {summary['members_scored']} changed members, skipped {summary['rows_skipped']} scores: same scores as a full run")
+
+    # Scores of the other model are not affected, and are rescored on their next update
+    assert table.update(system, changed_members, changed_products, categories, propensity_types, 'ml')['members_scored'] == len(expected_changed)
+
+    # A subset of the stored categories and propensity types is up to date as well, and the table is unchanged
+    stored_rows = len(table.load())
+    summary = table.update(system, changed_members, changed_products, categories[:1], ['growth'], 'rules')
+    assert summary['members_scored'] == 0 and len(table.load()) == stored_rows
+    print("Scores of other models are kept and each model is rescored separately")
+
+    # A new as-of date (here a later data load timestamp, with the original accounts back) only rescores, at that
+    # date, the members with accounts in the categories whose eligibility depends on it (savings and certificates for
+    # the rules model) and the members whose accounts changed back
+    dated_members = set(reloaded.loc[reloaded['product_category'].isin(['savings', 'certificates']), 'member_id'])
+    expected_changed = set(changed_members['member_id']) & dated_members | set(changed_account_members)
+    assert 0 < len(expected_changed) < len(changed_members)
+    summary = table.update(system, changed_members, reloaded, categories, propensity_types, 'rules')
+    assert summary['members_scored'] == len(expected_changed), summary
+    expected = system.score_batch(changed_members, reloaded, categories, propensity_types, 'rules')
+    pd.testing.assert_frame_equal(table.scores(changed_members['member_id'], categories, propensity_types, 'rules'), expected, check_dtype=False)
+    assert table.update(system, changed_members, reloaded, categories, propensity_types, 'rules')['members_scored'] == 0
+
+    # The "days since" features of the ML model depend on it for every member with accounts in the product categories
+    expected_changed = set(changed_members['member_id']) & set(reloaded.loc[reloaded['product_category'].isin(categories), 'member_id']) | set(changed_account_members)
+    summary = table.update(system, changed_members, reloaded, categories, propensity_types, 'ml')
+    assert summary['members_scored'] == len(expected_changed), summary
+    expected = system.score_batch(changed_members, reloaded, categories, propensity_types, 'ml')
+    pd.testing.assert_frame_equal(table.scores(changed_members['member_id'], categories, propensity_types, 'ml'), expected, check_dtype=False)
+    print(f"A new as-of date rescores {len(set(changed_members['member_id']) & dated_members)} of {len(changed_members)} members for 'rules', {len(expected_changed)} for 'ml'")
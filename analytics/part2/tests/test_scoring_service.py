@@ -0,0 +1,88 @@
+import os
+import sys
+
+# Get the absolute path of the parent directory of the current script and add parent directory to module search path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+
+import asyncio
+import pandas as pd
+from components.data_ingestion import load_data, MemberIndex
+from globals import PRODUCT_CATEGORIES_LIST
+from service import load_service, http_get
+
+service = load_service('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+members_df, member_products_df = load_data('../../../data/members.csv', '../../../data/member_product_accounts.csv')
+members_df['member_id'] = members_df['member_id'].astype(str)
+member_products_df['member_id'] = member_products_df['member_id'].astype(str)
+test_members = members_df.drop_duplicates('member_id').head(100)
+
+# The member index returns the same record as scanning the members DataFrame
+member_index = MemberIndex(members_df)
+for member_id in test_members['member_id']:
+    member, expected = member_index.get(member_id), members_df[members_df['member_id'] == member_id].iloc[0].to_dict()
+    assert member.keys() == expected.keys()
+    assert all(member[field] == value or (pd.isna(member[field]) and pd.isna(value)) for field, value in expected.items())
+assert member_index.get('not-a-member') is None
+print(f"Member index matches a scan of members_df for {len(test_members)} members")
+
+# Scores served over HTTP (from projected columns) match score_batch over the full frames, for every model
+async def check_service():
+    server = await service.start('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)   # One keep-alive connection for every request
+
+    for model_name in service.scoring_system.models:
+        expected = service.scoring_system.score_batch(test_members, member_products_df, PRODUCT_CATEGORIES_LIST, ['growth', 'churn'], model_name)
+        for row in expected.to_dict('records'):
+            status, payload = await http_get(reader, writer, f"/score?member_id={row['member_id']}&model={model_name}")
+            assert status == 200 and payload['member_id'] == row['member_id'] and payload['model'] == model_name
+            for column, score in payload['scores'].items():
+                assert score == row[column] or (score is None and pd.isna(row[column])), (row['member_id'], column, score, row[column])
+        print(f"Model '{model_name}': served scores match batch scores for {len(expected)} members")
+
+    # Subset of categories and propensity types
+    member_id = test_members['member_id'].iloc[0]
+    status, payload = await http_get(reader, writer, f"/score?member_id={member_id}&categories=checking,savings&propensity_types=churn")
+    assert status == 200 and list(payload['scores']) == ['checking_churn_score', 'savings_churn_score']
+
+    # Errors: unknown member, model, category, propensity type, missing member_id, unknown path
+    for target, expected_status in [
+        ('/score?member_id=not-a-member', 404),
+        (f"/score?member_id={member_id}&model=unknown", 400),
+        (f"/score?member_id={member_id}&categories=mortgages", 400),
+        (f"/score?member_id={member_id}&propensity_types=upsell", 400),
+        ('/score', 400),
+        ('/unknown', 404),
+    ]:
+        status, payload = await http_get(reader, writer, target)
+        assert status == expected_status and 'error' in payload, (target, status, payload)
+    print("Unknown members, models, categories and propensity types are rejected")
+
+    # Concurrent connections are served by the same server
+    async def score_on_new_connection(member_id: str) -> dict:
+        client_reader, client_writer = await asyncio.open_connection('127.0.0.1', port)
+        _, client_payload = await http_get(client_reader, client_writer, f"/score?member_id={member_id}")
+        client_writer.close()
+        await client_writer.wait_closed()
+        return client_payload
+    payloads = await asyncio.gather(*(score_on_new_connection(member_id) for member_id in test_members['member_id'].head(20)))
+    assert [payload['member_id'] for payload in payloads] == test_members['member_id'].head(20).tolist()
+
+    status, metrics = await http_get(reader, writer, '/metrics')
+    n_models = len(service.scoring_system.models)
+    assert status == 200
+    assert metrics['requests'] == n_models * len(test_members) + 1 + 5 + 20    # /unknown is not a score request
+    assert metrics['errors'] == 5
+    assert 0 <= metrics['p50_ms'] <= metrics['p99_ms'] <= metrics['max_ms']
+    print(f"Metrics: {metrics}")
+
+    writer.close()
+    await writer.wait_closed()
+    server.close()
+    await server.wait_closed()
+
+asyncio.run(check_service())
@@ -0,0 +1,143 @@
+import hashlib
+import operator
+import os
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:     # Without pyarrow the CSV files are read directly (typed, but not cached)
+    pq = None
+
+"""
+Typed columnar loading of the data/ input files, shared by part 1 and part 2
+
+Every CSV file is converted once into a typed Parquet cache (next to the CSV, in parquet_cache/) and later loads
+read the cache instead of re-parsing the CSV:
+- member_id, product_category_id and level_score_type are stored as categoricals
+- Date columns are parsed when the cache is written (values that are not valid dates load as missing)
+- Only the columns a caller asks for are read from the cache
+The cache is rebuilt when the CSV is newer than it, or when the schema of the file changes. Both parts read the
+same schemas below, so they also share the cache files
+
+Usage (from a module that has the analytics directory on its module search path):
+    from table_io import read_table, MEMBER_PRODUCT_ACCOUNTS_SCHEMA
+    accounts = read_table('data/member_product_accounts.csv', MEMBER_PRODUCT_ACCOUNTS_SCHEMA, ['member_id'])
+"""
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# dtypes: columns converted at load time, dates: date columns and their format (None lets pandas infer it)
+LEVELS_SCHEMA = {
+    'dtypes': {},
+    'dates': {},
+}
+
+MEMBERS_SCHEMA = {
+    'dtypes': {'member_id': 'category'},
+    'dates': {},
+}
+
+MEMBER_LEVEL_SCORES_SCHEMA = {
+    'dtypes': {'member_id': 'category', 'level_score_type': 'category'},
+    'dates': {'score_date': None, 'timestamp': None},
+}
+
+MEMBER_PRODUCT_ACCOUNTS_SCHEMA = {
+    'dtypes': {'member_id': 'category', 'product_category_id': 'category'},
+    'dates': {'account_open_date': DATE_FORMAT, 'account_close_date': DATE_FORMAT, 'timestamp': None},
+}
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Converts the schema columns present in the frame (columns that already have the right type are left as is)
+    """
+    for column, dtype in schema['dtypes'].items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = df[column].astype(str).where(df[column].notna()).astype(dtype)
+    for column, date_format in schema['dates'].items():
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], format=date_format, errors='coerce')
+    return df
+
+# Comparison operators of read_table filters
+FILTER_OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+def _filter_rows(df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    """
+    Rows matching any of the filters' conjunctions, for reads that cannot push the filters down to Parquet
+    """
+    keep = pd.Series(False, index=df.index)
+    for conjunction in filters:
+        matches = pd.Series(True, index=df.index)
+        for column, op, value in conjunction:
+            matches &= FILTER_OPERATORS[op](df[column], value)
+        keep |= matches
+    return df[keep].reset_index(drop=True)
+
+def _csv_options(schema: dict, columns: list = None) -> dict:
+    return {
+        'usecols': None if columns is None else (lambda column: column in columns),
+        'dtype': {column: str for column in schema['dtypes']},
+    }
+
+def _read_csv(file: str, schema: dict, columns: list = None) -> pd.DataFrame:
+    return apply_schema(pd.read_csv(file, **_csv_options(schema, columns)), schema)
+
+def cache_file(file: str, schema: dict) -> str:
+    """
+    Parquet cache path of a CSV file, the schema fingerprint is part of the name so a schema change rebuilds the cache
+    """
+    fingerprint = hashlib.sha1(repr(sorted(schema['dtypes'].items()) + sorted(schema['dates'].items())).encode()).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(file))[0]
+    return os.path.join(os.path.dirname(file), 'parquet_cache', f"{name}.{fingerprint}.parquet")
+
+def read_table(file: str, schema: dict, columns: list = None, filters: list = None) -> pd.DataFrame:
+    """
+    Reads a CSV or Parquet file with the schema's column types
+    - CSV files go through the Parquet cache (written on first read, rebuilt when the CSV changes)
+    - columns: only read these columns (requested columns missing from the file are skipped), None reads all of them
+    - filters: only read the rows matching any of these conjunctions, each a list of (column, operator, value)
+      conditions that all hold (operators of FILTER_OPERATORS, dates compared as Timestamps), e.g.
+      [[('timestamp', '>', t)], [('score_date', '>', a), ('score_date', '<=', b)]]
+      They are pushed down into the Parquet read, so row groups without matches are skipped and the other rows are
+      never converted to pandas. None reads every row
+    """
+    if not file.endswith('.parquet'):
+        if pq is None:
+            df = _read_csv(file, schema, columns)
+            return df if filters is None else _filter_rows(df, filters)
+
+        parquet_file = cache_file(file, schema)
+        if not os.path.exists(parquet_file) or os.path.getmtime(parquet_file) < os.path.getmtime(file):
+            os.makedirs(os.path.dirname(parquet_file), exist_ok=True)
+            # Written to a temporary file first so an interrupted conversion never leaves a partial cache
+            tmp_file = f"{parquet_file}.tmp"
+            _read_csv(file, schema).to_parquet(tmp_file, index=False)
+            os.replace(tmp_file, parquet_file)
+        file = parquet_file
+
+    if columns is not None:
+        available = set(pq.read_schema(file).names) if pq is not None else None
+        columns = [column for column in columns if available is None or column in available]
+    return apply_schema(pd.read_parquet(file, columns=columns, filters=filters), schema)
+
+def iter_table(file: str, schema: dict, columns: list = None, block_size: int = 100000):
+    """
+    Reads a CSV or Parquet file block by block (at most block_size rows at a time), with the schema's column types
+    An up-to-date Parquet cache of a CSV file is read instead of the CSV when it exists, but it is never written here:
+    converting the whole file at once is what streaming avoids
+    """
+    if not file.endswith('.parquet') and pq is not None:
+        parquet_file = cache_file(file, schema)
+        if os.path.exists(parquet_file) and os.path.getmtime(parquet_file) >= os.path.getmtime(file):
+            file = parquet_file
+
+    if file.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(file)
+        if columns is not None:
+            columns = [column for column in columns if column in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=block_size, columns=columns):
+            yield apply_schema(batch.to_pandas(), schema)
+    else:
+        for block in pd.read_csv(file, chunksize=block_size, **_csv_options(schema, columns)):
+            yield apply_schema(block, schema)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, make_dataclass, MISSING
 import datetime
 from typing import Optional
 
@@ -25,3 +25,13 @@ class MemberLevelScore():
     active_member: bool
     score_date: Optional[datetime.date] = None
     timestamp: Optional[datetime.datetime] = None
+
+# Slotted, immutable variant generated from the fields of MemberLevelScore, so the two always have the same fields
+# (see MemberLevelScores in models/RecordArrays.py for collections)
+FrozenMemberLevelScore = make_dataclass(
+    'FrozenMemberLevelScore',
+    [(f.name, f.type) if f.default is MISSING else (f.name, f.type, f.default) for f in fields(MemberLevelScore)],
+    namespace={'__module__': __name__},
+    frozen=True,
+    slots=True,
+)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, make_dataclass, MISSING
 import datetime
 from typing import Optional
 
@@ -25,4 +25,15 @@ class MemberProductAccount:
     collateral_attrib_2: Optional[str] = None
     collateral_attrib_3: Optional[str] = None
     collateral_attrib_4: Optional[str] = None
-    count: Optional[int] = None
\ No newline at end of file
+    count: Optional[int] = None
+
+# Slotted, immutable variant generated from the fields of MemberProductAccount, so the two always have the same fields:
+# no per-instance __dict__, for holding many accounts in memory
+# (MemberProductAccounts in models/RecordArrays.py stores whole collections column by column)
+FrozenMemberProductAccount = make_dataclass(
+    'FrozenMemberProductAccount',
+    [(f.name, f.type) if f.default is MISSING else (f.name, f.type, f.default) for f in fields(MemberProductAccount)],
+    namespace={'__module__': __name__},
+    frozen=True,
+    slots=True,
+)
@@ -0,0 +1,152 @@
+import dataclasses
+import datetime
+import typing
+import numpy as np
+import pandas as pd
+from models.MemberProductAccount import FrozenMemberProductAccount
+from models.MemberLevelScore import FrozenMemberLevelScore
+
+"""
+Struct-of-arrays containers for collections of records
+
+A list of dataclass records keeps one Python object per record plus one per field value (a dict-backed
+MemberProductAccount costs ~1KB). These containers keep one typed array per field instead:
+- str fields: categorical (integer codes + one copy of each distinct string)
+- float fields: float64, int fields: nullable Int64, bool fields: nullable boolean
+- date/datetime fields: datetime64[ns]
+Missing values (None) are stored as NaN/NA/NaT and come back as None.
+
+Usage:
+    accounts = MemberProductAccounts.from_dataframe(member_products_df)
+    accounts[0]                     # FrozenMemberProductAccount
+    accounts[accounts.column('account_balance') > 0]   # MemberProductAccounts of the matching accounts
+    df = accounts.to_dataframe()
+"""
+
+def _field_kind(annotation) -> str:
+    """
+    Storage kind of a dataclass field annotation (Optional[X] is stored like X)
+    """
+    if typing.get_origin(annotation) is typing.Union:
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+    kinds = {
+        str: 'category',
+        float: 'float64',
+        int: 'Int64',
+        bool: 'boolean',
+        datetime.datetime: 'datetime',
+        datetime.date: 'date',
+    }
+    if annotation not in kinds:
+        raise ValueError(f"Unsupported field type: {annotation}")
+    return kinds[annotation]
+
+def _to_array(values, kind: str):
+    if kind in ('datetime', 'date'):
+        # Unparseable dates become missing, as when the CSV loaders parse them
+        return pd.array(pd.to_datetime(values, errors='coerce').astype('datetime64[ns]'))
+    values = pd.Series(values)
+    if kind == 'category':
+        values = values.astype(object)
+        values = values.where(values.isna(), values.astype(str))   # e.g. numeric ids read from a CSV
+    return pd.array(values.astype(kind))
+
+def _to_python(array, kind: str) -> list:
+    """
+    Field values as Python objects, with None for missing values
+    """
+    values = pd.Series(array, copy=False)
+    missing = values.isna().to_numpy()
+    if kind == 'datetime':
+        values = values.dt.to_pydatetime()
+    elif kind == 'date':
+        values = values.dt.date
+    values = values.astype(object).to_numpy(copy=True)
+    values[missing] = None
+    return values.tolist()
+
+class RecordArray:
+    """
+    Base class of the containers: record_type is the frozen dataclass returned for each record,
+    the fields (and their storage) come from its annotations
+    """
+    record_type = None
+
+    def __init__(self, columns: dict):
+        self._columns = columns
+
+    @classmethod
+    def fields(cls) -> dict:
+        """
+        Field name -> storage kind, in record_type field order
+        """
+        return {name: _field_kind(annotation) for name, annotation in typing.get_type_hints(cls.record_type).items()}
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'RecordArray':
+        """
+        Container of the rows of df (one column per field, extra columns are ignored)
+        Optional fields missing from df are stored as missing values, missing required fields raise a ValueError
+        """
+        required = [field.name for field in dataclasses.fields(cls.record_type) if field.default is dataclasses.MISSING]
+        missing = [name for name in required if name not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required columns for {cls.__name__}: {missing}")
+        columns = {}
+        for name, kind in cls.fields().items():
+            values = df[name].to_numpy() if name in df.columns else np.full(len(df), None)
+            columns[name] = _to_array(values, kind)
+        return cls(columns)
+
+    @classmethod
+    def from_records(cls, records: list) -> 'RecordArray':
+        """
+        Container of a list of records (any objects with the record fields as attributes, e.g. the dict-backed dataclass)
+        """
+        fields = cls.fields()
+        return cls({name: _to_array([getattr(record, name) for record in records], kind) for name, kind in fields.items()})
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        One column per field, date fields as datetime64 columns
+        """
+        return pd.DataFrame(self._columns)
+
+    def column(self, name: str) -> pd.Series:
+        return pd.Series(self._columns[name], copy=False, name=name)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the field arrays (categorical columns count the codes and the category array, not the strings)
+        """
+        return sum(array.nbytes for array in self._columns.values())
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values()))) if self._columns else 0
+
+    def __iter__(self):
+        fields = self.fields()
+        columns = [_to_python(self._columns[name], kind) for name, kind in fields.items()]
+        for values in zip(*columns):
+            yield self.record_type(*values)
+
+    def __getitem__(self, key):
+        """
+        An int gives one record, a slice, boolean mask or array of positions gives a container of those records
+        """
+        if isinstance(key, (int, np.integer)):
+            position = range(len(self))[key]
+            return next(iter(self[position:position + 1]))
+        if isinstance(key, pd.Series):
+            key = key.to_numpy()
+        return type(self)({name: array[key] for name, array in self._columns.items()})
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} records)"
+
+class MemberProductAccounts(RecordArray):
+    record_type = FrozenMemberProductAccount
+
+class MemberLevelScores(RecordArray):
+    record_type = FrozenMemberLevelScore